@@ -0,0 +1,217 @@
+"""Background workers that run summarization jobs."""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime as dt
+
+from backend.app.api.singleflight import summarize_once
+from backend.app.build.checkpointer import delete_checkpoints
+from backend.app.build.loader import load_articles
+from backend.app.build.pipeline import summarize_document
+from backend.app.utils.async_db_connection import (claim_summary_jobs,
+                                                   refresh_summary_jobs,
+                                                   start_summary_job,
+                                                   update_summary_job,
+                                                   update_summary_jobs)
+from backend.app.utils.config import (BATCH_WRITE_SIZE,
+                                      JOB_HEARTBEAT_INTERVAL,
+                                      JOB_QUEUE_SIZE,
+                                      JOB_STALE_AFTER,
+                                      JOB_WORKERS)
+from backend.app.utils.repository import (insert_wiki_summary,
+                                          upsert_wiki_summaries)
+
+
+class SummaryWorkerPool:
+    """
+    A bounded pool of asyncio workers consuming a queue of summary jobs.
+
+    Jobs are persisted in the summary_jobs table before being submitted,
+    so the pool only keeps their identifiers in memory and records the
+    progress of each job in the database.
+
+    Each job row is owned by the worker process queuing it, which renews
+    its heartbeat every `JOB_HEARTBEAT_INTERVAL` seconds. The jobs of a
+    process silent for `JOB_STALE_AFTER` seconds are queued again, and the
+    jobs without owner are claimed by the processes with free slots.
+
+    Batches run in their own tasks, outside of the queue. The workers, the
+    batches and the requests share the `GRAPH_SLOTS` of the pipeline.
+
+    Attributes:
+        n_workers (int): The number of jobs that may run at the same time.
+        queue (asyncio.Queue): The jobs waiting for a worker.
+        owner (str): The identifier of the process in the job rows.
+    """
+
+    def __init__(self, n_workers: int, max_queue: int):
+        self.n_workers = n_workers
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.owner = (f"{socket.gethostname()}:{os.getpid()}:"
+                      f"{uuid.uuid4().hex[:8]}")
+        self._workers = []
+        self._batches = set()
+
+    async def start(self):
+        """Start the workers and the loop claiming the jobs left pending."""
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"summary-worker-{i}")
+            for i in range(self.n_workers)
+        ]
+        self._workers.append(asyncio.create_task(self._recover()))
+
+    async def stop(self):
+        """
+        Cancel the workers and release the jobs left, which any process
+        may claim again.
+        """
+        tasks = self._workers + list(self._batches)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        queued = []
+        while not self.queue.empty():
+            queued.append(self.queue.get_nowait()[0])
+        await update_summary_jobs(queued, owner=None)
+
+    def submit(self, u_id: str, url: str, number_of_words: int):
+        """
+        Queue a job that was already inserted in the database.
+
+        Raises:
+            asyncio.QueueFull: If the queue has no free slot.
+        """
+        self.queue.put_nowait((u_id, url, number_of_words))
+
+    def submit_batch(self, items: list):
+        """
+        Run a batch of jobs that were already inserted in the database.
+
+        Args:
+            items (list): The (uuid, url, number_of_words) of each job,
+                          without duplicates.
+        """
+        task = asyncio.create_task(self._run_batch(items))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _recover(self):
+        while True:
+            try:
+                await refresh_summary_jobs(self.owner, JOB_STALE_AFTER)
+                capacity = self.queue.maxsize or self.n_workers
+                free = capacity - self.queue.qsize()
+                jobs = []
+                if free > 0:
+                    jobs = await claim_summary_jobs(self.owner, free)
+                for i, job in enumerate(jobs):
+                    try:
+                        self.queue.put_nowait(job)
+                    except asyncio.QueueFull:
+                        # Requests filled the queue while claiming
+                        await update_summary_jobs(
+                            [u_id for u_id, _, _ in jobs[i:]], owner=None
+                        )
+                        break
+            except Exception as e:
+                print(f"An error occurred while recovering the jobs: {e}")
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+
+    async def _work(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(*job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, u_id: str, url: str, number_of_words: int):
+        if not await start_summary_job(u_id, self.owner):
+            # Queued again for another process while waiting here
+            return
+        try:
+            summary = await summarize_once(url, number_of_words, u_id)
+            info = await insert_wiki_summary(u_id, url, summary)
+            if "error" in info:
+                raise RuntimeError(info)
+            await delete_checkpoints(u_id)
+        except asyncio.CancelledError:
+            await update_summary_job(u_id, status="queued", started_at=None,
+                                     owner=None)
+            raise
+        except Exception as e:
+            await update_summary_job(u_id,
+                                     status="failed",
+                                     error=str(e),
+                                     finished_at=dt.now())
+        else:
+            await update_summary_job(u_id,
+                                     status="done",
+                                     finished_at=dt.now())
+
+    async def _run_batch(self, items: list):
+        # The jobs not done nor failed yet, settled if the batch breaks
+        pending = {u_id for u_id, _, _ in items}
+        tasks = []
+        try:
+            articles = await load_articles([url for _, url, _ in items])
+
+            async def summarize(u_id, url, number_of_words):
+                try:
+                    raw_doc = articles[url]
+                    if isinstance(raw_doc, Exception):
+                        raise raw_doc
+                    await update_summary_job(u_id, status="running",
+                                             started_at=dt.now())
+                    summary = await summarize_document(raw_doc,
+                                                       number_of_words, u_id)
+                    return {"uuid": u_id, "url": url, "summary": summary}
+                except Exception as e:
+                    return {"uuid": u_id, "error": str(e)}
+
+            tasks = [asyncio.create_task(summarize(*item)) for item in items]
+            rows = []
+            for done in asyncio.as_completed(tasks):
+                result = await done
+                if "error" in result:
+                    await update_summary_job(result["uuid"],
+                                             status="failed",
+                                             error=result["error"],
+                                             finished_at=dt.now())
+                    pending.discard(result["uuid"])
+                    continue
+                rows.append(result)
+                # Write the summaries in small groups as they complete
+                if len(rows) >= BATCH_WRITE_SIZE:
+                    await self._store_batch_rows(rows)
+                    pending.difference_update(row["uuid"] for row in rows)
+                    rows = []
+            await self._store_batch_rows(rows)
+        except asyncio.CancelledError:
+            await update_summary_jobs(list(pending), status="queued",
+                                      started_at=None, owner=None)
+            raise
+        except Exception as e:
+            await update_summary_jobs(list(pending), status="failed",
+                                      error=str(e), finished_at=dt.now())
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _store_batch_rows(self, rows: list):
+        if not rows:
+            return
+        u_ids = [row["uuid"] for row in rows]
+        info = await upsert_wiki_summaries(rows)
+        if "error" in info:
+            await update_summary_jobs(u_ids, status="failed", error=info,
+                                      finished_at=dt.now())
+            return
+        await update_summary_jobs(u_ids, status="done", finished_at=dt.now())
+        for u_id in u_ids:
+            await delete_checkpoints(u_id)
+
+
+SUMMARY_WORKERS = SummaryWorkerPool(JOB_WORKERS, JOB_QUEUE_SIZE)
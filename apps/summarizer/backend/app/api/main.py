@@ -1,12 +1,69 @@
 """FastAPI Setup."""
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 
+from backend.app.api.jobs import SUMMARY_WORKERS
 from backend.app.api.routes.summarizer import summarizer_router
+from backend.app.build.checkpointer import (close_checkpointer,
+                                            delete_expired_checkpoints,
+                                            open_checkpointer)
+from backend.app.build.loader import close_clients
+from backend.app.build.models import get_embedding
+from backend.app.build.pipeline import warm_up
 from backend.app.utils.async_db_connection import init_db
+from backend.app.utils.config import (CHECKPOINT_ENABLED,
+                                      CHECKPOINT_SWEEP_INTERVAL,
+                                      CHECKPOINT_TTL_DAYS,
+                                      SEARCH_ENABLED,
+                                      SEARCH_INDEX_BATCH_SIZE,
+                                      SEARCH_INDEX_INTERVAL,
+                                      WARM_UP_ENABLED)
+from backend.app.utils.metrics import latest_metrics
+from backend.app.utils.search import index_summaries
 
 
 app = FastAPI(title="Wikipedia Summarizer API")
+app.state.ready = False
+
+
+async def warm_up_app():
+    """Build the models and the graphs, then report the app as ready."""
+    try:
+        await warm_up()
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+        return
+    app.state.ready = True
+
+
+async def index_summaries_periodically():
+    """
+    Index the new summaries for the search every `SEARCH_INDEX_INTERVAL`
+    seconds, batch after batch until none is left.
+    """
+    while True:
+        try:
+            while await index_summaries(get_embedding(),
+                                        SEARCH_INDEX_BATCH_SIZE):
+                pass
+        except Exception as e:
+            print(f"Search indexing failed: {e}")
+        await asyncio.sleep(SEARCH_INDEX_INTERVAL)
+
+
+async def sweep_checkpoints_periodically():
+    """
+    Delete the checkpoints of the failed or abandoned runs older than
+    `CHECKPOINT_TTL_DAYS` every `CHECKPOINT_SWEEP_INTERVAL` seconds.
+    """
+    while True:
+        try:
+            await delete_expired_checkpoints(CHECKPOINT_TTL_DAYS)
+        except Exception as e:
+            print(f"Checkpoint sweep failed: {e}")
+        await asyncio.sleep(CHECKPOINT_SWEEP_INTERVAL)
 
 
 @asynccontextmanager
@@ -14,17 +71,45 @@ async def lifespan(app: FastAPI):
     """
     Define the lifespan context manager.
 
-    This context manager initializes the database at the start of
-    the application and can be used for any necessary cleanup
-    when the application shuts down.
+    This context manager initializes the database, opens the graph
+    checkpointer and starts the background job workers, the sweep of the
+    expired checkpoints and, when `SEARCH_ENABLED` is set, the search
+    indexer at the start of the application, and stops them and closes
+    the checkpointer and the Wikipedia HTTP clients when the application
+    shuts down.
+
+    The models and the graphs are built in the background once the server
+    listens, and `/ready` answers 503 until they are, so the probes are
+    served meanwhile. Without `WARM_UP_ENABLED` they are built by the first
+    request instead.
 
     Args:
         app (FastAPI): The FastAPI application instance.
     """
     # Initialize the database
     await init_db()
+    # Open the checkpointer before the workers resume their jobs
+    await open_checkpointer()
+    # Start the workers that run queued summary jobs
+    await SUMMARY_WORKERS.start()
+    background = []
+    if CHECKPOINT_ENABLED:
+        background.append(
+            asyncio.create_task(sweep_checkpoints_periodically())
+        )
+    if SEARCH_ENABLED:
+        background.append(asyncio.create_task(index_summaries_periodically()))
+    if WARM_UP_ENABLED:
+        background.append(asyncio.create_task(warm_up_app()))
+    else:
+        app.state.ready = True
     yield
-    # Any cleanup can be done here if needed
+    app.state.ready = False
+    for task in background:
+        task.cancel()
+    await SUMMARY_WORKERS.stop()
+    await close_checkpointer()
+    await close_clients()
 
 
 app.router.lifespan_context = lifespan
@@ -36,3 +121,18 @@ app.include_router(summarizer_router, tags=["wikipedia"])
 async def read_root():
     """Root endpoint to check if the API is running."""
     return {"message": "Welcome to the Wikipedia Summarizer API!"}
+
+
+@app.get("/ready", tags=["monitoring"])
+async def ready():
+    """Readiness probe, answering 503 until the models are built."""
+    if not app.state.ready:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready"}
+
+
+@app.get("/metrics", tags=["monitoring"], include_in_schema=False)
+async def metrics():
+    """Export the metrics of the app for Prometheus to scrape."""
+    body, content_type = latest_metrics()
+    return Response(body, media_type=content_type)
@@ -1,35 +1,85 @@
 """Routes controller."""
+import asyncio
 import uuid
+from collections import Counter
+from datetime import datetime as dt
+from typing import Literal
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from backend.app.utils.config import ArticleRequest
-from backend.app.utils.async_db_connection import (get_wiki_summary,
-                                                   insert_wiki_summary)
-from backend.app.utils.functions import validate_wikipedia_url
-from backend.app.build.graphs.workflow import SUMMARIZER_GRAPH
-from backend.app.build.loader import load_article_content
+from backend.app.api.jobs import SUMMARY_WORKERS
+from backend.app.api.singleflight import SUMMARY_FLIGHTS, summarize_once
+from backend.app.build.chains.controller import GENERATION_STATS
+from backend.app.build.checkpointer import delete_checkpoints
+from backend.app.build.dedup import DEDUP_STATS
+from backend.app.build.graphs.nodes import EmptyArticleError
+from backend.app.build.models import LLM_LIMITER, get_embedding
+from backend.app.utils.config import (ArticleRequest,
+                                      BatchRequest,
+                                      GZIP_MIN_SIZE,
+                                      RESPONSE_CACHE_MAX_BYTES,
+                                      SEARCH_ENABLED,
+                                      SSE_KEEPALIVE_INTERVAL)
+from backend.app.utils.async_db_connection import (get_batch_jobs,
+                                                   get_summary_job,
+                                                   insert_summary_job,
+                                                   insert_summary_jobs,
+                                                   update_summary_job)
+from backend.app.utils.functions import (format_sse,
+                                         validate_wikipedia_url,
+                                         with_keepalive)
+from backend.app.utils.http_cache import ResponseCache, cached_response
+from backend.app.utils.llm_cache import get_llm_cache_stats
+from backend.app.utils.metrics import count_lookup
+from backend.app.utils.repository import (get_latest_wiki_summary,
+                                          get_wiki_summary,
+                                          insert_wiki_summary,
+                                          upsert_wiki_summaries)
+from backend.app.utils.map_summaries import MAP_SUMMARY_STATS
+from backend.app.utils.search import search_summaries
+from backend.app.utils.section_summaries import SECTION_SUMMARY_STATS
+from backend.app.utils.summary_cache import get_cache_stats
+from backend.app.build.pipeline import (resume_summary,
+                                        stream_article_summary)
 
 
 summarizer_router = APIRouter(prefix="/summarizer")
 
+# Responses of the finished summaries, which never change once written
+SUMMARY_RESPONSES = ResponseCache(RESPONSE_CACHE_MAX_BYTES, GZIP_MIN_SIZE)
+
 
 @summarizer_router.post("/insert_article", response_model=dict)
-async def insert_article(request: ArticleRequest):
+async def insert_article(request: ArticleRequest,
+                         mode: Literal["sync", "job"] = "sync"):
     """
     Insert a Wikipedia article and generate a summary.
 
     This function generates a unique ID for the article, validates the URL,
     loads the article content, and invokes the summarizer graph to generate
-    a summary. The summary is then inserted into the database.
+    a summary. The summary is then inserted into the database. Concurrent
+    requests for the same article and size share one graph run, each one
+    storing the summary under its own ID.
+
+    With `mode=job` the article is only queued: a job row is persisted,
+    the response is returned with status 202 and one of the background
+    workers generates the summary. Its progress is reported by
+    `get_summary`.
 
     Args:
         request (ArticleRequest): The request containing the Wikipedia URL
                                   and the desired number of words.
+        mode (str): Either 'sync' to wait for the summary or 'job' to
+                    run it in the background.
 
     Returns:
         dict: A dictionary containing the unique ID and any relevant
-              information or warnings.
+              information or warnings. An article without any text to
+              summarize is answered with 422, any other failure with 500
+              and a detail carrying the error and the ID `resume_article`
+              accepts.
     """
     u_id = str(uuid.uuid4())
     response = {"id": u_id}
@@ -45,43 +95,391 @@ async def insert_article(request: ArticleRequest):
                          "below 1000, the lowest value of "
                          "this parameter is 1000.")}
         )
+    elif mode == "job":
+        return await enqueue_article(u_id, url, nw, response)
     else:
-        raw_doc = load_article_content(url)
-        defs = {"contents": [doc.page_content for doc in [raw_doc]],
-                "token_max": nw}
         try:
-            summ_text = await SUMMARIZER_GRAPH.ainvoke(defs,
-                                                       {"recursion_limit": 10})
-            info = await insert_wiki_summary(u_id,
-                                             url,
-                                             summ_text["final_summary"])
+            summ_text = await summarize_once(url, nw, u_id)
+            info = await insert_wiki_summary(u_id, url, summ_text)
             if "error" in info:
                 raise HTTPException(status_code=500, detail=info)
+            await delete_checkpoints(u_id)
             response.update({"info": info, "id": u_id})
+        except HTTPException:
+            raise
+        except EmptyArticleError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from e
         except Exception as e:
-            raise HTTPException(status_code=500, detail=e) from e
+            raise HTTPException(status_code=500,
+                                detail={"error": str(e), "id": u_id}) from e
     return response
 
 
+@summarizer_router.post("/insert_article/stream")
+async def insert_article_stream(request: ArticleRequest):
+    """
+    Insert a Wikipedia article and stream its summary as server-sent events.
+
+    Progress events ('loaded', 'map', 'collapse') are sent while the graph
+    runs, then the final summary is streamed in 'token' events as the LLM
+    generates it. Once the stream completes the summary is inserted into
+    the database and a 'done' event carries the unique ID and the insert
+    information. Failures are reported by an 'error' event carrying the
+    unique ID, with which the run can be finished by `resume_article`.
+    While no event is ready, an SSE comment is sent every
+    `SSE_KEEPALIVE_INTERVAL` seconds so the client read timeout does not
+    expire during a long map stage.
+
+    Args:
+        request (ArticleRequest): The request containing the Wikipedia URL
+                                  and the desired number of words.
+
+    Returns:
+        StreamingResponse: The text/event-stream response.
+    """
+    u_id = str(uuid.uuid4())
+    url = request.wikipedia_url
+    nw = request.number_of_words
+    validation_result = validate_wikipedia_url(url)
+    if validation_result != "Valid Wikipedia URL":
+        raise HTTPException(status_code=400, detail=validation_result)
+    if (nw is None) or (nw < 1000):
+        nw = 1000
+
+    async def events():
+        parts = []
+        try:
+            async for item in with_keepalive(
+                stream_article_summary(url, nw, u_id), SSE_KEEPALIVE_INTERVAL
+            ):
+                if item is None:
+                    # The map stage can run for minutes without any event
+                    yield ": ping\n\n"
+                    continue
+                event, data = item
+                if event == "token":
+                    parts.append(data["text"])
+                yield format_sse(event, data)
+            info = await insert_wiki_summary(u_id, url, "".join(parts))
+        except Exception as e:
+            yield format_sse("error", {"detail": str(e), "id": u_id})
+            return
+        if "error" in info:
+            yield format_sse("error", {"detail": info, "id": u_id})
+        else:
+            await delete_checkpoints(u_id)
+            yield format_sse("done", {"id": u_id, "info": info})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+async def enqueue_article(u_id: str, url: str, nw: int,
+                          response: dict) -> JSONResponse:
+    """
+    Persist a summary job and hand it to the background workers.
+
+    Args:
+        u_id (str): The unique identifier of the job and of its summary.
+        url (str): The URL of the Wikipedia article.
+        nw (int): The desired number of words.
+        response (dict): The response body built so far.
+
+    Returns:
+        JSONResponse: The response body with the job status and code 202.
+    """
+    info = await insert_summary_job(u_id, url, nw, SUMMARY_WORKERS.owner)
+    if "error" in info:
+        raise HTTPException(status_code=500, detail=info)
+    try:
+        SUMMARY_WORKERS.submit(u_id, url, nw)
+    except asyncio.QueueFull as e:
+        await update_summary_job(u_id, status="failed",
+                                 error="Job queue is full")
+        raise HTTPException(status_code=503,
+                            detail="Job queue is full, try again later") from e
+    response.update({"info": info, "status": "queued"})
+    return JSONResponse(status_code=202, content=response)
+
+
+@summarizer_router.post("/insert_batch", response_model=dict)
+async def insert_batch(request: BatchRequest):
+    """
+    Insert a batch of Wikipedia articles and generate their summaries in the
+    background.
+
+    Identical URL and number of words pairs are summarized once and share
+    the same ID. A job row is persisted for each distinct pair, the articles
+    are fetched concurrently and the graphs run within the global budget
+    `GRAPH_MAX_CONCURRENCY`. The summaries are inserted in bulk writes of
+    `BATCH_WRITE_SIZE` as they complete. Numbers of words below 1000 are
+    raised to 1000.
+
+    Args:
+        request (BatchRequest): The list of articles to summarize.
+
+    Returns:
+        JSONResponse: The batch ID and the ID of each article, with code 202.
+    """
+    invalid = [article.wikipedia_url for article in request.articles
+               if validate_wikipedia_url(article.wikipedia_url)
+               != "Valid Wikipedia URL"]
+    if invalid:
+        raise HTTPException(status_code=400,
+                            detail={"error": ("Error: Invalid Wikipedia "
+                                              "URL format"),
+                                    "urls": invalid})
+    batch_id = str(uuid.uuid4())
+    ids = {}
+    items = []
+    response_items = []
+    for article in request.articles:
+        nw = max(article.number_of_words or 1000, 1000)
+        key = (article.wikipedia_url, nw)
+        if key not in ids:
+            ids[key] = str(uuid.uuid4())
+            items.append((ids[key], *key))
+        response_items.append({"wikipedia_url": article.wikipedia_url,
+                               "number_of_words": nw,
+                               "id": ids[key]})
+    info = await insert_summary_jobs([
+        {"uuid": u_id, "url": url, "number_of_words": nw,
+         "batch_id": batch_id} for u_id, url, nw in items
+    ], SUMMARY_WORKERS.owner)
+    if "error" in info:
+        raise HTTPException(status_code=500, detail=info)
+    SUMMARY_WORKERS.submit_batch(items)
+    return JSONResponse(status_code=202,
+                        content={"batch_id": batch_id,
+                                 "info": info,
+                                 "items": response_items})
+
+
+@summarizer_router.get("/get_batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """
+    Retrieve the status of the jobs of a batch.
+
+    Args:
+        batch_id (str): The unique identifier of the batch.
+
+    Returns:
+        dict: The number of jobs by status and the status of each job.
+    """
+    try:
+        jobs = await get_batch_jobs(batch_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if jobs is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"batch_id": batch_id,
+            "status": dict(Counter(jobs.values())),
+            "jobs": jobs}
+
+
 @summarizer_router.get("/get_summary/{uuid}")
-async def get_summary(u_id: str):
+async def get_summary(u_id: str, request: Request):
     """
     Retrieve a summary by UUID.
 
     This function fetches the summary associated with the given UUID from
-    the database.
+    the database. When the UUID belongs to a background job, its status
+    ('queued', 'running', 'done' or 'failed') and timings are returned as
+    well, and the summary once the job is done.
+
+    Finished summaries are immutable: they are kept in an in-process cache
+    and served with a strong ETag, `Cache-Control: immutable`, a 304 when
+    the client sends a matching If-None-Match, and gzip compression for
+    large bodies.
 
     Args:
         u_id (str): The unique identifier for the summary.
+        request (Request): The request, for its conditional and
+                           Accept-Encoding headers.
 
     Returns:
-        dict: A dictionary containing the UUID and the summary text, if found.
+        Response: A JSON body containing the UUID and the summary text, if
+                  found, and the status of the job, if any.
     """
+    entry = SUMMARY_RESPONSES.get(u_id)
+    count_lookup("response", entry is not None)
+    if entry is not None:
+        return cached_response(entry, request.headers)
     try:
-        summary = await get_wiki_summary(u_id)
-        if summary:
-            return {"uuid": u_id, "summary": summary}
-        else:
-            raise HTTPException(status_code=404, detail="Summary not found")
+        job = await get_summary_job(u_id)
+        # The summary is only read, and decompressed, once it is final
+        summary = (await get_wiki_summary(u_id)
+                   if not job or job["status"] == "done" else None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+    if not summary and not job:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    response = {"uuid": u_id}
+    if summary:
+        response["summary"] = summary
+    if job:
+        response.update(job)
+    if not summary:
+        # The job is still running, so the response will change
+        return JSONResponse(jsonable_encoder(response),
+                            headers={"Cache-Control": "no-cache"})
+    entry = SUMMARY_RESPONSES.put(u_id, response)
+    return cached_response(entry, request.headers)
+
+
+@summarizer_router.get("/latest_summary")
+async def latest_summary(url: str):
+    """
+    Retrieve the most recent summary stored for a Wikipedia URL.
+
+    Args:
+        url (str): The URL of the Wikipedia page.
+
+    Returns:
+        dict: The UUID, summary text and creation date of the latest
+              summary of the URL.
+    """
+    try:
+        summary = await get_latest_wiki_summary(url)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if not summary:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    return summary
+
+
+@summarizer_router.get("/search")
+async def search(q: str, limit: int = 10):
+    """
+    Search the stored summaries by their words and by their meaning.
+
+    The summaries matching the full-text query and the summaries nearest
+    to its embedding are ranked together, so an existing summary can be
+    found instead of generating a new one. The summaries are indexed in the
+    background, shortly after they are stored.
+
+    Args:
+        q (str): The search text, in the syntax of web search engines.
+        limit (int): The maximum number of results, at most 100.
+
+    Returns:
+        dict: The query and its results, each with the UUID, URL, creation
+              date and score of a summary, best first.
+    """
+    if not SEARCH_ENABLED:
+        raise HTTPException(status_code=503, detail="Search is disabled")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty search query")
+    try:
+        query_embedding = await get_embedding().aembed_query(q)
+        results = await search_summaries(q, query_embedding,
+                                         min(max(limit, 1), 100))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return {"query": q, "results": results}
+
+
+@summarizer_router.post("/resume/{u_id}", response_model=dict)
+async def resume_article(u_id: str):
+    """
+    Finish a summary whose run failed, from its last checkpoint.
+
+    The map and collapse calls that completed before the failure are not
+    made again. The summary is stored under the UUID of the failed run and
+    its job, if any, is marked as done.
+
+    A request that joined the run of an identical one has no checkpoint of
+    its own, the run being checkpointed under the UUID of the request that
+    led it, and is answered with 404: sending it again reuses the stored
+    map stage of the article.
+
+    Args:
+        u_id (str): The unique identifier of the failed summary.
+
+    Returns:
+        dict: The unique ID and the insert information.
+    """
+    job = await get_summary_job(u_id)
+    if job and job["status"] in ("queued", "running"):
+        raise HTTPException(status_code=409,
+                            detail="The job is still in progress")
+    try:
+        resumed = await resume_summary(u_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if resumed is None:
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    url, summary = resumed
+    info = await upsert_wiki_summaries([{"uuid": u_id, "url": url,
+                                         "summary": summary}])
+    if "error" in info:
+        raise HTTPException(status_code=500, detail=info)
+    await update_summary_job(u_id, status="done", error=None,
+                             finished_at=dt.now())
+    await delete_checkpoints(u_id)
+    return {"id": u_id, "info": info}
+
+
+@summarizer_router.get("/cache_stats")
+async def cache_stats():
+    """
+    Report the hit and miss counters of the summary cache, of the LLM
+    response cache, of the get_summary response cache and of the stored
+    chunk and map stage summaries.
+
+    Returns:
+        dict: The counters of this process and the number of cached entries
+              of the summary cache, with the same information and the size
+              of the LLM response cache under 'llm_cache', of the
+              in-process response cache under 'response_cache', the
+              chunks reused and summarized again under 'section_summaries',
+              and the revisions whose map stage was reused or run under
+              'map_summaries'.
+    """
+    try:
+        return {**await get_cache_stats(),
+                "llm_cache": await get_llm_cache_stats(),
+                "response_cache": SUMMARY_RESPONSES.get_stats(),
+                "section_summaries": dict(SECTION_SUMMARY_STATS),
+                "map_summaries": dict(MAP_SUMMARY_STATS)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@summarizer_router.get("/generation_stats")
+async def generation_stats():
+    """
+    Report how many LLM attempts the chunk summaries needed, and how many
+    chunks and tokens the near-duplicate elimination saved.
+
+    Returns:
+        dict: The number of chunks by number of attempts and the number of
+              summaries truncated after the last attempt, in this process,
+              with the chunks seen and dropped and the tokens saved under
+              'deduplication'.
+    """
+    return {
+        "attempts_per_chunk": dict(GENERATION_STATS["attempts_per_chunk"]),
+        "truncated": GENERATION_STATS["truncated"],
+        "deduplication": dict(DEDUP_STATS),
+    }
+
+
+@summarizer_router.get("/llm_stats")
+async def llm_stats():
+    """
+    Report the state of the limiter shared by the calls to the LLM, and
+    of the coalescing of the concurrent identical summaries.
+
+    Returns:
+        dict: The calls waiting for the limiter and in flight, the highest
+              waiting queue seen, the totals of requests, retries and
+              failures, the level of the requests and tokens buckets, and
+              under 'single_flight' the graph runs started, the requests
+              that joined one, and the runs in flight.
+    """
+    return {**LLM_LIMITER.stats,
+            "requests_bucket": LLM_LIMITER.requests.level,
+            "tokens_bucket": LLM_LIMITER.tokens.level,
+            "single_flight": {**SUMMARY_FLIGHTS.stats,
+                              "in_flight": SUMMARY_FLIGHTS.in_flight}}
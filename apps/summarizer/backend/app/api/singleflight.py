@@ -0,0 +1,103 @@
+"""Coalesce concurrent requests for the same summary."""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from backend.app.build.pipeline import summarize_article
+from backend.app.utils.async_db_connection import summary_lock
+from backend.app.utils.config import (SINGLE_FLIGHT_ADVISORY_LOCK,
+                                      SINGLE_FLIGHT_ENABLED,
+                                      SINGLE_FLIGHT_LOCK_POLL,
+                                      SUMMARY_CACHE_ENABLED)
+
+
+class SingleFlight:
+    """
+    Run a single call at a time per key, the concurrent calls of the same
+    key awaiting the result of the running one.
+
+    The call runs in its own task, so a caller cancelled meanwhile does not
+    cancel it for the others.
+
+    Attributes:
+        stats (dict): The calls run and the calls that joined a running
+                      one, in this process.
+    """
+
+    def __init__(self):
+        self.stats = {"leaders": 0, "followers": 0}
+        self._calls = {}
+
+    @property
+    def in_flight(self) -> int:
+        """The number of keys with a running call."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable,
+                 func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `func`, or join its running call for the same key.
+
+        Args:
+            key (Hashable): The key of the call.
+            func (Callable): The coroutine function to run.
+
+        Returns:
+            Any: The result of the call, shared by all its callers.
+
+        Raises:
+            Exception: The exception raised by the call, to all its
+                       callers.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.stats["leaders"] += 1
+            task = asyncio.create_task(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.stats["followers"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception, every caller may have been cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+SUMMARY_FLIGHTS = SingleFlight()
+
+
+async def summarize_once(url: str, number_of_words: int,
+                         u_id: str | None = None) -> str:
+    """
+    Summarize a Wikipedia article, sharing the graph run of the concurrent
+    requests for the same article and size.
+
+    Each request keeps its own UUID and stores its own row of the shared
+    summary. With `SINGLE_FLIGHT_ADVISORY_LOCK`, the run also waits for
+    the worker process generating the same summary, if any, and is then
+    answered by the summary cache. Without `SUMMARY_CACHE_ENABLED` nothing
+    would answer it, so the lock is not taken.
+
+    Args:
+        url (str): The URL of the Wikipedia article.
+        number_of_words (int): The desired number of words in the summary.
+        u_id (str, optional): The UUID of the request, under which the
+                              shared run is checkpointed when it leads.
+
+    Returns:
+        str: The final summary of the article.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return await summarize_article(url, number_of_words, u_id)
+    key = f"{url}:{number_of_words}"
+
+    async def run() -> str:
+        if not (SINGLE_FLIGHT_ADVISORY_LOCK and SUMMARY_CACHE_ENABLED):
+            return await summarize_article(url, number_of_words, u_id)
+        async with summary_lock(key, SINGLE_FLIGHT_LOCK_POLL):
+            return await summarize_article(url, number_of_words, u_id)
+
+    return await SUMMARY_FLIGHTS.do(key, run)
@@ -0,0 +1,75 @@
+"""Stand-in chat model answering offline, for the benchmarks"""
+import asyncio
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import (ChatGeneration,
+                                    ChatGenerationChunk,
+                                    ChatResult)
+
+
+# Words of the generated answers, most of them one token long
+VOCABULARY = ("the", "inventor", "current", "electric", "system", "energy",
+              "patent", "design", "motor", "field", "power", "laboratory",
+              "research", "induction", "wireless", "signal", "tower", "coil",
+              "history", "work", "early", "life", "later", "years", "legacy")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model answering after a fixed latency with a text of a fixed number
+    of words, drawn from the prompt so different prompts get different
+    answers.
+
+    Attributes:
+        latency (float): The seconds waited before answering, or before the
+                         first chunk of a stream.
+        output_words (int): The number of words of every answer.
+        chunk_words (int): The number of words of each streamed chunk.
+    """
+
+    latency: float = 0.5
+    output_words: int = 200
+    chunk_words: int = 10
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = "".join(str(message.content) for message in messages)
+        seed = hashlib.sha256(prompt.encode()).digest()
+        rng = random.Random(seed)
+        return " ".join(rng.choice(VOCABULARY)
+                        for _ in range(self.output_words))
+
+    def _generate(self, messages: List[BaseMessage],
+                  stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        message = AIMessage(content=self._answer(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage],
+                         stop: Optional[List[str]] = None,
+                         run_manager: Any = None,
+                         **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        message = AIMessage(content=self._answer(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage],
+                       stop: Optional[List[str]] = None,
+                       run_manager: Any = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        words = self._answer(messages).split(" ")
+        for start in range(0, len(words), self.chunk_words):
+            text = " ".join(words[start:start + self.chunk_words])
+            if start:
+                text = " " + text
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
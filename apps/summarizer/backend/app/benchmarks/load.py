@@ -0,0 +1,158 @@
+"""Measure the throughput and latency of insert_article under load.
+
+Start the fixture server and the backend with the fake models first:
+    python -m backend.app.benchmarks.wiki_server --port 8081
+    LLM_BACKEND=fake WIKIPEDIA_BASE_URL=http://127.0.0.1:8081 \\
+        LLM_CACHE_ENABLED=false SUMMARY_CACHE_ENABLED=false \\
+        python -m backend.app.main
+
+Usage:
+    python -m backend.app.benchmarks.load --concurrency 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(values: List[float], q: float) -> float | None:
+    """
+    Compute a percentile by the nearest-rank method.
+
+    Args:
+        values (List[float]): The observations.
+        q (float): The percentile, between 0 and 100.
+
+    Returns:
+        float or None: The smallest observation with at least q percent of
+                       the observations at or below it, or None when there
+                       is no observation.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+async def llm_requests(client: httpx.AsyncClient) -> int:
+    """Read the number of LLM requests made by the backend so far."""
+    response = await client.get("/summarizer/llm_stats")
+    response.raise_for_status()
+    return response.json()["requests"]
+
+
+async def run_level(client: httpx.AsyncClient, urls: List[str],
+                    concurrency: int, n_requests: int,
+                    number_of_words: int) -> dict:
+    """
+    Send `n_requests` summaries, `concurrency` at a time, cycling over the
+    URLs.
+
+    Args:
+        client (httpx.AsyncClient): The client of the backend.
+        urls (List[str]): The Wikipedia URLs to summarize.
+        concurrency (int): The number of requests in flight.
+        n_requests (int): The number of requests of the level.
+        number_of_words (int): The size requested for the summaries.
+
+    Returns:
+        dict: The concurrency, the number of successes and errors, the
+              throughput in requests per second, the p50, p95 and p99
+              latencies in seconds and the LLM calls per successful request.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def send(url):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/summarizer/insert_article",
+                    json={"wikipedia_url": url,
+                          "number_of_words": number_of_words}
+                )
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    calls_before = await llm_requests(client)
+    start = time.perf_counter()
+    await asyncio.gather(*(send(urls[i % len(urls)])
+                           for i in range(n_requests)))
+    elapsed = time.perf_counter() - start
+    calls = await llm_requests(client) - calls_before
+    return {"concurrency": concurrency,
+            "successes": len(latencies),
+            "errors": errors,
+            "throughput": len(latencies) / elapsed,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "llm_calls_per_request": (calls / len(latencies)
+                                      if latencies else None)}
+
+
+def format_row(result: dict) -> str:
+    """Format the result of a level as a line of the report."""
+    def seconds(value):
+        return f"{value:8.2f}" if value is not None else "       -"
+
+    calls = result["llm_calls_per_request"]
+    return (f"{result['concurrency']:>11} {result['successes']:>9} "
+            f"{result['errors']:>6} {result['throughput']:>10.2f} "
+            f"{seconds(result['p50'])} {seconds(result['p95'])} "
+            f"{seconds(result['p99'])} "
+            f"{calls if calls is None else round(calls, 1):>9}")
+
+
+async def main(args: argparse.Namespace):
+    """Run every concurrency level in turn and print the report."""
+    urls = [f"https://en.wikipedia.org/wiki/Benchmark_{size}"
+            for size in args.sizes]
+    results = []
+    async with httpx.AsyncClient(base_url=args.url,
+                                 timeout=args.timeout) as client:
+        print("concurrency successes errors throughput      p50      p95 "
+              "     p99 llm_calls")
+        for concurrency in args.concurrency:
+            result = await run_level(client, urls, concurrency,
+                                     args.requests or 4 * concurrency,
+                                     args.number_of_words)
+            results.append(result)
+            print(format_row(result))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000",
+                        help="The base URL of the backend.")
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 2, 4, 8, 16],
+                        help="The concurrency levels, run in turn.")
+    parser.add_argument("--requests", type=int, default=0,
+                        help="The requests per level, 4 per concurrent "
+                             "request by default.")
+    parser.add_argument("--sizes", nargs="+",
+                        default=["small", "medium", "large"],
+                        help="The sizes of the fixture articles, cycled "
+                             "over by the requests.")
+    parser.add_argument("--number-of-words", type=int, default=1000,
+                        help="The size requested for the summaries.")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="The timeout of each request in seconds.")
+    parser.add_argument("--output",
+                        help="Write the results of every level as JSON.")
+    asyncio.run(main(parser.parse_args()))
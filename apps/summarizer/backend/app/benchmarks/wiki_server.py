@@ -0,0 +1,110 @@
+"""Local stand-in of the Wikipedia APIs read by the loader.
+
+Serves generated articles named 'Benchmark_<size>' or 'Benchmark_<size>_<n>',
+where the size is one of ARTICLE_SIZES and the optional suffix gives
+distinct articles of the same size. Point the backend at it with
+WIKIPEDIA_BASE_URL=http://127.0.0.1:8081.
+
+Usage:
+    python -m backend.app.benchmarks.wiki_server --port 8081
+"""
+import argparse
+import functools
+import hashlib
+import random
+import re
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+
+from backend.app.benchmarks.fake_models import VOCABULARY
+
+
+# Number of sections of each size of article, of about 250 words each
+ARTICLE_SIZES = {"small": 4, "medium": 20, "large": 80, "huge": 240}
+SECTION_WORDS = 250
+TITLE_PATTERN = re.compile(r"^Benchmark_(?P<size>[a-z]+)(?:_(?P<n>\d+))?$")
+
+# Title of each page id served, since the text is fetched by page id
+PAGES: dict = {}
+
+wiki_app = FastAPI(title="Wikipedia fixture server")
+
+
+@functools.lru_cache(maxsize=256)
+def fixture_article(title: str) -> dict | None:
+    """
+    Generate the article of a title, always the same one.
+
+    Args:
+        title (str): The title of the article, with underscores.
+
+    Returns:
+        dict or None: The page id, revision id, title and plain text of the
+                      article, or None if the title is not a fixture.
+    """
+    title = title.replace(" ", "_")
+    match = TITLE_PATTERN.match(title)
+    if not match or match["size"] not in ARTICLE_SIZES:
+        return None
+    rng = random.Random(title)
+    paragraphs = []
+    for section in range(ARTICLE_SIZES[match["size"]]):
+        if section:
+            paragraphs.append(f"== Section {section} ==")
+        paragraphs.append(" ".join(rng.choice(VOCABULARY)
+                                   for _ in range(SECTION_WORDS)) + ".")
+    page_id = int(hashlib.sha256(title.encode()).hexdigest()[:8], 16)
+    return {"page_id": page_id,
+            "revision_id": page_id + 1,
+            "title": title.replace("_", " "),
+            "content": "\n\n".join(paragraphs)}
+
+
+def get_fixture(title: str) -> dict:
+    """Get the article of a title, or answer 404."""
+    article = fixture_article(title)
+    if article is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    # The loader asks for the text by the page id it was just given
+    PAGES[article["page_id"]] = title
+    return article
+
+
+@wiki_app.get("/w/rest.php/v1/page/{title}/bare")
+async def page_bare(title: str, request: Request):
+    """Answer the latest revision of a page, or 304 for a matching ETag."""
+    article = get_fixture(title)
+    etag = f'W/"{article["revision_id"]}"'
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse({"id": article["page_id"],
+                         "title": article["title"],
+                         "latest": {"id": article["revision_id"]}},
+                        headers={"ETag": etag})
+
+
+@wiki_app.get("/w/api.php")
+async def api_query(pageids: int):
+    """Answer the plain text extract and revision id of a page."""
+    if pageids not in PAGES:
+        raise HTTPException(status_code=404, detail="Page not found")
+    article = get_fixture(PAGES[pageids])
+    return {"query": {"pages": [{
+        "pageid": article["page_id"],
+        "title": article["title"],
+        "extract": article["content"],
+        "revisions": [{"revid": article["revision_id"]}]
+    }]}}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="The interface to listen on.")
+    parser.add_argument("--port", type=int, default=8081,
+                        help="The port to listen on.")
+    args = parser.parse_args()
+    uvicorn.run(wiki_app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,87 @@
+"""Serve the responses of the chains from a persistent cache"""
+import hashlib
+import json
+from typing import Any, AsyncIterator, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from backend.app.utils.config import (LLM_CACHE_ENABLED,
+                                      LLM_MODEL,
+                                      LLM_TEMPERATURE)
+from backend.app.utils.llm_cache import get_llm_response, put_llm_response
+
+
+class CachedChain(Runnable):
+    """
+    Wrap a prompt chain so identical calls are answered from the llm_cache
+    table instead of the LLM.
+
+    The key hashes the model name, the temperature, the rendered prompt and
+    the `token_max` of the call. Only the asynchronous calls are cached.
+
+    Attributes:
+        prompt (ChatPromptTemplate): The prompt at the head of the chain.
+        chain (Runnable): The chain, from the prompt to the parsed text.
+    """
+
+    def __init__(self, prompt: ChatPromptTemplate, chain: Runnable):
+        self.prompt = prompt
+        self.chain = chain
+
+    def cache_key(self, input: dict) -> str:
+        """
+        Build the cache key of a call.
+
+        Args:
+            input (dict): The input of the chain.
+
+        Returns:
+            str: The SHA-256 hex digest of the call.
+        """
+        payload = json.dumps([LLM_MODEL,
+                              LLM_TEMPERATURE,
+                              self.prompt.invoke(input).to_string(),
+                              input.get("token_max")])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def invoke(self, input: dict, config: Optional[RunnableConfig] = None,
+               **kwargs: Any) -> str:
+        """Call the chain synchronously, without the cache."""
+        return self.chain.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input: dict,
+                      config: Optional[RunnableConfig] = None,
+                      **kwargs: Any) -> str:
+        """Answer from the cache, or call the chain and store its answer."""
+        if not LLM_CACHE_ENABLED:
+            return await self.chain.ainvoke(input, config, **kwargs)
+        key = self.cache_key(input)
+        cached = await get_llm_response(key)
+        if cached is not None:
+            return cached
+        output = await self.chain.ainvoke(input, config, **kwargs)
+        await put_llm_response(key, output)
+        return output
+
+    async def astream(self, input: dict,
+                      config: Optional[RunnableConfig] = None,
+                      **kwargs: Optional[Any]) -> AsyncIterator[str]:
+        """
+        Stream the cached answer at once, or stream the chain and store its
+        answer once complete.
+        """
+        if not LLM_CACHE_ENABLED:
+            async for chunk in self.chain.astream(input, config, **kwargs):
+                yield chunk
+            return
+        key = self.cache_key(input)
+        cached = await get_llm_response(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        async for chunk in self.chain.astream(input, config, **kwargs):
+            parts.append(chunk)
+            yield chunk
+        await put_llm_response(key, "".join(parts))
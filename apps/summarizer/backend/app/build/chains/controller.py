@@ -0,0 +1,58 @@
+"""Keep the output of a chain within a token budget"""
+from collections import Counter
+
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable
+
+from backend.app.utils.config import GENERATION_MAX_ATTEMPTS
+from backend.app.utils.functions import (document_tokens,
+                                         to_document,
+                                         truncate_tokens)
+
+
+# Number of chunks by the number of attempts they needed, and number of
+# outputs that had to be truncated, in this process
+GENERATION_STATS = {"attempts_per_chunk": Counter(), "truncated": 0}
+
+# Fraction of the proportional target kept when tightening the length
+# instruction, so the next attempt lands below the limit
+TIGHTENING_MARGIN = 0.9
+
+
+async def generate_within_budget(chain: Runnable, req: dict, token_max: int,
+                                 max_attempts: int = GENERATION_MAX_ATTEMPTS
+                                 ) -> Document:
+    """
+    Invoke a chain until its output fits in `token_max` tokens.
+
+    Each attempt that overshoots asks the next one for a length reduced in
+    proportion to the overshoot. After `max_attempts` calls the last output
+    is truncated to `token_max` tokens, so a chunk never costs more than
+    `max_attempts` LLM calls.
+
+    Args:
+        chain (Runnable): The chain to invoke, taking `token_max` as the
+                          length instruction of its prompt.
+        req (dict): The other inputs of the chain.
+        token_max (int): The maximum number of tokens of the output.
+        max_attempts (int): The maximum number of calls to the chain, at
+                            least one call is always made.
+
+    Returns:
+        Document: The output of the chain, annotated with its tokens.
+    """
+    max_attempts = max(max_attempts, 1)
+    target = token_max
+    for attempt in range(1, max_attempts + 1):
+        output = to_document(
+            await chain.ainvoke({**req, "token_max": target})
+        )
+        n_tokens = document_tokens(output)
+        if n_tokens <= token_max:
+            GENERATION_STATS["attempts_per_chunk"][attempt] += 1
+            return output
+        target = max(1, int(target * token_max / n_tokens
+                            * TIGHTENING_MARGIN))
+    GENERATION_STATS["attempts_per_chunk"][max_attempts] += 1
+    GENERATION_STATS["truncated"] += 1
+    return truncate_tokens(output.page_content, token_max)
@@ -1,8 +1,11 @@
 """Map themes in chunks"""
+import functools
+
 from langchain_core.output_parsers import StrOutputParser
 from langchain.prompts import ChatPromptTemplate
 
-from backend.app.build.models import LLM
+from backend.app.build.chains.cache import CachedChain
+from backend.app.build.models import get_llm
 
 
 MAP_TEMPLATE = (
@@ -20,6 +23,11 @@ MAP_TEMPLATE = (
     """
 )
 
-# Create the prompt chain
 MAP_PROMPT = ChatPromptTemplate([("human", MAP_TEMPLATE)])
-map_chain = MAP_PROMPT | LLM | StrOutputParser()
+
+
+@functools.cache
+def get_map_chain() -> CachedChain:
+    """Create the prompt chain, answered from the LLM cache when possible."""
+    return CachedChain(MAP_PROMPT,
+                       MAP_PROMPT | get_llm() | StrOutputParser())
@@ -1,8 +1,11 @@
 """Reduce size of chunks"""
+import functools
+
 from langchain_core.output_parsers import StrOutputParser
 from langchain.prompts import ChatPromptTemplate
 
-from backend.app.build.models import LLM
+from backend.app.build.chains.cache import CachedChain
+from backend.app.build.models import get_llm
 
 
 REDUCE_TEMPLATE = (
@@ -17,6 +20,11 @@ REDUCE_TEMPLATE = (
     """
 )
 
-# Create the prompt chain
 REDUCE_PROMPT = ChatPromptTemplate([("human", REDUCE_TEMPLATE)])
-reduce_chain = REDUCE_PROMPT | LLM | StrOutputParser()
+
+
+@functools.cache
+def get_reduce_chain() -> CachedChain:
+    """Create the prompt chain, answered from the LLM cache when possible."""
+    return CachedChain(REDUCE_PROMPT,
+                       REDUCE_PROMPT | get_llm() | StrOutputParser())
@@ -0,0 +1,111 @@
+"""Persist the checkpoints of the summarizer graph in Postgres"""
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from backend.app.utils.async_db_connection import SCHEMA_LOCK_ID
+from backend.app.utils.config import (CHECKPOINT_DATABASE_URL,
+                                      CHECKPOINT_ENABLED,
+                                      CHECKPOINT_POOL_SIZE)
+
+
+# The saver needs a running event loop, so it is opened with the app
+_POOL: AsyncConnectionPool | None = None
+_SAVER: AsyncPostgresSaver | None = None
+
+
+async def open_checkpointer():
+    """
+    Open the connection pool of the checkpointer and create its tables,
+    when `CHECKPOINT_ENABLED` is set.
+    """
+    global _POOL, _SAVER
+    if not CHECKPOINT_ENABLED or _SAVER is not None:
+        return
+    _POOL = AsyncConnectionPool(CHECKPOINT_DATABASE_URL,
+                                max_size=CHECKPOINT_POOL_SIZE,
+                                kwargs={"autocommit": True,
+                                        "prepare_threshold": 0,
+                                        "row_factory": dict_row},
+                                open=False)
+    await _POOL.open()
+    _SAVER = AsyncPostgresSaver(_POOL)
+    # The workers of the app create the tables one at a time
+    async with _POOL.connection() as conn:
+        await conn.execute("SELECT pg_advisory_lock(%s)", (SCHEMA_LOCK_ID,))
+        try:
+            await _SAVER.setup()
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s)",
+                               (SCHEMA_LOCK_ID,))
+
+
+async def close_checkpointer():
+    """Close the connection pool of the checkpointer."""
+    global _POOL, _SAVER
+    if _POOL is not None:
+        await _POOL.close()
+    _POOL = None
+    _SAVER = None
+
+
+def get_checkpointer() -> AsyncPostgresSaver | None:
+    """
+    Get the checkpointer of the graphs.
+
+    Returns:
+        AsyncPostgresSaver or None: The checkpointer, or None when it is
+                                    disabled or not opened.
+    """
+    return _SAVER
+
+
+async def delete_checkpoints(thread_id: str):
+    """
+    Delete the checkpoints of a run once its summary is stored.
+
+    Args:
+        thread_id (str): The UUID of the summary the run belongs to.
+    """
+    if _POOL is None:
+        return
+    async with _POOL.connection() as conn:
+        for table in ("checkpoint_writes", "checkpoint_blobs", "checkpoints"):
+            await conn.execute(f"DELETE FROM {table} WHERE thread_id = %s",
+                               (thread_id,))
+
+
+# The threads whose last checkpoint, timestamped by LangGraph, is too old
+EXPIRED_THREADS = """
+SELECT thread_id FROM checkpoints
+GROUP BY thread_id
+HAVING max((checkpoint ->> 'ts')::timestamptz)
+       < now() - %s * interval '1 day'
+"""
+
+
+async def delete_expired_checkpoints(ttl_days: float) -> int:
+    """
+    Delete the checkpoints of the runs that failed or were abandoned, whose
+    last checkpoint is older than `ttl_days` days, as the successful runs
+    delete theirs as soon as their summary is stored.
+
+    Args:
+        ttl_days (float): The age after which a run can no longer resume.
+
+    Returns:
+        int: The number of runs whose checkpoints were deleted.
+    """
+    if _POOL is None:
+        return 0
+    async with _POOL.connection() as conn:
+        cursor = await conn.execute(EXPIRED_THREADS, (ttl_days,))
+        threads = [row["thread_id"] for row in await cursor.fetchall()]
+        if threads:
+            for table in ("checkpoint_writes", "checkpoint_blobs",
+                          "checkpoints"):
+                await conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ANY(%s)",
+                    (threads,)
+                )
+    return len(threads)
@@ -0,0 +1,120 @@
+"""Split Wikipedia plain text in chunks following its sections"""
+import re
+from typing import List
+
+from langchain_core.documents import Document
+
+
+# Section markers of the plain text extracts, like '== History =='
+HEADING_PATTERN = re.compile(r"^(={2,6})[ \t]*(.+?)[ \t]*\1[ \t]*$",
+                             re.MULTILINE)
+
+
+def split_into_sections(text: str) -> List[tuple]:
+    """
+    Split a plain text article at its section markers.
+
+    The heading of a section without any text of its own is kept with the
+    next section, and trailing empty sections are dropped.
+
+    Args:
+        text (str): The plain text of the article.
+
+    Returns:
+        List[tuple]: The start and end offsets of each section in the text
+                     and its path, the titles of its heading and of the
+                     headings above it, starting with the lead section.
+    """
+    sections = []
+    path = []
+    start = 0
+    body = 0
+    for match in HEADING_PATTERN.finditer(text):
+        if text[body:match.start()].strip():
+            sections.append((start, match.start(), list(path)))
+            start = match.start()
+        level = len(match.group(1)) - 1
+        path = path[:level - 1] + [match.group(2)]
+        body = match.end()
+    if text[body:].strip():
+        sections.append((start, len(text), list(path)))
+    return sections
+
+
+def common_path(paths: List[list]) -> list:
+    """Get the deepest section containing all the given paths."""
+    common = paths[0]
+    for path in paths[1:]:
+        n = 0
+        while n < min(len(common), len(path)) and common[n] == path[n]:
+            n += 1
+        common = common[:n]
+    return common
+
+
+def split_sections(text: str, chunk_size: int, chunk_overlap: int,
+                   encoding, isolate_sections: bool = False
+                   ) -> List[Document]:
+    """
+    Split a Wikipedia plain text article in chunks of tokens whose
+    boundaries fall on section markers where possible.
+
+    The sections are encoded once, in a single batch, and consecutive
+    sections are packed while they fit in `chunk_size` tokens. Packed
+    chunks are sliced from the text as is, without decoding. Only the
+    sections longer than a chunk are cut inside, in windows of tokens
+    sharing `chunk_overlap` tokens.
+
+    With `isolate_sections`, a chunk never spans two top-level sections, so
+    an edit in one section leaves the chunks of the others unchanged.
+
+    Args:
+        text (str): The plain text of the article.
+        chunk_size (int): The maximum number of tokens of a chunk.
+        chunk_overlap (int): The number of tokens shared by two windows of
+                             the same section.
+        encoding (tiktoken.Encoding): The encoding counting the tokens.
+        isolate_sections (bool): Whether to cut the chunks at every
+                                 top-level section.
+
+    Returns:
+        List[Document]: The chunks, annotated with their number of tokens
+                        and their section path.
+    """
+    sections = split_into_sections(text)
+    encoded = encoding.encode_ordinary_batch([text[start:end]
+                                              for start, end, _ in sections])
+    chunks = []
+    packed = []
+
+    def flush():
+        if packed:
+            chunks.append(Document(
+                text[packed[0][0]:packed[-1][1]],
+                metadata={"n_tokens": sum(n for _, _, _, n in packed),
+                          "section_path": common_path(
+                              [path for _, _, path, _ in packed]
+                          )}
+            ))
+            packed.clear()
+
+    step = max(chunk_size - chunk_overlap, 1)
+    for (start, end, path), tokens in zip(sections, encoded):
+        if len(tokens) > chunk_size:
+            flush()
+            for window in range(0, len(tokens), step):
+                piece = tokens[window:window + chunk_size]
+                chunks.append(Document(
+                    encoding.decode(piece),
+                    metadata={"n_tokens": len(piece), "section_path": path}
+                ))
+                if window + chunk_size >= len(tokens):
+                    break
+            continue
+        if sum(n for _, _, _, n in packed) + len(tokens) > chunk_size:
+            flush()
+        elif isolate_sections and packed and packed[-1][2][:1] != path[:1]:
+            flush()
+        packed.append((start, end, path, len(tokens)))
+    flush()
+    return chunks
@@ -0,0 +1,79 @@
+"""Drop the near-duplicate chunks of an article before they are summarized"""
+from typing import Callable, List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from backend.app.utils.metrics import DEDUP_CHUNKS, DEDUP_SAVED_TOKENS
+
+
+# Number of chunks seen and dropped, and tokens not sent to the map stage,
+# in this process
+DEDUP_STATS = {"chunks": 0, "dropped_chunks": 0, "saved_tokens": 0}
+
+
+def cluster_representatives(vectors: np.ndarray, threshold: float) -> list:
+    """
+    Cluster vectors greedily by cosine similarity.
+
+    Each vector joins the cluster of the first representative it is at
+    least `threshold` similar to, or becomes the representative of a new
+    cluster, so the first chunk of each cluster is kept.
+
+    Args:
+        vectors (np.ndarray): One row per chunk, in the order of the chunks.
+        threshold (float): The cosine similarity of near-duplicates.
+
+    Returns:
+        list: The indexes of the representatives, in increasing order.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    representatives = []
+    for i, vector in enumerate(unit):
+        similarity = (unit[representatives] @ vector).max(initial=-1)
+        if similarity < threshold:
+            representatives.append(i)
+    return representatives
+
+
+async def deduplicate_chunks(chunks: List[Document], embeddings: Embeddings,
+                             threshold: float,
+                             length_function: Callable[[List[Document]], int]
+                             ) -> List[Document]:
+    """
+    Keep one chunk per cluster of near-duplicate chunks.
+
+    When the embedding call fails, every chunk is kept.
+
+    Args:
+        chunks (List[Document]): The chunks, in the order of the article.
+        embeddings (Embeddings): The model embedding the chunks.
+        threshold (float): The cosine similarity of near-duplicates.
+        length_function (Callable[[List[Document]], int]): Counts the tokens
+                                                           of the chunks.
+
+    Returns:
+        List[Document]: The representatives, in the order of the article.
+    """
+    DEDUP_STATS["chunks"] += len(chunks)
+    if len(chunks) < 2:
+        return chunks
+    try:
+        vectors = await embeddings.aembed_documents(
+            [chunk.page_content for chunk in chunks]
+        )
+    except Exception as e:
+        print(f"Chunk deduplication skipped: {e}")
+        return chunks
+    kept = cluster_representatives(np.array(vectors), threshold)
+    saved_tokens = length_function(chunks) - length_function(
+        [chunks[i] for i in kept]
+    )
+    DEDUP_STATS["dropped_chunks"] += len(chunks) - len(kept)
+    DEDUP_STATS["saved_tokens"] += saved_tokens
+    DEDUP_CHUNKS.labels("kept").inc(len(kept))
+    DEDUP_CHUNKS.labels("dropped").inc(len(chunks) - len(kept))
+    DEDUP_SAVED_TOKENS.inc(saved_tokens)
+    return [chunks[i] for i in kept]
@@ -2,7 +2,6 @@
 from typing import Literal
 
 from backend.app.build.graphs.states import OverallState
-from backend.app.utils.functions import length_function
 
 
 def should_collapse(
@@ -11,22 +10,40 @@ def should_collapse(
     """
     Determine whether to collapse the summaries or generate the final summary.
 
-    This function acts as a conditional edge in the graph, deciding the next
-    step based on the number of tokens in the collapsed summaries.
+    This function acts as a conditional edge in the graph, running the
+    levels of the reduce plan computed before the map stage.
 
     Args:
         state (OverallState): The current state of the graph, containing the
-                              collapsed summaries and the maximum
-                              allowed tokens.
+                              reduce levels left to run.
 
     Returns:
         Literal["collapse_summaries", "generate_final_summary"]:
             The next step in the process, either to collapse the summaries
             or to generate the final summary.
     """
-    num_tokens = length_function(state["collapsed_summaries"])
-    n_docs = len(state["collapsed_summaries"])
-    if num_tokens > (state["token_max"]*n_docs):
+    if state["reduce_plan"]:
         return "collapse_summaries"
     else:
         return "generate_final_summary"
+
+
+def route_contents(
+    state: OverallState,
+) -> Literal["reuse_summaries", "split_chunks"]:
+    """
+    Determine whether the run starts from stored chunk summaries or from
+    the contents.
+
+    Args:
+        state (OverallState): The input state of the graph.
+
+    Returns:
+        Literal["reuse_summaries", "split_chunks"]:
+            'reuse_summaries' when the input carries the chunk summaries of
+            an earlier run, 'split_chunks' otherwise.
+    """
+    if state.get("summaries"):
+        return "reuse_summaries"
+    else:
+        return "split_chunks"
@@ -1,22 +1,113 @@
 """Define the Nodes of the LangGraph."""
-from langchain.chains.combine_documents.reduce import (
-    split_list_of_docs
-)
+import asyncio
+from itertools import accumulate
+
 from langchain_core.documents import Document
-from langchain.text_splitter import TokenTextSplitter
 from langgraph.constants import Send
 
-# from backend.app.build.chains.map import map_chain
-from backend.app.build.chains.reduce import reduce_chain
+# from backend.app.build.chains.map import get_map_chain
+from backend.app.build.chains.controller import generate_within_budget
+from backend.app.build.chains.reduce import REDUCE_TEMPLATE, get_reduce_chain
+from backend.app.build.chunker import split_sections
+from backend.app.build.dedup import deduplicate_chunks
 from backend.app.build.graphs.states import OverallState, SummaryState
-from backend.app.build.models import ENCODING
-from backend.app.utils.functions import length_function
+from backend.app.build.models import get_embedding, get_encoding
+from backend.app.build.planner import count_llm_calls, plan_reduce
+from backend.app.utils.config import (CHUNK_DEDUP_ENABLED,
+                                      CHUNK_DEDUP_THRESHOLD,
+                                      GENERATION_MAX_ATTEMPTS,
+                                      LLM_CONTEXT_WINDOW,
+                                      LLM_MAX_CALLS_PER_REQUEST,
+                                      MAP_SUMMARIES_ENABLED,
+                                      MAP_TOKEN_MAX,
+                                      NODE_MAX_CONCURRENCY,
+                                      REDUCE_MAX_FAN_IN,
+                                      SECTION_SUMMARIES_ENABLED)
+from backend.app.utils.functions import (count_tokens,
+                                         document_tokens,
+                                         gather_with_concurrency,
+                                         join_documents,
+                                         length_function,
+                                         to_document)
+from backend.app.utils.metrics import (COLLAPSE_LEVELS,
+                                       MAP_CHUNKS,
+                                       SUMMARY_BUDGET_USAGE,
+                                       instrument_node)
+from backend.app.utils.map_summaries import map_key, put_map_summaries
+from backend.app.utils.section_summaries import (get_section_summaries,
+                                                 put_section_summaries,
+                                                 section_key)
+
+
+class EmptyArticleError(ValueError):
+    """Raised when an article has no text left to summarize."""
+
+
+def map_token_max(token_max: int) -> int:
+    """
+    Get the size of the chunk summaries of a summary of `token_max` tokens,
+    the smallest tier `MAP_TOKEN_MAX` times a power of two that is not
+    below `token_max`, or `token_max` itself when `MAP_TOKEN_MAX` is 0.
+
+    The map stage of a revision is shared by the sizes of a tier, so a few
+    tiers reuse it for most requests, while a large summary is not reduced
+    from chunk summaries smaller than itself. The chunk summaries are at
+    most twice the requested size.
+
+    Args:
+        token_max (int): The size of the final summary.
+
+    Returns:
+        int: The maximum number of tokens of a chunk summary.
+    """
+    if not MAP_TOKEN_MAX:
+        return token_max
+    tier = MAP_TOKEN_MAX
+    while tier < token_max:
+        tier *= 2
+    return tier
 
 
-def collect_summaries(state: OverallState) -> dict:
+def reduce_input_tokens(token_max: int) -> int:
+    """
+    Get the maximum number of tokens of the summaries sent to one reduce
+    call, leaving room in the context window for the prompt and output.
+
+    Args:
+        token_max (int): The size of the final summary.
+
+    Returns:
+        int: The maximum number of input tokens of a reduce call.
+    """
+    return max(LLM_CONTEXT_WINDOW - token_max - count_tokens(REDUCE_TEMPLATE),
+               2 * token_max)
+
+
+def check_llm_calls(llm_calls: int) -> None:
+    """
+    Refuse a summary whose planned LLM calls exceed
+    `LLM_MAX_CALLS_PER_REQUEST`.
+
+    Args:
+        llm_calls (int): The number of planned LLM calls.
+
+    Raises:
+        ValueError: If the planned LLM calls exceed the budget.
+    """
+    if LLM_MAX_CALLS_PER_REQUEST and llm_calls > LLM_MAX_CALLS_PER_REQUEST:
+        raise ValueError(f"The summary needs {llm_calls} LLM calls, above "
+                         f"the budget of {LLM_MAX_CALLS_PER_REQUEST}")
+
+
+@instrument_node
+async def collect_summaries(state: OverallState) -> dict:
     """
     Collect summaries from the state.
 
+    When `MAP_SUMMARIES_ENABLED` is set, the summaries of the chunks of the
+    article are stored, so the other sizes of summary of the same revision
+    start from them.
+
     Args:
         state (OverallState): The current state containing summaries
                               and token_max.
@@ -24,87 +115,252 @@ def collect_summaries(state: OverallState) -> dict:
     Returns:
         dict: A dictionary with collapsed summaries and token_max.
     """
-    print("COLLECT_SUMMARIES")
-    summaries = []
-    for summary in state["summaries"]:
-        tokens = ENCODING.encode(summary)
-        print("Used:", len(tokens),
-              "Expected:", state["token_max"])
-        summaries.append(Document(summary))
+    article = state.get("article")
+    if MAP_SUMMARIES_ENABLED and article and "revision_id" in article:
+        key = map_key(article, map_token_max(state["token_max"]),
+                      REDUCE_TEMPLATE)
+        await put_map_summaries(key, article, state["summaries"])
     return {
-        "collapsed_summaries": summaries,
+        "collapsed_summaries": state["summaries"],
         "token_max": state["token_max"]
     }
 
 
+@instrument_node
+def reuse_summaries(state: OverallState) -> dict:
+    """
+    Plan the reduce of the chunk summaries stored by an earlier run over
+    the same article revision, skipping the split and map stages.
+
+    Args:
+        state (OverallState): The current state containing the stored
+                              summaries and token_max.
+
+    Returns:
+        dict: A dictionary with collapsed summaries, the reduce plan, the
+              number of planned LLM calls and token_max.
+
+    Raises:
+        ValueError: If the planned LLM calls exceed the budget.
+    """
+    token_max = state["token_max"]
+    summaries = state["summaries"]
+    reduce_plan = plan_reduce([document_tokens(doc) for doc in summaries],
+                              token_max, reduce_input_tokens(token_max),
+                              REDUCE_MAX_FAN_IN)
+    llm_calls = count_llm_calls(0, reduce_plan)
+    COLLAPSE_LEVELS.observe(len(reduce_plan))
+    check_llm_calls(llm_calls)
+    return {
+        "collapsed_summaries": summaries,
+        "reduce_plan": reduce_plan,
+        "llm_calls": llm_calls,
+        "token_max": token_max
+    }
+
+
+@instrument_node
 async def collapse_summaries(state: OverallState) -> dict:
     """
-    Collapse summaries into smaller chunks if they exceed the token limit.
+    Run the next level of the reduce plan.
+
+    The summaries are split in the consecutive groups planned for the level
+    and every group is reduced, concurrently, at most
+    `NODE_MAX_CONCURRENCY` at a time, keeping their order.
 
     Args:
-        state (OverallState): The current state containing collapsed summaries
-                              and token_max.
+        state (OverallState): The current state containing collapsed
+                              summaries, the reduce plan and token_max.
 
     Returns:
-        dict: A dictionary with updated collapsed summaries and token_max.
+        dict: A dictionary with updated collapsed summaries, the levels left
+              in the reduce plan and token_max.
     """
-    doc_lists = split_list_of_docs(
-        state["collapsed_summaries"],
-        length_function,
-        state["token_max"]
+    docs = state["collapsed_summaries"]
+    bounds = [0, *accumulate(state["reduce_plan"][0])]
+    # The last group takes any summary left, so none is ever dropped
+    bounds[-1] = len(docs)
+    doc_lists = [docs[start:end] for start, end in zip(bounds, bounds[1:])]
+    reqs = [{"docs": join_documents(doc_list),
+             "token_max": state["token_max"]} for doc_list in doc_lists]
+    # abatch keeps the order of the requests in its output
+    texts = await get_reduce_chain().abatch(
+        reqs, {"max_concurrency": NODE_MAX_CONCURRENCY}
     )
-    print("COLLAPSE_SUMMARIES")
-    for doc in doc_lists:
-        tokens = ENCODING.encode(doc[0].page_content)
-        print("Used:", len(tokens),
-              "Expected:", state["token_max"])
-    results = []
-    for doc_list in doc_lists:
-        req = {"docs": doc_list[0],
-               "token_max": state["token_max"]}
-        results.append(
-            Document(await reduce_chain.ainvoke(req))
-            )
+    results = [to_document(text) for text in texts]
+    for result in results:
+        SUMMARY_BUDGET_USAGE.labels("collapse").observe(
+            document_tokens(result) / state["token_max"]
+        )
 
     return {
         "collapsed_summaries": results,
+        "reduce_plan": state["reduce_plan"][1:],
         "token_max": state["token_max"]
     }
 
 
+async def summarize_chunk(doc: Document, token_max: int) -> Document:
+    """
+    Summarize one chunk of a document within the token limit.
+
+    The number of LLM calls per chunk is bounded by
+    `generate_within_budget`.
+
+    Args:
+        doc (Document): The chunk to summarize.
+        token_max (int): The maximum number of tokens allowed.
+
+    Returns:
+        Document: The summary of the chunk, annotated with its tokens.
+    """
+    summary = await generate_within_budget(get_reduce_chain(),
+                                           {"docs": join_documents(doc)},
+                                           token_max)
+    SUMMARY_BUDGET_USAGE.labels("map").observe(
+        document_tokens(summary) / token_max
+    )
+    return summary
+
+
+@instrument_node
+async def split_chunks(state: OverallState) -> dict:
+    """
+    Split the contents in chunks before the map stage, following the
+    sections of the articles.
+
+    When `CHUNK_DEDUP_ENABLED` is set, the chunks of all the contents are
+    embedded and only one chunk per cluster of near-duplicates is kept.
+    The chunks and their summaries are sized by `map_token_max`, so the same
+    map stage serves every size of summary. The reduce plan is computed
+    from the number of chunks left, and the summary is refused when its
+    planned LLM calls exceed `LLM_MAX_CALLS_PER_REQUEST`.
+
+    Args:
+        state (OverallState): The current state containing contents
+                              and token_max.
+
+    Returns:
+        dict: A dictionary with the chunks of each content, the reduce plan,
+              the number of planned LLM calls and token_max.
+
+    Raises:
+        EmptyArticleError: If the contents have no text to summarize.
+        ValueError: If the planned LLM calls exceed the budget.
+    """
+    token_max = state["token_max"]
+    map_max = map_token_max(token_max)
+    chunks = []
+    for content in state["contents"]:
+        # Encoding a whole article is CPU bound, keep it off the event loop
+        chunks.append(await asyncio.to_thread(split_sections,
+                                              content,
+                                              map_max*4,
+                                              100,
+                                              get_encoding(),
+                                              SECTION_SUMMARIES_ENABLED))
+    if CHUNK_DEDUP_ENABLED:
+        kept = await deduplicate_chunks(
+            [chunk for content_chunks in chunks for chunk in content_chunks],
+            get_embedding(),
+            CHUNK_DEDUP_THRESHOLD,
+            length_function
+        )
+        kept_ids = {id(chunk) for chunk in kept}
+        chunks = [[chunk for chunk in content_chunks
+                   if id(chunk) in kept_ids] for content_chunks in chunks]
+    chunks = [content_chunks for content_chunks in chunks if content_chunks]
+    if not chunks:
+        raise EmptyArticleError("The article has no text to summarize")
+
+    # Every chunk summary is bounded to map_max tokens, so the whole tree
+    # of reduce calls is known before the map stage
+    n_chunks = sum(len(content_chunks) for content_chunks in chunks)
+    reduce_plan = plan_reduce([map_max] * n_chunks, token_max,
+                              reduce_input_tokens(token_max),
+                              REDUCE_MAX_FAN_IN)
+    llm_calls = count_llm_calls(n_chunks, reduce_plan,
+                                GENERATION_MAX_ATTEMPTS)
+    for content_chunks in chunks:
+        MAP_CHUNKS.observe(len(content_chunks))
+    COLLAPSE_LEVELS.observe(len(reduce_plan))
+    check_llm_calls(llm_calls)
+    return {
+        "chunks": chunks,
+        "reduce_plan": reduce_plan,
+        "llm_calls": llm_calls,
+        "token_max": token_max
+    }
+
+
+@instrument_node
 async def generate_summary(state: SummaryState) -> dict:
     """
     Generate a summary for a given document.
 
+    The chunks of the document are summarized concurrently, at most
+    `NODE_MAX_CONCURRENCY` at a time, keeping the order of the chunks
+    in the output.
+
+    When `SECTION_SUMMARIES_ENABLED` is set, the chunks are keyed by a hash
+    of their text, and only the chunks without a stored summary are sent
+    to the LLM. The chunks follow the top-level sections, so a new revision
+    of an article only summarizes again the sections it edited.
+
+    Args:
+        state (SummaryState): The current state containing chunks
+                              and token_max.
+
+    Returns:
+        dict: A dictionary with generated summaries.
+    """
+    token_max = state["token_max"]
+    chunks = state["chunks"]
+    if not SECTION_SUMMARIES_ENABLED:
+        response = await gather_with_concurrency(
+            NODE_MAX_CONCURRENCY,
+            [summarize_chunk(doc, token_max) for doc in chunks]
+        )
+        return {"summaries": response}
+
+    keys = [section_key(doc.page_content, token_max, REDUCE_TEMPLATE)
+            for doc in chunks]
+    stored = await get_section_summaries(keys)
+    missing = {key: doc for key, doc in zip(keys, chunks)
+               if key not in stored}
+    summaries = await gather_with_concurrency(
+        NODE_MAX_CONCURRENCY,
+        [summarize_chunk(doc, token_max) for doc in missing.values()]
+    )
+    new = {key: (summary.page_content, document_tokens(summary))
+           for key, summary in zip(missing, summaries)}
+    await put_section_summaries(new)
+    stored.update(new)
+    response = [to_document(*stored[key]) for key in keys]
+    return {
+        "summaries": response
+    }
+
+
+@instrument_node
+def prepare_final_summary(state: OverallState) -> dict:
+    """
+    Stand in for `generate_final_summary` when the caller streams the final
+    summary itself from the collapsed summaries.
+
     Args:
-        state (SummaryState): The current state containing content
+        state (OverallState): The current state containing collapsed summaries
                               and token_max.
 
     Returns:
-        dict: A dictionary with generated summaries and token_max.
-    """
-    print("GENERATE_SUMMARY")
-    text_splitter = TokenTextSplitter(chunk_size=state["token_max"]*4,
-                                      chunk_overlap=100)
-    raw_doc = Document(state["content"])
-    docs = text_splitter.split_documents([raw_doc])
-    response = []
-    for doc in docs:
-        req = {"docs": doc,
-               "token_max": state["token_max"]}
-        tokens = list(range(-1, state['token_max']))
-        while len(tokens) > state["token_max"]:
-            text = await reduce_chain.ainvoke(req)
-            tokens = ENCODING.encode(text)
-        response.append(text)
-        print("Used:", len(tokens),
-              "Expected:", state["token_max"])
+        dict: A dictionary with token_max.
+    """
     return {
-        "summaries": response,
         "token_max": state["token_max"]
     }
 
 
+@instrument_node
 async def generate_final_summary(state: OverallState) -> dict:
     """
     Generate the final summary from collapsed summaries.
@@ -116,14 +372,12 @@ async def generate_final_summary(state: OverallState) -> dict:
     Returns:
         dict: A dictionary with the final summary and token_max.
     """
-    print("GENERATE_FINAL_SUMMARY")
-    for doc in state["collapsed_summaries"]:
-        tokens = ENCODING.encode(doc.page_content)
-        print("Used:", len(tokens),
-              "Expected:", state["token_max"])
-    req = {"docs": state["collapsed_summaries"],
+    req = {"docs": join_documents(state["collapsed_summaries"]),
            "token_max": state["token_max"]}
-    response = await reduce_chain.ainvoke(req)
+    response = await get_reduce_chain().ainvoke(req)
+    SUMMARY_BUDGET_USAGE.labels("final").observe(
+        count_tokens(response) / state["token_max"]
+    )
     return {
         "final_summary": response,
         "token_max": state["token_max"]
@@ -135,19 +389,20 @@ def map_summaries(state: OverallState) -> list:
     Define the logic to map out over the documents.
 
     Args:
-        state (OverallState): The current state containing contents
-                              and token_max.
+        state (OverallState): The current state containing the chunks of
+                              each content and token_max.
 
     Returns:
         list: A list of `Send` objects with the name of a node in the graph
-              and the state to send to that node.
+              and the state to send to that node, with the size of the
+              chunk summaries as token_max.
     """
     return [
         Send(
             "generate_summary",
             {
-                "content": content,
-                "token_max": state["token_max"]
+                "chunks": chunks,
+                "token_max": map_token_max(state["token_max"])
             }
-        ) for content in state["contents"]
+        ) for chunks in state["chunks"]
     ]
@@ -14,16 +14,30 @@ class OverallState(TypedDict):
 
     Attributes:
         contents (List[str]): The list of input document contents.
+        article (dict): The metadata of the article, with its URL as
+                        source, kept in the checkpoints to resume the run.
         token_max (int): The maximum number of tokens allowed.
+        chunks (List[List[Document]]): The chunks of each content left to
+                                       summarize.
+        reduce_plan (List[List[int]]): The group sizes of the reduce levels
+                                       left to run before the final one.
+        llm_calls (int): The maximum LLM calls planned for the summary.
         summaries (Annotated[list, operator.add]):
-            The combined list of summaries generated from individual nodes.
+            The combined list of summaries generated from individual nodes,
+            or stored by an earlier run over the same article revision, as
+            Document objects annotated with their number of tokens.
         collapsed_summaries (List[Document]):
-            The list of collapsed summaries as Document objects.
+            The list of collapsed summaries as Document objects annotated
+            with their number of tokens.
         final_summary (str):
             The final summary generated from the collapsed summaries.
     """
     contents: List[str]
+    article: dict
     token_max: int
+    chunks: List[List[Document]]
+    reduce_plan: List[List[int]]
+    llm_calls: int
     summaries: Annotated[list, operator.add]
     collapsed_summaries: List[Document]
     final_summary: str
@@ -36,8 +50,9 @@ class SummaryState(TypedDict):
     This state is mapped to all documents to generate individual summaries.
 
     Attributes:
-        content (str): The content of the document to be summarized.
-        token_max (int): The maximum number of tokens allowed.
+        chunks (List[Document]): The chunks of the document to be
+                                 summarized.
+        token_max (int): The maximum number of tokens of a chunk summary.
     """
-    content: str
+    chunks: List[Document]
     token_max: int
@@ -1,28 +1,65 @@
 """Build LangGraph workflow"""
+import functools
+from typing import Callable
+
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 
-from backend.app.build.graphs.edges import should_collapse
+from backend.app.build.graphs.edges import route_contents, should_collapse
 from backend.app.build.graphs.nodes import (collapse_summaries,
                                             collect_summaries,
                                             generate_final_summary,
                                             generate_summary,
-                                            map_summaries)
+                                            map_summaries,
+                                            prepare_final_summary,
+                                            reuse_summaries,
+                                            split_chunks)
 from backend.app.build.graphs.states import OverallState
 
 
-# Construct the graph
-# Nodes:
-graph = StateGraph(OverallState)
-graph.add_node("generate_summary", generate_summary)
-graph.add_node("collect_summaries", collect_summaries)
-graph.add_node("collapse_summaries", collapse_summaries)
-graph.add_node("generate_final_summary", generate_final_summary)
+def build_graph(final_node: Callable = generate_final_summary) -> StateGraph:
+    """
+    Construct the summarizer graph.
+
+    Args:
+        final_node (Callable): The node run after the summaries are
+                               collapsed, `generate_final_summary` by
+                               default.
+
+    Returns:
+        StateGraph: The graph, ready to be compiled.
+    """
+    # Nodes:
+    graph = StateGraph(OverallState)
+    graph.add_node("split_chunks", split_chunks)
+    graph.add_node("reuse_summaries", reuse_summaries)
+    graph.add_node("generate_summary", generate_summary)
+    graph.add_node("collect_summaries", collect_summaries)
+    graph.add_node("collapse_summaries", collapse_summaries)
+    graph.add_node("generate_final_summary", final_node)
+
+    # Edges:
+    graph.add_conditional_edges(START, route_contents)
+    graph.add_conditional_edges("split_chunks", map_summaries,
+                                ["generate_summary"])
+    graph.add_edge("generate_summary", "collect_summaries")
+    graph.add_conditional_edges("collect_summaries", should_collapse)
+    graph.add_conditional_edges("reuse_summaries", should_collapse)
+    graph.add_conditional_edges("collapse_summaries", should_collapse)
+    graph.add_edge("generate_final_summary", END)
+    return graph
+
+
+@functools.cache
+def get_summarizer_graph() -> CompiledStateGraph:
+    """Compile the summarizer graph on its first use."""
+    return build_graph().compile()
 
-# Edges:
-graph.add_conditional_edges(START, map_summaries, ["generate_summary"])
-graph.add_edge("generate_summary", "collect_summaries")
-graph.add_conditional_edges("collect_summaries", should_collapse)
-graph.add_conditional_edges("collapse_summaries", should_collapse)
-graph.add_edge("generate_final_summary", END)
 
-SUMMARIZER_GRAPH = graph.compile()
+@functools.cache
+def get_collapse_graph() -> CompiledStateGraph:
+    """
+    Compile the same graph stopping before the final reduce, so its tokens
+    can be streamed to the client.
+    """
+    return build_graph(prepare_final_summary).compile()
@@ -0,0 +1,260 @@
+"""Rate limit and back off the calls made to the language model"""
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from backend.app.utils.metrics import LLM_CALL_DURATION, LLM_TOKENS
+
+
+class TokenBucket:
+    """
+    A bucket refilled continuously up to its capacity per minute.
+
+    The level may go below zero when more is consumed than was reserved,
+    which delays the next acquisitions until the debt is refilled.
+
+    Attributes:
+        capacity (float): The maximum level, and the refill per minute.
+        level (float): The current level.
+    """
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.level = capacity
+        self._rate = capacity / 60
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity,
+                         self.level + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Compute how long to wait before `amount` can be consumed.
+
+        Amounts above the capacity only wait for a full bucket.
+
+        Args:
+            amount (float): The amount to consume.
+
+        Returns:
+            float: The number of seconds to wait.
+        """
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0) / self._rate
+
+    def consume(self, amount: float):
+        """Remove `amount` from the bucket."""
+        self._refill()
+        self.level -= amount
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Tell whether an error of the provider is worth retrying, that is a
+    429 (rate limited) or a 5xx (server) error.
+
+    Args:
+        error (BaseException): The error raised by the model, or by the
+                               wrapper of the provider client.
+
+    Returns:
+        bool: True if the call should be retried.
+    """
+    while error is not None:
+        code = getattr(error, "code", None)
+        if code is None:
+            code = getattr(error, "status_code", None)
+        if isinstance(code, int):
+            return code == 429 or code >= 500
+        error = error.__cause__
+    return False
+
+
+class LLMRateLimiter:
+    """
+    Process-wide limiter of the requests and tokens sent to a model.
+
+    Two token buckets bound the requests per minute and the tokens per
+    minute. Callers are admitted in arrival order, and calls failing with a
+    429 or 5xx error are retried after a jittered exponential backoff,
+    going through the buckets again.
+
+    Attributes:
+        requests (TokenBucket): The requests per minute bucket.
+        tokens (TokenBucket): The tokens per minute bucket.
+        stats (dict): The number of calls waiting and in flight, the
+                      highest waiting queue seen, and the totals of
+                      requests, retries and failures.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int,
+                 max_retries: int = 5, base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"waiting": 0, "in_flight": 0, "max_waiting": 0,
+                      "requests": 0, "retries": 0, "failures": 0}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, n_tokens: int):
+        """
+        Wait until a request of `n_tokens` tokens fits in both buckets.
+
+        Args:
+            n_tokens (int): The tokens reserved for the request.
+        """
+        self.stats["waiting"] += 1
+        self.stats["max_waiting"] = max(self.stats["max_waiting"],
+                                        self.stats["waiting"])
+        try:
+            # The lock keeps the waiting callers in arrival order
+            async with self._lock:
+                while True:
+                    delay = max(self.requests.wait_time(1),
+                                self.tokens.wait_time(n_tokens))
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                self.requests.consume(1)
+                self.tokens.consume(n_tokens)
+        finally:
+            self.stats["waiting"] -= 1
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Compute the delay before a retry, with full jitter.
+
+        Args:
+            attempt (int): The number of the failed attempt, from 0.
+
+        Returns:
+            float: The number of seconds to wait.
+        """
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    async def call(self, func: Callable[[], Awaitable], n_tokens: int) -> Any:
+        """
+        Run a call to the model within the limits, retrying it on 429 and
+        5xx errors.
+
+        Args:
+            func (Callable[[], Awaitable]): Makes the call to the model.
+            n_tokens (int): The tokens reserved for the call.
+
+        Returns:
+            Any: The result of the call.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(n_tokens)
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            start = time.perf_counter()
+            outcome = "success"
+            try:
+                return await func()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self.stats["failures"] += 1
+                    outcome = "failure"
+                    raise
+                self.stats["retries"] += 1
+                outcome = "retry"
+            finally:
+                self.stats["in_flight"] -= 1
+                LLM_CALL_DURATION.labels(outcome).observe(
+                    time.perf_counter() - start
+                )
+            await asyncio.sleep(self.backoff(attempt))
+
+
+class RateLimitedChatModel(Runnable):
+    """
+    Wrap a chat model so every call goes through a shared limiter.
+
+    The tokens of the prompt are reserved before the call and the tokens of
+    the answer are charged to the tokens bucket once it is received.
+
+    Attributes:
+        model (BaseChatModel): The wrapped chat model.
+        limiter (LLMRateLimiter): The limiter shared by the chains.
+        count_tokens (Callable[[str], int]): Counts the tokens of a text.
+    """
+
+    def __init__(self, model: BaseChatModel, limiter: LLMRateLimiter,
+                 count_tokens: Callable[[str], int]):
+        self.model = model
+        self.limiter = limiter
+        self.count_tokens = count_tokens
+
+    def _prompt_tokens(self, input: Any) -> int:
+        text = input.to_string() if hasattr(input, "to_string") else str(input)
+        return self.count_tokens(text)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None,
+               **kwargs: Any) -> Any:
+        """
+        Call the model within the limits of the shared limiter, from code
+        running outside of an event loop.
+
+        Raises:
+            RuntimeError: If an event loop is running in this thread, where
+                          `ainvoke` must be awaited instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.ainvoke(input, config, **kwargs))
+        raise RuntimeError("RateLimitedChatModel.invoke cannot run inside "
+                           "an event loop, await ainvoke instead")
+
+    async def ainvoke(self, input: Any,
+                      config: Optional[RunnableConfig] = None,
+                      **kwargs: Any) -> Any:
+        """Call the model within the limits of the shared limiter."""
+        prompt_tokens = self._prompt_tokens(input)
+        message = await self.limiter.call(
+            lambda: self.model.ainvoke(input, config, **kwargs),
+            prompt_tokens
+        )
+        n_tokens = self.count_tokens(str(message.content))
+        self.limiter.tokens.consume(n_tokens)
+        LLM_TOKENS.labels("in").observe(prompt_tokens)
+        LLM_TOKENS.labels("out").observe(n_tokens)
+        return message
+
+    async def astream(self, input: Any,
+                      config: Optional[RunnableConfig] = None,
+                      **kwargs: Optional[Any]) -> AsyncIterator:
+        """
+        Stream the answer of the model within the limits of the shared
+        limiter. Only the opening of the stream is retried.
+        """
+        stream = None
+
+        async def open_stream():
+            nonlocal stream
+            stream = aiter(self.model.astream(input, config, **kwargs))
+            return await anext(stream, None)
+
+        prompt_tokens = self._prompt_tokens(input)
+        chunk = await self.limiter.call(open_stream, prompt_tokens)
+        n_tokens = 0
+        while chunk is not None:
+            n_tokens += self.count_tokens(str(chunk.content))
+            yield chunk
+            chunk = await anext(stream, None)
+        self.limiter.tokens.consume(n_tokens)
+        LLM_TOKENS.labels("in").observe(prompt_tokens)
+        LLM_TOKENS.labels("out").observe(n_tokens)
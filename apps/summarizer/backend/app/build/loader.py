@@ -1,20 +1,71 @@
 """Define Loaders of documents in this app"""
+import asyncio
 import re
-import wikipedia as wk
+from typing import Dict, List, Tuple
+from urllib.parse import quote, unquote
 
+import httpx
 from langchain_core.documents import Document
 
+from backend.app.utils.article_cache import (get_article_by_title,
+                                             get_article_revision,
+                                             put_article)
+from backend.app.utils.config import (ARTICLE_CACHE_ENABLED,
+                                      WIKIPEDIA_BASE_URL,
+                                      WIKIPEDIA_MAX_CONNECTIONS,
+                                      WIKIPEDIA_TIMEOUT)
+from backend.app.utils.metrics import (WIKIPEDIA_REQUEST_DURATION,
+                                       count_lookup,
+                                       timed)
 
-def load_article_content(url: str) -> Document:
+
+# Pooled HTTP clients, one per Wikipedia language
+_CLIENTS: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_client(language: str) -> httpx.AsyncClient:
     """
-    Load content from a Wikipedia article given its URL.
+    Get the pooled HTTP client of a Wikipedia language, creating it on the
+    first use.
+
+    Args:
+        language (str): The language code of the Wikipedia.
+
+    Returns:
+        httpx.AsyncClient: The client, following redirects.
+    """
+    client = _CLIENTS.get(language)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=WIKIPEDIA_BASE_URL.format(language=language),
+            follow_redirects=True,
+            timeout=WIKIPEDIA_TIMEOUT,
+            limits=httpx.Limits(max_connections=WIKIPEDIA_MAX_CONNECTIONS),
+            headers={"User-Agent": "wikipedia-summarizer-api/0.1"}
+        )
+        _CLIENTS[language] = client
+    return client
+
+
+async def close_clients():
+    """Close the HTTP clients of every language."""
+    clients = list(_CLIENTS.values())
+    _CLIENTS.clear()
+    await asyncio.gather(*(client.aclose() for client in clients))
+
+
+def parse_article_url(url: str) -> Tuple[str, str]:
+    """
+    Extract the language code and the title of a Wikipedia article URL.
 
     Args:
         url (str): The URL of the Wikipedia article.
 
     Returns:
-        Document: A Document object containing the plain text content of the
-                  Wikipedia page.
+        Tuple[str, str]: The language code, 'en' by default, and the title.
+
+    Raises:
+        ValueError: If the URL has no article slug.
     """
     # Regular expression to match the language code
     l_pattern = r"https://(.*?)\.wikipedia\.org/"
@@ -22,28 +73,149 @@ def load_article_content(url: str) -> Document:
 
     l_match = re.search(l_pattern, url)
     t_match = re.search(t_pattern, url)
-    if l_match:
-        l_code = l_match.group(1)
-        print(f"The language code is: {l_code}")
-    else:
-        l_code = 'en'
-        print("No language code found in the URL, using default 'en'.")
-    if t_match:
-        slug = t_match.group(1)
-        title = slug.replace("_", " ")
-        print(f"The article slug is: {slug}")
-        print(f"The article title is: {title}")
-    else:
-        print("No slug found in the URL,",
-              "please provide a full URL of an article.")
-
-    # Specify the language of the Wikipedia page
-    wk.set_lang(l_code)
-    # Specify the title of the Wikipedia page
-    wiki = wk.page(title)
-
-    # Extract the plain text content of the page, excluding images, tables,
-    # and other data.
-    raw_doc = Document(page_content=wiki.content)
-
-    return raw_doc
+    l_code = l_match.group(1) if l_match else 'en'
+    if not t_match:
+        raise ValueError("No slug found in the URL, "
+                         "please provide a full URL of an article.")
+    title = unquote(t_match.group(1)).replace("_", " ")
+    return l_code, title
+
+
+@timed(WIKIPEDIA_REQUEST_DURATION, "revision")
+async def fetch_latest_revision(client: httpx.AsyncClient, title: str,
+                                etag: str | None = None) -> dict | None:
+    """
+    Fetch the page id and latest revision id of an article.
+
+    When the ETag of a stored revision is given the request is conditional
+    and the server answers 304 if that revision is still the latest one.
+
+    Args:
+        client (httpx.AsyncClient): The client of the article language.
+        title (str): The title of the article.
+        etag (str, optional): The ETag of the stored revision.
+
+    Returns:
+        dict or None: The page id, revision id, canonical title and ETag of
+                      the latest revision, or None if the stored revision
+                      is still the latest one.
+
+    Raises:
+        ValueError: If the article does not exist.
+    """
+    headers = {"If-None-Match": etag} if etag else {}
+    response = await client.get(
+        f"/w/rest.php/v1/page/{quote(title.replace(' ', '_'), safe='')}/bare",
+        headers=headers
+    )
+    if response.status_code == 304:
+        return None
+    if response.status_code == 404:
+        raise ValueError(f"Wikipedia article not found: {title}")
+    response.raise_for_status()
+    data = response.json()
+    return {"page_id": int(data["id"]),
+            "revision_id": int(data["latest"]["id"]),
+            "title": data["title"],
+            "etag": response.headers.get("ETag")}
+
+
+@timed(WIKIPEDIA_REQUEST_DURATION, "text")
+async def fetch_article_text(client: httpx.AsyncClient,
+                             page_id: int) -> Tuple[str, int]:
+    """
+    Fetch the plain text content of an article, excluding images, tables,
+    and other data.
+
+    Args:
+        client (httpx.AsyncClient): The client of the article language.
+        page_id (int): The Wikipedia page id of the article.
+
+    Returns:
+        Tuple[str, int]: The plain text and its revision id.
+    """
+    response = await client.get("/w/api.php", params={
+        "action": "query",
+        "format": "json",
+        "formatversion": 2,
+        "prop": "extracts|revisions",
+        "explaintext": 1,
+        "rvprop": "ids",
+        "pageids": page_id,
+    })
+    response.raise_for_status()
+    page = response.json()["query"]["pages"][0]
+    return page["extract"], int(page["revisions"][0]["revid"])
+
+
+async def load_article_content(url: str) -> Document:
+    """
+    Load content from a Wikipedia article given its URL.
+
+    The text is served from the wiki_articles table when its revision is
+    still the latest one, which is checked with a conditional request.
+
+    Args:
+        url (str): The URL of the Wikipedia article.
+
+    Returns:
+        Document: A Document object containing the plain text content of the
+                  Wikipedia page, with its URL as source and the language,
+                  title, page id and revision id of the page in its
+                  metadata.
+    """
+    l_code, title = parse_article_url(url)
+    client = get_client(l_code)
+
+    stored = None
+    if ARTICLE_CACHE_ENABLED:
+        stored = await get_article_by_title(l_code, title)
+    latest = await fetch_latest_revision(client, title,
+                                         stored["etag"] if stored else None)
+    if latest is None:
+        # The stored text is still the latest revision
+        count_lookup("article", True)
+    if latest is not None:
+        stored = None
+        if ARTICLE_CACHE_ENABLED:
+            stored = await get_article_revision(l_code,
+                                                latest["page_id"],
+                                                latest["revision_id"])
+            count_lookup("article", stored is not None)
+        if stored is None:
+            content, revision_id = await fetch_article_text(
+                client, latest["page_id"]
+            )
+            stored = {"page_id": latest["page_id"],
+                      "revision_id": revision_id,
+                      "title": latest["title"],
+                      "content": content}
+        if ARTICLE_CACHE_ENABLED:
+            # Store the new text or refresh the ETag of the stored one
+            await put_article(l_code, stored["page_id"],
+                              stored["revision_id"], latest["title"],
+                              latest["etag"], stored["content"])
+
+    return Document(page_content=stored["content"],
+                    metadata={"source": url,
+                              "language": l_code,
+                              "title": stored["title"],
+                              "page_id": stored["page_id"],
+                              "revision_id": stored["revision_id"]})
+
+
+async def load_articles(urls: List[str]) -> Dict[str, Document | Exception]:
+    """
+    Load several Wikipedia articles concurrently.
+
+    Args:
+        urls (List[str]): The URLs of the Wikipedia articles.
+
+    Returns:
+        Dict[str, Document | Exception]: The loaded article of each URL, or
+                                         the error raised while loading it.
+    """
+    urls = list(dict.fromkeys(urls))
+    docs = await asyncio.gather(*(load_article_content(url) for url in urls),
+                                return_exceptions=True)
+    return dict(zip(urls, docs))
@@ -1,19 +1,115 @@
 """Define models used in this app"""
-from langchain_google_genai import (ChatGoogleGenerativeAI,
-                                    GoogleGenerativeAIEmbeddings)
-import tiktoken
+import asyncio
+import functools
+from typing import TYPE_CHECKING
 
-from backend.app.utils.config import GOOGLE_API_KEY
+from langchain_core.embeddings import Embeddings
 
+from backend.app.build.limiter import LLMRateLimiter, RateLimitedChatModel
+from backend.app.utils.config import (FAKE_LLM_LATENCY,
+                                      FAKE_LLM_OUTPUT_WORDS,
+                                      GOOGLE_API_KEY,
+                                      LLM_BACKEND,
+                                      LLM_BACKOFF_BASE,
+                                      LLM_BACKOFF_MAX,
+                                      LLM_MAX_RETRIES,
+                                      LLM_MODEL,
+                                      LLM_REQUESTS_PER_MINUTE,
+                                      LLM_TEMPERATURE,
+                                      LLM_TOKENS_PER_MINUTE,
+                                      TOKEN_ENCODING)
 
-# Initialize the language model
-LLM = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest",
-                             api_key=GOOGLE_API_KEY,
-                             temperature=0)
+if TYPE_CHECKING:
+    import tiktoken
 
-# Initialize the embedding model
-EMBEDDING = GoogleGenerativeAIEmbeddings(model="models/embedding-001",
-                                         google_api_key=GOOGLE_API_KEY)
 
-# Get the encoding for the GPT-2 model
-ENCODING = tiktoken.get_encoding("gpt2")
+# Limiter shared by every chain calling the language model
+LLM_LIMITER = LLMRateLimiter(LLM_REQUESTS_PER_MINUTE,
+                             LLM_TOKENS_PER_MINUTE,
+                             max_retries=LLM_MAX_RETRIES,
+                             base_delay=LLM_BACKOFF_BASE,
+                             max_delay=LLM_BACKOFF_MAX)
+
+
+def encoding_for_model(model: str) -> "tiktoken.Encoding":
+    """
+    Get the tiktoken encoding closest to the tokenizer of the given model.
+
+    Gemini tokenizers are not available locally, so models unknown to
+    tiktoken fall back to the `TOKEN_ENCODING` encoding, whose large
+    vocabulary approximates them better than GPT-2.
+
+    Args:
+        model (str): The name of the chat model.
+
+    Returns:
+        tiktoken.Encoding: The encoding used to count tokens.
+    """
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+
+
+# The models are built on their first use, or by `load_models`, so importing
+# the app does not load the provider clients nor the token encoding
+@functools.cache
+def get_encoding() -> "tiktoken.Encoding":
+    """Get the encoding counting the tokens of the language model."""
+    return encoding_for_model(LLM_MODEL)
+
+
+@functools.cache
+def get_llm() -> RateLimitedChatModel:
+    """
+    Get the chat model, answering offline when `LLM_BACKEND` is 'fake'.
+
+    Returns:
+        RateLimitedChatModel: The chat model, called through the limiter
+                              shared by every chain.
+    """
+    if LLM_BACKEND == "fake":
+        from backend.app.benchmarks.fake_models import FakeChatModel
+
+        model = FakeChatModel(latency=FAKE_LLM_LATENCY,
+                              output_words=FAKE_LLM_OUTPUT_WORDS)
+    else:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        # The limiter alone retries the calls, so every request goes
+        # through its buckets and is counted in its stats
+        model = ChatGoogleGenerativeAI(model=LLM_MODEL,
+                                       api_key=GOOGLE_API_KEY,
+                                       temperature=LLM_TEMPERATURE,
+                                       max_retries=0)
+    return RateLimitedChatModel(model,
+                                LLM_LIMITER,
+                                lambda text: len(get_encoding().encode(text)))
+
+
+@functools.cache
+def get_embedding() -> Embeddings:
+    """Get the embedding model, a deterministic one for the benchmarks."""
+    if LLM_BACKEND == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        return DeterministicFakeEmbedding(size=768)
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return GoogleGenerativeAIEmbeddings(model="models/embedding-001",
+                                        google_api_key=GOOGLE_API_KEY)
+
+
+async def load_models():
+    """
+    Build the models ahead of the first request, in a thread so the event
+    loop keeps serving the probes meanwhile.
+    """
+    def build():
+        get_encoding().encode("warm up")
+        get_llm()
+        get_embedding()
+
+    await asyncio.to_thread(build)
@@ -0,0 +1,311 @@
+"""Run the summarization pipeline for one article"""
+import asyncio
+from typing import AsyncIterator
+
+from langchain_core.documents import Document
+
+from langgraph.graph.state import CompiledStateGraph
+
+from backend.app.build.chains.reduce import REDUCE_TEMPLATE, get_reduce_chain
+from backend.app.build.checkpointer import get_checkpointer
+from backend.app.build.graphs.nodes import map_token_max
+from backend.app.build.graphs.workflow import (get_collapse_graph,
+                                              get_summarizer_graph)
+from backend.app.build.loader import load_article_content
+from backend.app.build.models import load_models
+from backend.app.utils.config import (GRAPH_MAX_CONCURRENCY,
+                                      MAP_SUMMARIES_ENABLED,
+                                      SUMMARY_CACHE_ENABLED)
+from backend.app.utils.functions import join_documents
+from backend.app.utils.map_summaries import get_map_summaries, map_key
+from backend.app.utils.summary_cache import (cache_key,
+                                             get_cached_summary,
+                                             put_cached_summary)
+
+
+# The depth of the graph is bounded by the reduce plan, whose levels shrink
+# the summaries by REDUCE_MAX_FAN_IN each, so the limit only guards
+# against a runaway loop
+RECURSION_LIMIT = 25
+
+# Graph runs available to the process, shared by the requests, the job
+# workers and the batches, so together they never run more than
+# GRAPH_MAX_CONCURRENCY graphs
+GRAPH_SLOTS = asyncio.Semaphore(GRAPH_MAX_CONCURRENCY)
+
+
+def graph_config(thread_id: str | None) -> dict:
+    """
+    Build the config of a graph run, checkpointed under the UUID of its
+    summary.
+
+    Args:
+        thread_id (str or None): The UUID of the summary, if any.
+
+    Returns:
+        dict: The config of the run.
+    """
+    config = {"recursion_limit": RECURSION_LIMIT}
+    if thread_id:
+        config["configurable"] = {"thread_id": thread_id}
+    return config
+
+
+def with_checkpointer(graph: CompiledStateGraph) -> CompiledStateGraph:
+    """
+    Get a graph saving its checkpoints, when the checkpointer is open.
+
+    Args:
+        graph (CompiledStateGraph): The compiled graph.
+
+    Returns:
+        CompiledStateGraph: The graph with the checkpointer, or the graph
+                            itself when checkpoints are disabled.
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return graph
+    return graph.copy({"checkpointer": checkpointer})
+
+
+async def warm_up():
+    """
+    Build the models, the chains and the graphs before the first request,
+    so it does not pay for them.
+    """
+    await load_models()
+    get_reduce_chain()
+    get_summarizer_graph()
+    get_collapse_graph()
+
+
+def summary_cache_key(raw_doc: Document, number_of_words: int) -> str:
+    """
+    Build the summary cache key of a loaded article.
+
+    Args:
+        raw_doc (Document): The article returned by `load_article_content`.
+        number_of_words (int): The desired number of words in the summary.
+
+    Returns:
+        str: The cache key.
+    """
+    meta = raw_doc.metadata
+    return cache_key(meta["language"], meta["page_id"],
+                     meta["revision_id"], number_of_words)
+
+
+async def store_summary(raw_doc: Document, number_of_words: int,
+                        summary: str) -> None:
+    """
+    Store a final summary in the summary cache, when enabled.
+
+    Args:
+        raw_doc (Document): The article returned by `load_article_content`.
+        number_of_words (int): The desired number of words in the summary.
+        summary (str): The final summary of the article.
+    """
+    if not SUMMARY_CACHE_ENABLED:
+        return
+    meta = raw_doc.metadata
+    await put_cached_summary(summary_cache_key(raw_doc, number_of_words),
+                             meta["language"], meta["page_id"],
+                             meta["revision_id"], number_of_words, summary)
+
+
+async def graph_input(raw_doc: Document, number_of_words: int) -> dict:
+    """
+    Build the input of the summarizer graph for a loaded article.
+
+    When the map stage already ran over the same revision of the article,
+    for any size, the input carries its chunk summaries and the graph
+    starts at the reduce instead of splitting the article again.
+
+    Args:
+        raw_doc (Document): The article returned by `load_article_content`.
+        number_of_words (int): The desired number of words in the summary.
+
+    Returns:
+        dict: The input state of the graph.
+    """
+    defs = {"article": raw_doc.metadata, "token_max": number_of_words}
+    if MAP_SUMMARIES_ENABLED:
+        summaries = await get_map_summaries(
+            map_key(raw_doc.metadata, map_token_max(number_of_words),
+                    REDUCE_TEMPLATE)
+        )
+        if summaries is not None:
+            return {**defs, "summaries": summaries}
+    return {**defs, "contents": [raw_doc.page_content]}
+
+
+async def summarize_article(url: str, number_of_words: int,
+                            u_id: str | None = None) -> str:
+    """
+    Load a Wikipedia article and run the summarizer graph over it.
+
+    Args:
+        url (str): The URL of the Wikipedia article.
+        number_of_words (int): The desired number of words in the summary.
+        u_id (str, optional): The UUID of the summary, under which the run
+                              is checkpointed.
+
+    Returns:
+        str: The final summary of the article.
+    """
+    raw_doc = await load_article_content(url)
+    return await summarize_document(raw_doc, number_of_words, u_id)
+
+
+async def summarize_document(raw_doc: Document, number_of_words: int,
+                             u_id: str | None = None) -> str:
+    """
+    Run the summarizer graph over an article already loaded.
+
+    When the same revision of the article was already summarized with the
+    same size, the cached summary is returned without calling the LLM.
+    Otherwise the run waits for one of the `GRAPH_SLOTS`. When a run of the
+    same UUID was interrupted, it resumes from its last checkpoint instead
+    of starting over, and when another size of summary of the same revision
+    was made, the run starts from its chunk summaries.
+
+    Args:
+        raw_doc (Document): The article returned by `load_article_content`.
+        number_of_words (int): The desired number of words in the summary.
+        u_id (str, optional): The UUID of the summary, under which the run
+                              is checkpointed.
+
+    Returns:
+        str: The final summary of the article.
+    """
+    if SUMMARY_CACHE_ENABLED:
+        cached = await get_cached_summary(
+            summary_cache_key(raw_doc, number_of_words)
+        )
+        if cached is not None:
+            return cached
+
+    graph = with_checkpointer(get_summarizer_graph())
+    config = graph_config(u_id)
+    async with GRAPH_SLOTS:
+        resuming = False
+        if graph.checkpointer is not None and u_id:
+            snapshot = await graph.aget_state(config)
+            resuming = bool(snapshot.next)
+        defs = (None if resuming
+                else await graph_input(raw_doc, number_of_words))
+        summ_text = await graph.ainvoke(defs, config)
+    await store_summary(raw_doc, number_of_words, summ_text["final_summary"])
+    return summ_text["final_summary"]
+
+
+async def resume_summary(u_id: str) -> tuple[str, str] | None:
+    """
+    Finish an interrupted run from its last checkpoint.
+
+    The nodes already completed are not run again, so a run that failed in
+    its final reduce only costs that call. A streamed run, whose graph
+    stops before the final reduce, is completed by it.
+
+    Args:
+        u_id (str): The UUID of the summary.
+
+    Returns:
+        tuple[str, str] or None: The URL of the article and its final
+                                 summary, or None when the run has no
+                                 checkpoint.
+    """
+    graph = with_checkpointer(get_summarizer_graph())
+    if graph.checkpointer is None:
+        return None
+    config = graph_config(u_id)
+    snapshot = await graph.aget_state(config)
+    if not snapshot.values:
+        return None
+    values = snapshot.values
+    async with GRAPH_SLOTS:
+        if snapshot.next:
+            values = await graph.ainvoke(None, config)
+        summary = values.get("final_summary")
+        if summary is None:
+            summary = await get_reduce_chain().ainvoke(
+                {"docs": join_documents(values["collapsed_summaries"]),
+                 "token_max": values["token_max"]}
+            )
+    article = Document("", metadata=values["article"])
+    await store_summary(article, values["token_max"], summary)
+    return article.metadata["source"], summary
+
+
+async def stream_article_summary(url: str,
+                                 number_of_words: int,
+                                 u_id: str | None = None
+                                 ) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Summarize a Wikipedia article, reporting the progress of the graph and
+    streaming the tokens of the final summary as they are generated.
+
+    The events are, in order: 'loaded' with the article title, 'plan' with
+    the number of chunks, reduce levels and planned LLM calls, 'map' when
+    the chunks are summarized, 'collapse' with the level of each collapse
+    round, then 'token' events whose texts form the final summary. A
+    cached summary is sent as a 'cached' event and a single 'token'. When
+    the chunk summaries of the revision are reused, the 'plan' event
+    counts no chunk and is followed by 'map' with the reused summaries.
+    The graph and the final reduce run within one of the `GRAPH_SLOTS`.
+
+    Args:
+        url (str): The URL of the Wikipedia article.
+        number_of_words (int): The desired number of words in the summary.
+        u_id (str, optional): The UUID of the summary, under which the run
+                              is checkpointed.
+
+    Yields:
+        tuple[str, dict]: The name of the event and its data.
+    """
+    raw_doc = await load_article_content(url)
+    yield "loaded", {"title": raw_doc.metadata["title"],
+                     "revision_id": raw_doc.metadata["revision_id"]}
+    if SUMMARY_CACHE_ENABLED:
+        cached = await get_cached_summary(
+            summary_cache_key(raw_doc, number_of_words)
+        )
+        if cached is not None:
+            yield "cached", {}
+            yield "token", {"text": cached}
+            return
+
+    async with GRAPH_SLOTS:
+        defs = await graph_input(raw_doc, number_of_words)
+        collapsed = []
+        level = 0
+        graph = with_checkpointer(get_collapse_graph())
+        async for update in graph.astream(defs, graph_config(u_id),
+                                          stream_mode="updates"):
+            if "split_chunks" in update:
+                plan = update["split_chunks"]
+                yield "plan", {"chunks": sum(map(len, plan["chunks"])),
+                               "levels": len(plan["reduce_plan"]),
+                               "llm_calls": plan["llm_calls"]}
+            elif "reuse_summaries" in update:
+                plan = update["reuse_summaries"]
+                collapsed = plan["collapsed_summaries"]
+                yield "plan", {"chunks": 0,
+                               "levels": len(plan["reduce_plan"]),
+                               "llm_calls": plan["llm_calls"]}
+                yield "map", {"summaries": len(collapsed)}
+            elif "collect_summaries" in update:
+                collapsed = update["collect_summaries"]["collapsed_summaries"]
+                yield "map", {"summaries": len(collapsed)}
+            elif "collapse_summaries" in update:
+                level += 1
+                collapsed = update["collapse_summaries"]["collapsed_summaries"]
+                yield "collapse", {"level": level, "summaries": len(collapsed)}
+
+        parts = []
+        req = {"docs": join_documents(collapsed),
+               "token_max": number_of_words}
+        async for text in get_reduce_chain().astream(req):
+            parts.append(text)
+            yield "token", {"text": text}
+    await store_summary(raw_doc, number_of_words, "".join(parts))
@@ -0,0 +1,135 @@
+"""Plan the tree of reduce calls collapsing the chunk summaries"""
+import math
+from typing import List
+
+
+def pack_level(counts: List[int], max_input_tokens: int,
+               max_fan_in: int) -> List[int]:
+    """
+    Split a level of documents in consecutive groups, filling every group
+    before starting the next one.
+
+    This gives the fewest groups within `max_fan_in` documents and
+    `max_input_tokens` tokens. A document above the token budget alone
+    forms its own group.
+
+    Args:
+        counts (List[int]): The number of tokens of each document.
+        max_input_tokens (int): The maximum tokens of a reduce call.
+        max_fan_in (int): The maximum documents of a reduce call.
+
+    Returns:
+        List[int]: The number of documents of each group, in order.
+    """
+    sizes = []
+    size = tokens = 0
+    for count in counts:
+        if size and (size == max_fan_in
+                     or tokens + count > max_input_tokens):
+            sizes.append(size)
+            size = tokens = 0
+        size += 1
+        tokens += count
+    if size:
+        sizes.append(size)
+    return sizes
+
+
+def plan_level(counts: List[int], max_input_tokens: int,
+               max_fan_in: int) -> List[int]:
+    """
+    Split a level of documents in consecutive groups of balanced sizes.
+
+    The number of groups is the smallest one whose even split keeps every
+    group within `max_fan_in` documents and `max_input_tokens` tokens.
+    When no even split fits with as many groups as `pack_level` needs,
+    e.g. around a document above the token budget, the packed groups are
+    used, so there are never more groups than documents nor empty ones.
+
+    Args:
+        counts (List[int]): The number of tokens of each document.
+        max_input_tokens (int): The maximum tokens of a reduce call.
+        max_fan_in (int): The maximum documents of a reduce call.
+
+    Returns:
+        List[int]: The number of documents of each group, in order.
+    """
+    packed = pack_level(counts, max_input_tokens, max_fan_in)
+    n_groups = max(math.ceil(len(counts) / max_fan_in),
+                   math.ceil(sum(counts) / max_input_tokens), 1)
+    while n_groups <= len(packed):
+        size, extra = divmod(len(counts), n_groups)
+        sizes = [size + 1] * extra + [size] * (n_groups - extra)
+        start = 0
+        fits = True
+        for group_size in sizes:
+            group = counts[start:start + group_size]
+            start += group_size
+            # A single document above the budget cannot be split further
+            if group_size > 1 and sum(group) > max_input_tokens:
+                fits = False
+                break
+        if fits:
+            return sizes
+        n_groups += 1
+    return packed
+
+
+def plan_reduce(counts: List[int], token_max: int, max_input_tokens: int,
+                max_fan_in: int) -> List[List[int]]:
+    """
+    Plan the levels of reduce calls needed before the final one.
+
+    Each level groups the outputs of the previous one, and every document
+    belongs to a group, until all the outputs fit in a single final call.
+    The output of a reduce call is estimated at `token_max` tokens, the
+    size the summaries are bounded to. No level is planned when every
+    group would hold a single document, since such a level reduces nothing
+    and the final call takes the documents as they are.
+
+    Args:
+        counts (List[int]): The number of tokens of each chunk summary.
+        token_max (int): The number of tokens of a reduce output.
+        max_input_tokens (int): The maximum tokens of a reduce call.
+        max_fan_in (int): The maximum documents of a reduce call, at least 2.
+
+    Returns:
+        List[List[int]]: The group sizes of each level, in execution order.
+    """
+    levels = []
+    while len(counts) > max_fan_in or (len(counts) > 1
+                                       and sum(counts) > max_input_tokens):
+        sizes = plan_level(counts, max_input_tokens, max_fan_in)
+        if max(sizes) == 1:
+            break
+        start = 0
+        outputs = []
+        for size in sizes:
+            outputs.append(min(token_max, sum(counts[start:start + size])))
+            start += size
+        if outputs == counts:
+            # Another level would not shrink anything
+            break
+        levels.append(sizes)
+        counts = outputs
+    return levels
+
+
+def count_llm_calls(n_chunks: int, levels: List[List[int]],
+                    attempts_per_chunk: int = 1) -> int:
+    """
+    Count the LLM calls of a summary in the worst case: up to
+    `attempts_per_chunk` per chunk, one per group of each reduce level and
+    the final reduce.
+
+    Args:
+        n_chunks (int): The number of chunks summarized by the map stage.
+        levels (List[List[int]]): The plan returned by `plan_reduce`.
+        attempts_per_chunk (int): The maximum LLM calls made to summarize
+                                  one chunk.
+
+    Returns:
+        int: The maximum number of planned LLM calls.
+    """
+    return (n_chunks * attempts_per_chunk
+            + sum(len(sizes) for sizes in levels) + 1)
@@ -1,7 +1,49 @@
 """Main file to initialize the application"""
+import os
+import tempfile
+
 from backend.app.api.main import app
 
 
+def prepare_metrics_dir() -> str:
+    """
+    Delete the metrics files left by earlier workers, creating a temporary
+    directory when `PROMETHEUS_MULTIPROC_DIR` is not set. It must be set
+    before the workers import prometheus_client.
+
+    Returns:
+        str: The path of the directory.
+
+    Raises:
+        ValueError: If the directory holds other files than the `.db`
+                    files of prometheus_client.
+    """
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(
+        prefix="summarizer-metrics-"
+    )
+    os.makedirs(path, exist_ok=True)
+    names = os.listdir(path)
+    others = [name for name in names
+              if not (name.endswith(".db")
+                      and os.path.isfile(os.path.join(path, name)))]
+    if others:
+        raise ValueError(f"PROMETHEUS_MULTIPROC_DIR {path} holds other "
+                         f"files than metrics: {', '.join(sorted(others))}")
+    for name in names:
+        os.remove(os.path.join(path, name))
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    from backend.app.utils.config import API_HOST, API_PORT, API_WORKERS
+
+    if API_WORKERS > 1:
+        prepare_metrics_dir()
+        # The workers import the app themselves
+        uvicorn.run("backend.app.main:app", host=API_HOST, port=API_PORT,
+                    workers=API_WORKERS)
+    else:
+        uvicorn.run(app, host=API_HOST, port=API_PORT)
@@ -0,0 +1,72 @@
+"""Unitary tests of the benchmark stand-ins"""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.app.benchmarks.fake_models import FakeChatModel
+from backend.app.benchmarks.load import percentile
+from backend.app.benchmarks.wiki_server import wiki_app
+from backend.app.build.chunker import split_into_sections
+
+
+def test_fake_chat_model():
+    """
+    Test the offline chat model.
+
+    Asserts:
+        - The answer has the configured number of words.
+        - The same prompt gets the same answer, streamed or not.
+        - Different prompts get different answers.
+    """
+    model = FakeChatModel(latency=0, output_words=50, chunk_words=7)
+
+    answer = asyncio.run(model.ainvoke("Summarize Nikola Tesla")).content
+
+    async def stream():
+        return "".join([chunk.content async for chunk
+                        in model.astream("Summarize Nikola Tesla")])
+
+    assert len(answer.split()) == 50
+    assert asyncio.run(stream()) == answer
+    assert model.invoke("Summarize Alternating current").content != answer
+
+
+def test_wiki_server_serves_fixture_articles():
+    """
+    Test the Wikipedia fixture server along the requests of the loader.
+
+    Asserts:
+        - The latest revision is served with an ETag, and 304 when it
+          matches.
+        - The text of the page id has the sections of its size.
+        - Unknown titles are not found.
+    """
+    client = TestClient(wiki_app)
+
+    bare = client.get("/w/rest.php/v1/page/Benchmark_medium_2/bare")
+    page = bare.json()
+    revalidated = client.get("/w/rest.php/v1/page/Benchmark_medium_2/bare",
+                             headers={"If-None-Match": bare.headers["ETag"]})
+    query = client.get("/w/api.php", params={"pageids": page["id"]}).json()
+    extract = query["query"]["pages"][0]
+
+    assert page["title"] == "Benchmark medium 2"
+    assert revalidated.status_code == 304
+    assert extract["revisions"][0]["revid"] == page["latest"]["id"]
+    assert len(split_into_sections(extract["extract"])) == 20
+    assert client.get("/w/rest.php/v1/page/Tesla/bare").status_code == 404
+
+
+def test_percentile():
+    """
+    Test the nearest-rank percentiles of the load report.
+
+    Asserts:
+        - The percentiles of 1 to 100 are their rank.
+        - No observation gives no percentile.
+    """
+    values = list(range(100, 0, -1))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([], 95) is None
@@ -0,0 +1,82 @@
+"""Unitary tests of the section-aware chunker"""
+from backend.app.build.chunker import split_sections
+
+
+class WordEncoding:
+    """Fake encoding whose tokens are the words of the text."""
+
+    def encode_ordinary_batch(self, texts):
+        return [text.split() for text in texts]
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+ARTICLE = """Nikola Tesla was an inventor.
+
+== Early years ==
+Tesla was born in Smiljan.
+
+=== Education ===
+He studied in Graz.
+
+== Career ==
+""" + "work " * 30 + """
+
+== See also ==
+
+== References ==
+"""
+
+
+def test_chunks_follow_sections():
+    """
+    Test that the chunks are cut on the section markers.
+
+    Asserts:
+        - Short consecutive sections are packed in one chunk, sliced from
+          the text as is, with their common section path.
+        - A section longer than a chunk is cut in windows sharing the
+          overlap, all carrying its path.
+        - Trailing empty sections are dropped.
+        - Every chunk carries its number of tokens.
+    """
+    chunks = split_sections(ARTICLE, 24, 5, WordEncoding())
+
+    assert chunks[0].page_content.startswith("Nikola Tesla")
+    assert "=== Education ===" in chunks[0].page_content
+    assert chunks[0].metadata["section_path"] == []
+    career = chunks[1:]
+    assert all(chunk.metadata["section_path"] == ["Career"]
+               for chunk in career)
+    assert career[0].page_content.split()[-5:] == \
+        career[1].page_content.split()[:5]
+    assert not any("References" in chunk.page_content for chunk in chunks)
+    assert all(chunk.metadata["n_tokens"] <= 24 for chunk in chunks)
+    assert chunks[0].metadata["n_tokens"] == len(
+        chunks[0].page_content.split()
+    )
+
+
+def test_chunks_isolate_sections():
+    """
+    Test that the chunks can be cut at every top-level section, so an edit
+    in one section leaves the chunks of the others unchanged.
+
+    Asserts:
+        - The lead and the first section are not packed together.
+        - A subsection stays packed with its parent section.
+        - Editing a section changes only its chunks.
+    """
+    chunks = split_sections(ARTICLE, 24, 5, WordEncoding(),
+                            isolate_sections=True)
+    edited = split_sections(ARTICLE.replace("Graz", "Prague"), 24, 5,
+                            WordEncoding(), isolate_sections=True)
+
+    assert chunks[0].page_content.strip() == "Nikola Tesla was an inventor."
+    assert chunks[1].metadata["section_path"] == ["Early years"]
+    assert "=== Education ===" in chunks[1].page_content
+    changed = [old.page_content != new.page_content
+               for old, new in zip(chunks, edited)]
+    assert len(chunks) == len(edited)
+    assert changed == [False, True] + [False] * (len(chunks) - 2)
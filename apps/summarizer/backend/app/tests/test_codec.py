@@ -0,0 +1,36 @@
+"""Unitary tests of the storage codec of the summaries"""
+from backend.app.utils.codec import (FORMAT_ZSTD,
+                                     decode_summary,
+                                     encode_summary)
+
+
+def test_summary_round_trip():
+    """
+    Test that a compressed summary is decoded back to its text.
+
+    Asserts:
+        - The stored bytes start with the format version byte.
+        - A repetitive summary is stored smaller than its text.
+        - Decoding returns the original text, accents included.
+    """
+    summary = "Nikola Tesla était un inventeur. " * 50
+    data = encode_summary(summary)
+
+    assert data[0] == FORMAT_ZSTD
+    assert len(data) < len(summary.encode())
+    assert decode_summary(data) == summary
+
+
+def test_unknown_format_is_rejected():
+    """
+    Test that bytes with an unknown version byte are not decoded.
+
+    Asserts:
+        - A ValueError is raised.
+    """
+    try:
+        decode_summary(b"\x09abc")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("The unknown format was decoded")
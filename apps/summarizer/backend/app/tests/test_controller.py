@@ -0,0 +1,40 @@
+"""Unitary tests of the token budget of the chain outputs"""
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+
+from backend.app.build.chains.controller import generate_within_budget
+from backend.app.utils import functions
+
+
+class WordEncoding:
+    """Fake encoding whose tokens are the words of the text."""
+
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+def test_budget_without_attempts(monkeypatch):
+    """
+    Test that a budget of no attempt still makes one call.
+
+    Asserts:
+        - The chain is called once and its output truncated to the limit.
+    """
+    monkeypatch.setattr(functions, "get_encoding", WordEncoding)
+    calls = []
+
+    def chain(req):
+        calls.append(req["token_max"])
+        return "word " * 20
+
+    output = asyncio.run(generate_within_budget(RunnableLambda(chain),
+                                                {"docs": "text"}, 5,
+                                                max_attempts=0))
+
+    assert calls == [5]
+    assert output.page_content == "word word word word word"
+    assert output.metadata["n_tokens"] == 5
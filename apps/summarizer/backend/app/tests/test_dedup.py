@@ -0,0 +1,60 @@
+"""Unitary tests of the near-duplicate chunk elimination"""
+import asyncio
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from prometheus_client import REGISTRY
+
+from backend.app.build.dedup import (DEDUP_STATS,
+                                     cluster_representatives,
+                                     deduplicate_chunks)
+
+
+def count_words(documents):
+    """Count the tokens of documents as their number of words."""
+    return sum(len(doc.page_content.split()) for doc in documents)
+
+
+def test_cluster_representatives():
+    """
+    Test the greedy clustering of vectors by cosine similarity.
+
+    Asserts:
+        - Parallel vectors of any norm share a cluster.
+        - The first vector of each cluster represents it.
+    """
+    vectors = np.array([[1.0, 0.0], [0.0, 1.0], [2.0, 0.1], [0.0, 3.0]])
+    assert cluster_representatives(vectors, 0.95) == [0, 1]
+    assert cluster_representatives(vectors, 0.9999) == [0, 1, 2]
+
+
+def test_deduplicate_chunks():
+    """
+    Test that repeated chunks are summarized once.
+
+    Asserts:
+        - Only the first copy of a repeated chunk is kept, in order.
+        - The dropped chunks and their tokens are reported, in the stats
+          and in the Prometheus counters.
+    """
+    chunks = [Document("lead of the article"),
+              Document("history section"),
+              Document("lead of the article"),
+              Document("list of works")]
+    before = dict(DEDUP_STATS)
+    dropped = REGISTRY.get_sample_value("summarizer_dedup_chunks_total",
+                                        {"result": "dropped"}) or 0
+
+    kept = asyncio.run(deduplicate_chunks(chunks,
+                                          DeterministicFakeEmbedding(size=64),
+                                          0.99,
+                                          count_words))
+
+    assert [doc.page_content for doc in kept] == ["lead of the article",
+                                                  "history section",
+                                                  "list of works"]
+    assert DEDUP_STATS["dropped_chunks"] - before["dropped_chunks"] == 1
+    assert DEDUP_STATS["saved_tokens"] - before["saved_tokens"] == 4
+    assert REGISTRY.get_sample_value("summarizer_dedup_chunks_total",
+                                     {"result": "dropped"}) - dropped == 1
@@ -0,0 +1,120 @@
+"""Unitary tests of the export of the stored summaries"""
+import asyncio
+import json
+from datetime import datetime as dt
+
+import pytest
+
+from backend.app.utils import export_summaries
+
+
+BATCHES = [
+    [{"uuid": "a", "url": "https://en.wikipedia.org/wiki/Nikola_Tesla",
+      "summary": "Tesla était un inventeur.",
+      "creation_date": dt(2024, 10, 1, 8)},
+     {"uuid": "b", "url": "https://en.wikipedia.org/wiki/Thomas_Edison",
+      "summary": "Edison was an inventor.",
+      "creation_date": dt(2024, 10, 1, 9)}],
+    [{"uuid": "c", "url": "https://en.wikipedia.org/wiki/Marie_Curie",
+      "summary": "Curie was a physicist.",
+      "creation_date": dt(2024, 10, 2, 7)}],
+]
+
+
+@pytest.fixture
+def stored_rows(monkeypatch):
+    """Serve the batches of BATCHES created between the bounds."""
+    async def iter_summary_batches(since=None, until=None, batch_size=5000):
+        for rows in BATCHES:
+            rows = [row for row in rows
+                    if (since is None or row["creation_date"] > since)
+                    and (until is None or row["creation_date"] < until)]
+            if rows:
+                yield rows
+
+    monkeypatch.setattr(export_summaries, "iter_summary_batches",
+                        iter_summary_batches)
+
+
+def test_export_jsonl(tmp_path, stored_rows):
+    """
+    Test an incremental export to JSON Lines.
+
+    Asserts:
+        - Only the summaries created after the watermark are exported,
+          one per line, with their creation date in ISO format.
+        - The returned watermark is the creation date of the last row.
+        - No temporary file is left behind.
+    """
+    path = tmp_path / "summaries.jsonl"
+    total, watermark = asyncio.run(export_summaries.export_summaries(
+        str(path), "jsonl", since=dt(2024, 10, 1, 8)
+    ))
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert total == 2
+    assert [line["uuid"] for line in lines] == ["b", "c"]
+    assert lines[1]["creation_date"] == "2024-10-02T07:00:00"
+    assert watermark == dt(2024, 10, 2, 7)
+    assert [file.name for file in tmp_path.iterdir()] == ["summaries.jsonl"]
+
+
+def test_export_parquet(tmp_path, stored_rows):
+    """
+    Test a full export to Parquet.
+
+    Asserts:
+        - Every summary is exported, with its text decoded.
+        - Each batch is written as a row group compressed with zstd.
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "summaries.parquet"
+    total, _ = asyncio.run(export_summaries.export_summaries(str(path),
+                                                             "parquet"))
+
+    table = pq.read_table(path)
+    metadata = pq.ParquetFile(path).metadata
+    assert total == table.num_rows == 3
+    assert table.column("summary")[0].as_py() == "Tesla était un inventeur."
+    assert metadata.num_row_groups == 2
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+
+
+def test_export_leaves_recent_rows(tmp_path, stored_rows):
+    """
+    Test that the summaries created after the upper bound wait for the next
+    export.
+
+    Asserts:
+        - Only the summaries created before the bound are exported.
+        - The watermark stops at the last exported row, so the next export
+          starts with the rows left.
+    """
+    path = tmp_path / "summaries.jsonl"
+    total, watermark = asyncio.run(export_summaries.export_summaries(
+        str(path), "jsonl", until=dt(2024, 10, 2)
+    ))
+
+    assert total == 2
+    assert watermark == dt(2024, 10, 1, 9)
+
+
+def test_failed_export_removes_partial_file(tmp_path, monkeypatch):
+    """
+    Test that an export failing midway leaves no file behind.
+
+    Asserts:
+        - The error of the export is raised.
+        - Neither the exported file nor its temporary file exist.
+    """
+    async def iter_summary_batches(since=None, until=None, batch_size=5000):
+        yield BATCHES[0]
+        raise ConnectionError("database unreachable")
+
+    monkeypatch.setattr(export_summaries, "iter_summary_batches",
+                        iter_summary_batches)
+    path = tmp_path / "summaries.jsonl"
+    with pytest.raises(ConnectionError):
+        asyncio.run(export_summaries.export_summaries(str(path), "jsonl"))
+
+    assert list(tmp_path.iterdir()) == []
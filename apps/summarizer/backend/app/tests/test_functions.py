@@ -0,0 +1,45 @@
+"""Unitary tests of the custom functions"""
+import asyncio
+
+from backend.app.utils.functions import (join_documents,
+                                         to_document,
+                                         with_keepalive)
+
+
+def test_keepalive_during_silence():
+    """
+    Test that a slow iterator is forwarded with a None per silent interval.
+
+    Asserts:
+        - Every item is forwarded in order.
+        - A None is yielded while the iterator is silent, and none when it
+          is quick.
+    """
+    async def events():
+        yield "loaded"
+        await asyncio.sleep(0.05)
+        yield "done"
+
+    async def main():
+        return [item async for item in with_keepalive(events(), 0.01)]
+
+    items = asyncio.run(main())
+
+    assert [item for item in items if item is not None] == ["loaded", "done"]
+    assert items[0] == "loaded" and items[-1] == "done"
+    assert None in items
+
+
+def test_join_documents_renders_contents_only():
+    """
+    Test that the documents reach the prompts without their metadata.
+
+    Asserts:
+        - A list of documents renders as their contents separated by blank
+          lines, without the n_tokens annotation.
+        - A single document renders as its content.
+    """
+    docs = [to_document("first", 1), to_document("second", 1)]
+
+    assert join_documents(docs) == "first\n\nsecond"
+    assert join_documents(docs[0]) == "first"
@@ -0,0 +1,62 @@
+"""Unitary tests of the cache of immutable responses"""
+import gzip
+import json
+
+from starlette.datastructures import Headers
+
+from backend.app.utils.http_cache import (IMMUTABLE,
+                                          ResponseCache,
+                                          cached_response)
+
+
+def test_conditional_and_compressed_responses():
+    """
+    Test the ETag, 304 and gzip handling of a cached response.
+
+    Asserts:
+        - A plain request gets the JSON body with a strong ETag and an
+          immutable Cache-Control.
+        - A client accepting gzip gets the compressed body with its own ETag.
+        - A matching If-None-Match gets a 304 without body.
+    """
+    cache = ResponseCache(max_bytes=10**6, gzip_min_size=100)
+    content = {"uuid": "1", "summary": "word " * 100}
+    entry = cache.put("1", content)
+
+    plain = cached_response(entry, Headers({}))
+    assert plain.status_code == 200
+    assert json.loads(plain.body) == content
+    assert plain.headers["cache-control"] == IMMUTABLE
+    etag = plain.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith('W/')
+
+    compressed = cached_response(entry,
+                                 Headers({"accept-encoding": "gzip"}))
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] != etag
+    assert json.loads(gzip.decompress(compressed.body)) == content
+
+    not_modified = cached_response(entry, Headers({"if-none-match": etag}))
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+
+
+def test_lru_bounded_by_bytes():
+    """
+    Test that the cache evicts the least recently used entries beyond its
+    size.
+
+    Asserts:
+        - An entry read recently survives the eviction.
+        - The cached size stays within the bound.
+    """
+    cache = ResponseCache(max_bytes=200, gzip_min_size=10**6)
+    for key in ("a", "b"):
+        cache.put(key, {"summary": "x" * 60})
+    assert cache.get("a") is not None
+    cache.put("c", {"summary": "x" * 60})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.size <= 200
+    assert cache.stats["evictions"] == 1
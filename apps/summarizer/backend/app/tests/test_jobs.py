@@ -0,0 +1,124 @@
+"""Unitary tests of the background summary jobs"""
+import asyncio
+
+import pytest
+
+from backend.app.api import jobs
+
+
+@pytest.fixture
+def job_store(monkeypatch):
+    """Record the job updates and the summary writes of the pool."""
+    store = {"status": {}, "writes": []}
+
+    async def load_articles(urls):
+        return {url: (ValueError("Page not found") if "Missing" in url
+                      else f"article {url}") for url in urls}
+
+    async def summarize_document(raw_doc, number_of_words, u_id):
+        if u_id == "broken":
+            raise RuntimeError("LLM unavailable")
+        return f"summary of {raw_doc}"
+
+    async def update_summary_job(u_id, **fields):
+        store["status"][u_id] = fields["status"]
+
+    async def update_summary_jobs(u_ids, **fields):
+        for u_id in u_ids:
+            store["status"][u_id] = fields["status"]
+
+    async def upsert_wiki_summaries(rows):
+        store["writes"].append([row["uuid"] for row in rows])
+        return "Data inserted successfully"
+
+    async def delete_checkpoints(u_id):
+        pass
+
+    for func in (load_articles, summarize_document, update_summary_job,
+                 update_summary_jobs, upsert_wiki_summaries,
+                 delete_checkpoints):
+        monkeypatch.setattr(jobs, func.__name__, func)
+    monkeypatch.setattr(jobs, "BATCH_WRITE_SIZE", 2)
+    return store
+
+
+def test_batch_writes_summaries_as_they_complete(job_store):
+    """
+    Test that a batch writes its summaries in small groups and settles
+    every job.
+
+    Asserts:
+        - The summaries are written in groups of BATCH_WRITE_SIZE, the
+          last group being smaller.
+        - The jobs whose article or graph failed are marked failed, the
+          others done.
+    """
+    items = [(f"job-{i}", f"https://en.wikipedia.org/wiki/{i}", 1000)
+             for i in range(3)]
+    items += [("missing", "https://en.wikipedia.org/wiki/Missing", 1000),
+              ("broken", "https://en.wikipedia.org/wiki/Broken", 1000)]
+    pool = jobs.SummaryWorkerPool(1, 10)
+    asyncio.run(pool._run_batch(items))
+
+    assert sorted(map(len, job_store["writes"])) == [1, 2]
+    assert job_store["status"] == {"job-0": "done", "job-1": "done",
+                                   "job-2": "done", "missing": "failed",
+                                   "broken": "failed"}
+
+
+def test_broken_batch_fails_remaining_jobs(job_store, monkeypatch):
+    """
+    Test that an error outside of the graph runs fails the whole batch.
+
+    Asserts:
+        - Every job is marked failed when the articles cannot be loaded.
+    """
+    async def load_articles(urls):
+        raise ConnectionError("Wikipedia unreachable")
+
+    monkeypatch.setattr(jobs, "load_articles", load_articles)
+    items = [("a", "https://en.wikipedia.org/wiki/A", 1000),
+             ("b", "https://en.wikipedia.org/wiki/B", 1000)]
+    asyncio.run(jobs.SummaryWorkerPool(1, 10)._run_batch(items))
+
+    assert job_store["status"] == {"a": "failed", "b": "failed"}
+
+
+def test_recovery_claims_what_fits(monkeypatch):
+    """
+    Test that the recovery loop only keeps the claimed jobs that fit in
+    the queue.
+
+    Asserts:
+        - The heartbeat of the process is renewed before claiming.
+        - The jobs claimed beyond the free slots of the queue are released
+          for the other processes.
+    """
+    calls = []
+    released = []
+
+    async def refresh_summary_jobs(owner, stale_after):
+        calls.append(("refresh", owner))
+
+    async def claim_summary_jobs(owner, limit):
+        calls.append(("claim", limit))
+        # A request takes a slot of the queue meanwhile
+        pool.queue.put_nowait(("request", "url", 1000))
+        return [(f"job-{i}", "url", 1000) for i in range(limit)]
+
+    async def update_summary_jobs(u_ids, **fields):
+        released.extend(u_ids)
+        raise asyncio.CancelledError
+
+    for func in (refresh_summary_jobs, claim_summary_jobs,
+                 update_summary_jobs):
+        monkeypatch.setattr(jobs, func.__name__, func)
+    pool = jobs.SummaryWorkerPool(1, 2)
+    try:
+        asyncio.run(pool._recover())
+    except asyncio.CancelledError:
+        pass
+
+    assert calls == [("refresh", pool.owner), ("claim", 2)]
+    assert pool.queue.qsize() == 2
+    assert released == ["job-1"]
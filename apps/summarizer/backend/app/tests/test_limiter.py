@@ -0,0 +1,129 @@
+"""Unitary tests of the LLM rate limiter"""
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import (
+    FakeListChatModel
+)
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from backend.app.build.limiter import (LLMRateLimiter,
+                                       RateLimitedChatModel,
+                                       TokenBucket)
+
+
+class ProviderError(Exception):
+    """Error carrying an HTTP status code, like the provider errors."""
+
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FlakyChatModel(FakeListChatModel):
+    """Fake chat model failing with the given codes before answering."""
+
+    codes: list = []
+
+    async def ainvoke(self, *args, **kwargs):
+        if self.codes:
+            raise ProviderError(self.codes.pop(0))
+        return await super().ainvoke(*args, **kwargs)
+
+
+def count_words(text):
+    """Count the tokens of a text as its number of words."""
+    return len(text.split())
+
+
+def test_token_bucket_wait_time():
+    """
+    Test the wait computed by a token bucket once it is empty.
+
+    Asserts:
+        - A full bucket does not wait.
+        - An empty bucket of 60 per minute waits about one second per unit.
+    """
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(10) == 0
+    bucket.consume(60)
+    assert 9.9 < bucket.wait_time(10) <= 10
+
+
+def test_chain_shares_limiter():
+    """
+    Test that a chain built on the wrapped model goes through the limiter.
+
+    Asserts:
+        - The answer of the fake model is returned by the chain.
+        - Each call is counted as a request and charged to the tokens bucket.
+    """
+    limiter = LLMRateLimiter(100, 10000)
+    model = RateLimitedChatModel(
+        FakeListChatModel(responses=["one two three"]), limiter, count_words
+    )
+    chain = (ChatPromptTemplate([("human", "{docs}")])
+             | model
+             | StrOutputParser())
+
+    results = asyncio.run(chain.abatch([{"docs": "a b"}, {"docs": "c d"}]))
+
+    assert results == ["one two three", "one two three"]
+    assert limiter.stats["requests"] == 2
+    assert limiter.stats["in_flight"] == 0
+    assert limiter.tokens.level < 10000
+
+
+def test_retries_rate_limited_calls():
+    """
+    Test that 429 and 5xx errors are retried and other errors are not.
+
+    Asserts:
+        - A call failing with 429 then 503 succeeds on the third request.
+        - A call failing with 400 raises without retry.
+    """
+    limiter = LLMRateLimiter(100, 10000, base_delay=0.01)
+    model = RateLimitedChatModel(
+        FlakyChatModel(responses=["done"], codes=[429, 503]),
+        limiter,
+        count_words
+    )
+    assert asyncio.run(model.ainvoke("hello")).content == "done"
+    assert limiter.stats["requests"] == 3
+    assert limiter.stats["retries"] == 2
+
+    model.model.codes = [400]
+    try:
+        asyncio.run(model.ainvoke("hello"))
+    except ProviderError as e:
+        assert e.code == 400
+    else:
+        raise AssertionError("The 400 error was retried")
+    assert limiter.stats["failures"] == 1
+
+
+def test_sync_calls_go_through_limiter():
+    """
+    Test that a synchronous call is admitted by the limiter too.
+
+    Asserts:
+        - invoke outside of an event loop answers and counts a request.
+        - invoke inside an event loop raises RuntimeError without calling
+          the model.
+    """
+    limiter = LLMRateLimiter(100, 10000)
+    model = RateLimitedChatModel(FakeListChatModel(responses=["done"]),
+                                 limiter, count_words)
+    assert model.invoke("hello").content == "done"
+    assert limiter.stats["requests"] == 1
+
+    async def call_in_loop():
+        model.invoke("hello")
+
+    try:
+        asyncio.run(call_in_loop())
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("invoke should be refused in an event loop")
+    assert limiter.stats["requests"] == 1
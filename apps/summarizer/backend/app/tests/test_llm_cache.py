@@ -0,0 +1,76 @@
+"""Unitary tests of the cache of the LLM responses"""
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import (
+    FakeListChatModel
+)
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from backend.app.build.chains import cache
+from backend.app.build.chains.cache import CachedChain
+
+
+PROMPT = ChatPromptTemplate([("human", "Summarize {docs} in {token_max}")])
+
+
+def cached_chain(responses):
+    """Build a cached chain answering the given responses in turn."""
+    model = FakeListChatModel(responses=responses)
+    return CachedChain(PROMPT, PROMPT | model | StrOutputParser())
+
+
+def test_cache_key(monkeypatch):
+    """
+    Test what the cache key of a call depends on.
+
+    Asserts:
+        - The same call always has the same SHA-256 key.
+        - Another text, size, model or temperature changes the key.
+    """
+    chain = cached_chain(["answer"])
+    req = {"docs": "text", "token_max": 100}
+    key = chain.cache_key(req)
+
+    assert key == chain.cache_key(dict(req))
+    assert len(key) == 64
+    assert chain.cache_key({**req, "docs": "other"}) != key
+    assert chain.cache_key({**req, "token_max": 200}) != key
+    monkeypatch.setattr(cache, "LLM_MODEL", "another-model")
+    assert chain.cache_key(req) != key
+    monkeypatch.undo()
+    monkeypatch.setattr(cache, "LLM_TEMPERATURE", 1.0)
+    assert chain.cache_key(req) != key
+
+
+def test_cached_responses(monkeypatch):
+    """
+    Test that an identical call is answered from the cache.
+
+    Asserts:
+        - A miss calls the chain and stores its answer under the key.
+        - A hit returns the stored answer without calling the chain, also
+          when streamed.
+    """
+    stored = {}
+
+    async def get_llm_response(key):
+        return stored.get(key)
+
+    async def put_llm_response(key, response):
+        stored[key] = response
+
+    for func in (get_llm_response, put_llm_response):
+        monkeypatch.setattr(cache, func.__name__, func)
+    monkeypatch.setattr(cache, "LLM_CACHE_ENABLED", True)
+    chain = cached_chain(["first", "second"])
+    req = {"docs": "text", "token_max": 100}
+
+    async def stream():
+        return [chunk async for chunk in chain.astream(req)]
+
+    assert asyncio.run(chain.ainvoke(req)) == "first"
+    assert stored == {chain.cache_key(req): "first"}
+    assert asyncio.run(chain.ainvoke(req)) == "first"
+    assert asyncio.run(stream()) == ["first"]
+    assert asyncio.run(chain.ainvoke({**req, "token_max": 200})) == "second"
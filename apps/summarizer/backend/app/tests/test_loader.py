@@ -0,0 +1,108 @@
+"""Unitary tests of the Wikipedia loader and its article cache"""
+import asyncio
+
+import httpx
+import pytest
+
+from backend.app.build import loader
+
+
+URL = "https://en.wikipedia.org/wiki/Nikola_Tesla"
+
+
+@pytest.fixture
+def wikipedia(monkeypatch):
+    """Serve a fake Wikipedia and record the articles stored."""
+    site = {"revision": 1, "requests": [], "articles": {}}
+
+    def handler(request):
+        site["requests"].append((request.url.path,
+                                 request.headers.get("If-None-Match")))
+        etag = f'"rev-{site["revision"]}"'
+        if request.url.path.endswith("/bare"):
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304)
+            return httpx.Response(200, headers={"ETag": etag}, json={
+                "id": 7, "title": "Nikola Tesla",
+                "latest": {"id": site["revision"]}
+            })
+        return httpx.Response(200, json={"query": {"pages": [{
+            "extract": f"text of revision {site['revision']}",
+            "revisions": [{"revid": site["revision"]}]
+        }]}})
+
+    def get_client(language):
+        return httpx.AsyncClient(base_url="https://en.wikipedia.org",
+                                 transport=httpx.MockTransport(handler))
+
+    async def get_article_by_title(language, title):
+        matches = [article for article in site["articles"].values()
+                   if article["title"] == title]
+        return matches[-1] if matches else None
+
+    async def get_article_revision(language, page_id, revision_id):
+        return site["articles"].get((page_id, revision_id))
+
+    async def put_article(language, page_id, revision_id, title, etag,
+                          content):
+        site["articles"] = {(page_id, revision_id): {
+            "page_id": page_id, "revision_id": revision_id,
+            "title": title, "etag": etag, "content": content
+        }}
+
+    for func in (get_client, get_article_by_title, get_article_revision,
+                 put_article):
+        monkeypatch.setattr(loader, func.__name__, func)
+    monkeypatch.setattr(loader, "ARTICLE_CACHE_ENABLED", True)
+    return site
+
+
+def test_unchanged_article_is_revalidated(wikipedia):
+    """
+    Test that a stored article is served after a conditional request.
+
+    Asserts:
+        - The first load fetches the revision and the text, and stores
+          them with the ETag.
+        - The next load sends the stored ETag, gets a 304 and does not
+          fetch the text again.
+    """
+    first = asyncio.run(loader.load_article_content(URL))
+
+    assert first.page_content == "text of revision 1"
+    assert first.metadata["revision_id"] == 1
+    assert wikipedia["articles"][(7, 1)]["etag"] == '"rev-1"'
+    assert [path for path, _ in wikipedia["requests"]] == [
+        "/w/rest.php/v1/page/Nikola_Tesla/bare", "/w/api.php"
+    ]
+
+    wikipedia["requests"].clear()
+    second = asyncio.run(loader.load_article_content(URL))
+
+    assert second.page_content == first.page_content
+    assert second.metadata == first.metadata
+    assert wikipedia["requests"] == [
+        ("/w/rest.php/v1/page/Nikola_Tesla/bare", '"rev-1"')
+    ]
+
+
+def test_new_revision_replaces_stored_article(wikipedia):
+    """
+    Test that an edited article is fetched again.
+
+    Asserts:
+        - A new revision answers the conditional request with 200, so its
+          text is fetched and replaces the stored one.
+    """
+    asyncio.run(loader.load_article_content(URL))
+    wikipedia["revision"] = 2
+    wikipedia["requests"].clear()
+
+    doc = asyncio.run(loader.load_article_content(URL))
+
+    assert doc.page_content == "text of revision 2"
+    assert doc.metadata["revision_id"] == 2
+    assert [path for path, _ in wikipedia["requests"]] == [
+        "/w/rest.php/v1/page/Nikola_Tesla/bare", "/w/api.php"
+    ]
+    assert list(wikipedia["articles"]) == [(7, 2)]
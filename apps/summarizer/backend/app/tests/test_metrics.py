@@ -0,0 +1,99 @@
+"""Unitary tests of the Prometheus metrics"""
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import (
+    FakeListChatModel
+)
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram
+import pytest
+
+from backend.app.build.limiter import LLMRateLimiter, RateLimitedChatModel
+from backend.app.utils.metrics import latest_metrics, timed
+
+
+def sample(name, **labels):
+    """Read a sample of the default registry, 0 when never observed."""
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_timed_observes_sync_and_async_functions():
+    """
+    Test the decorator observing the duration of functions.
+
+    Asserts:
+        - Sync and async functions keep their name and their result.
+        - Every call is observed, including the ones that raise.
+    """
+    histogram = Histogram("test_duration_seconds", "Test.", ["node"],
+                          registry=CollectorRegistry())
+
+    @timed(histogram, "add")
+    def add(a, b):
+        return a + b
+
+    @timed(histogram, "fail")
+    async def fail():
+        raise ValueError("boom")
+
+    assert add(1, 2) == 3
+    assert add.__name__ == "add"
+    assert asyncio.iscoroutinefunction(fail)
+    try:
+        asyncio.run(fail())
+    except ValueError:
+        pass
+    samples = {s.labels["node"]: s.value
+               for metric in histogram.collect() for s in metric.samples
+               if s.name.endswith("_count")}
+    assert samples == {"add": 1, "fail": 1}
+
+
+def test_llm_calls_are_observed():
+    """
+    Test the latency and tokens of the calls made through the limiter.
+
+    Asserts:
+        - A call adds one successful call and one observation per direction.
+        - The answer tokens are added to the sum of the output tokens.
+        - The metrics are exported in the Prometheus text format.
+    """
+    calls = sample("summarizer_llm_call_duration_seconds_count",
+                   outcome="success")
+    tokens_out = sample("summarizer_llm_tokens_sum", direction="out")
+    model = RateLimitedChatModel(
+        FakeListChatModel(responses=["one two three"]),
+        LLMRateLimiter(100, 10000),
+        lambda text: len(text.split())
+    )
+    asyncio.run(model.ainvoke("hello world"))
+
+    assert sample("summarizer_llm_call_duration_seconds_count",
+                  outcome="success") == calls + 1
+    assert sample("summarizer_llm_tokens_sum",
+                  direction="out") == tokens_out + 3
+    body, content_type = latest_metrics()
+    assert content_type.startswith("text/plain")
+    assert b"summarizer_llm_tokens_bucket" in body
+
+
+def test_prepare_metrics_dir(monkeypatch, tmp_path):
+    """
+    Test the cleanup of the directory shared by the workers' metrics.
+
+    Asserts:
+        - The .db files of earlier workers are deleted, the directory kept.
+        - A directory holding any other file is refused and left untouched.
+    """
+    from backend.app.main import prepare_metrics_dir
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "counter_1.db").write_bytes(b"")
+    assert prepare_metrics_dir() == str(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+    (tmp_path / "counter_2.db").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("keep")
+    with pytest.raises(ValueError):
+        prepare_metrics_dir()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["counter_2.db",
+                                                          "notes.txt"]
@@ -0,0 +1,53 @@
+"""Unitary tests of the lazy initialization of the models"""
+import asyncio
+import sys
+
+from fastapi.testclient import TestClient
+
+from backend.app.benchmarks.fake_models import FakeChatModel
+from backend.app.build import models
+
+
+class WordEncoding:
+    """Fake encoding whose tokens are the words of the text."""
+
+    def encode(self, text):
+        return text.split()
+
+
+def test_app_import_does_not_build_models():
+    """
+    Test that importing the app leaves the models to the lifespan.
+
+    Asserts:
+        - The provider client is not imported with the app.
+        - The readiness probe answers 503 before the warm-up.
+    """
+    from backend.app.api.main import app
+
+    assert "langchain_google_genai" not in sys.modules
+    assert TestClient(app).get("/ready").status_code == 503
+
+
+def test_fake_backend_models(monkeypatch):
+    """
+    Test the models built for the offline benchmarks.
+
+    Asserts:
+        - The chat model is the fake one, behind the shared limiter.
+        - The model is built once and reused.
+    """
+    monkeypatch.setattr(models, "LLM_BACKEND", "fake")
+    monkeypatch.setattr(models, "FAKE_LLM_LATENCY", 0)
+    monkeypatch.setattr(models, "get_encoding", WordEncoding)
+    models.get_llm.cache_clear()
+    try:
+        llm = models.get_llm()
+        answer = asyncio.run(llm.ainvoke("Summarize Nikola Tesla"))
+
+        assert isinstance(llm.model, FakeChatModel)
+        assert llm.limiter is models.LLM_LIMITER
+        assert len(answer.content.split()) == models.FAKE_LLM_OUTPUT_WORDS
+        assert models.get_llm() is llm
+    finally:
+        models.get_llm.cache_clear()
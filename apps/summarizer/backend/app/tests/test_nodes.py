@@ -0,0 +1,115 @@
+"""Unitary tests of the nodes of the summarizer graph"""
+import asyncio
+
+import pytest
+
+from backend.app.build.graphs import nodes
+from backend.app.build.graphs.edges import route_contents
+from backend.app.utils import functions
+from backend.app.utils.functions import to_document
+
+
+class WordEncoding:
+    """Fake encoding whose tokens are the words of the text."""
+
+    def encode(self, text):
+        return text.split()
+
+    def encode_ordinary_batch(self, texts):
+        return [text.split() for text in texts]
+
+
+def test_empty_article_is_refused(monkeypatch):
+    """
+    Test that an article without text fails before the map stage, instead
+    of ending the graph without a final summary.
+
+    Asserts:
+        - Splitting an empty article raises EmptyArticleError.
+    """
+    monkeypatch.setattr(nodes, "get_encoding", WordEncoding)
+    with pytest.raises(nodes.EmptyArticleError):
+        asyncio.run(nodes.split_chunks({"contents": ["  \n"],
+                                        "token_max": 100}))
+
+
+def test_generate_summary_reuses_sections(monkeypatch):
+    """
+    Test that only the chunks without a stored summary call the LLM.
+
+    Asserts:
+        - The stored summaries are looked up by the key of every chunk.
+        - Only the missing chunks are summarized, and their summaries are
+          stored.
+        - The summaries come back in the order of the chunks.
+    """
+    store = {}
+    summarized = []
+
+    async def get_section_summaries(keys):
+        return {key: store[key] for key in keys if key in store}
+
+    async def put_section_summaries(summaries):
+        store.update(summaries)
+
+    async def summarize_chunk(doc, token_max):
+        summarized.append(doc.page_content)
+        return to_document(f"summary of {doc.page_content}", 3)
+
+    monkeypatch.setattr(nodes, "SECTION_SUMMARIES_ENABLED", True)
+    for func in (get_section_summaries, put_section_summaries,
+                 summarize_chunk):
+        monkeypatch.setattr(nodes, func.__name__, func)
+    key = nodes.section_key("History", 100, nodes.REDUCE_TEMPLATE)
+    store[key] = ("stored summary of History", 4)
+    chunks = [to_document(text, 1) for text in ("Early life", "History",
+                                                "Legacy")]
+    update = asyncio.run(nodes.generate_summary({"chunks": chunks,
+                                                 "token_max": 100}))
+
+    assert summarized == ["Early life", "Legacy"]
+    assert len(store) == 3
+    assert [doc.page_content for doc in update["summaries"]] == [
+        "summary of Early life", "stored summary of History",
+        "summary of Legacy"
+    ]
+    assert update["summaries"][1].metadata["n_tokens"] == 4
+
+
+def test_reuse_stored_summaries(monkeypatch):
+    """
+    Test that a run starting from stored chunk summaries skips the map
+    stage and only plans the reduce calls.
+
+    Asserts:
+        - The input with summaries is routed to `reuse_summaries`.
+        - 30 stored summaries reduce in one collapse level of 3 groups and
+          the final call, without any chunk call.
+    """
+    monkeypatch.setattr(functions, "get_encoding", WordEncoding)
+    summaries = [to_document("summary", 100) for _ in range(30)]
+    state = {"summaries": summaries, "token_max": 100}
+
+    assert route_contents({"contents": ["text"]}) == "split_chunks"
+    assert route_contents(state) == "reuse_summaries"
+    update = nodes.reuse_summaries(state)
+    assert update["collapsed_summaries"] == summaries
+    assert update["reduce_plan"] == [[10, 10, 10]]
+    assert update["llm_calls"] == 4
+
+
+def test_map_token_max_tiers(monkeypatch):
+    """
+    Test the sizes of the chunk summaries for several summary sizes.
+
+    Asserts:
+        - Sizes up to MAP_TOKEN_MAX share its tier, larger sizes get the
+          next power of two multiple of it, at most twice their size.
+        - A MAP_TOKEN_MAX of 0 follows the requested size.
+    """
+    monkeypatch.setattr(nodes, "MAP_TOKEN_MAX", 1000)
+    assert [nodes.map_token_max(size)
+            for size in (1000, 1001, 2000, 3000, 5000)] == \
+        [1000, 2000, 2000, 4000, 8000]
+    monkeypatch.setattr(nodes, "MAP_TOKEN_MAX", 0)
+    assert nodes.map_token_max(3000) == 3000
@@ -0,0 +1,55 @@
+"""Unitary tests of the reduce planner"""
+from backend.app.build.planner import count_llm_calls, plan_level, plan_reduce
+
+
+def test_plan_level_is_balanced():
+    """
+    Test that a level is split in groups of balanced sizes.
+
+    Asserts:
+        - 23 documents with a fan-in of 10 form groups of 8, 8 and 7.
+        - The token budget adds groups when the fan-in alone is not enough.
+        - Every document belongs to a group.
+    """
+    assert plan_level([100] * 23, 10**6, 10) == [8, 8, 7]
+    sizes = plan_level([100] * 23, 500, 10)
+    assert max(sizes) - min(sizes) <= 1
+    assert max(sizes) * 100 <= 500
+    assert sum(sizes) == 23
+
+
+def test_plan_reduce_levels_and_calls():
+    """
+    Test the levels planned for many chunk summaries.
+
+    Asserts:
+        - Summaries fitting in one call need no collapse level.
+        - 150 summaries with a fan-in of 10 need two levels, 15 then 2
+          groups, and 150 + 17 + 1 LLM calls.
+    """
+    assert plan_reduce([100] * 5, 100, 10**6, 10) == []
+    levels = plan_reduce([100] * 150, 100, 10**6, 10)
+    assert levels == [[10] * 15, [8, 7]]
+    assert count_llm_calls(150, levels) == 168
+    assert count_llm_calls(150, levels, 3) == 150 * 3 + 17 + 1
+
+
+def test_plan_oversized_documents():
+    """
+    Test the plans of documents above the token budget of a reduce call.
+
+    Asserts:
+        - A level never has more groups than documents, nor an empty group.
+        - No level of one-document groups is planned, so two oversized
+          documents cost a single final call, while an oversized document
+          next to smaller ones is reduced alone.
+        - An oversized document stays alone while the others are grouped
+          within the fan-in.
+    """
+    assert plan_level([5000, 5000], 3000, 10) == [1, 1]
+    assert plan_level([3000, 10, 10], 1000, 10) == [1, 2]
+    assert plan_level([], 1000, 10) == []
+    assert plan_reduce([5000, 5000], 3000, 3000, 10) == []
+    assert count_llm_calls(2, []) == 3
+    assert plan_reduce([3000, 10, 10], 1000, 3000, 10) == [[1, 2]]
+    assert plan_reduce([3000] + [10] * 20, 1000, 3000, 10) == [[1, 10, 10]]
@@ -0,0 +1,126 @@
+"""Unitary tests of the repository of the summaries"""
+import asyncio
+from datetime import datetime as dt
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from backend.app.utils import repository
+
+
+class FakeSession:
+    """Session recording its statements, answering them with one row."""
+
+    def __init__(self, row=None, error=None):
+        self.row = row
+        self.error = error
+        self.added = []
+        self.statements = []
+        self.rolled_back = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        if self.error:
+            raise self.error
+
+    async def rollback(self):
+        self.rolled_back = True
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(one_or_none=lambda: self.row)
+
+
+def sql(statement):
+    """Render a statement in the PostgreSQL dialect."""
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_insert_wiki_summary(monkeypatch):
+    """
+    Test the insertion of a single summary.
+
+    Asserts:
+        - The row is added with the summary stored by the codec.
+        - A failed commit is rolled back and reported in the message.
+    """
+    session = FakeSession()
+    monkeypatch.setattr(repository, "async_session", lambda: session)
+
+    info = asyncio.run(repository.insert_wiki_summary("id", "url", "text"))
+
+    assert info == "Data inserted successfully"
+    row = session.added[0]
+    assert (row.uuid, row.url) == ("id", "url")
+    assert repository.summary_text(row.summary, row.summary_data) == "text"
+
+    session = FakeSession(error=RuntimeError("duplicate key"))
+    info = asyncio.run(repository.insert_wiki_summary("id", "url", "text"))
+
+    assert info == "An error occurred: duplicate key"
+    assert session.rolled_back
+
+
+def test_upsert_wiki_summaries(monkeypatch):
+    """
+    Test the bulk upsert of summaries.
+
+    Asserts:
+        - No statement is sent without rows.
+        - The rows are written by one INSERT updating the existing uuids.
+    """
+    session = FakeSession()
+    monkeypatch.setattr(repository, "async_session", lambda: session)
+
+    assert asyncio.run(repository.upsert_wiki_summaries([])) \
+        == "No data to insert"
+    assert session.statements == []
+
+    rows = [{"uuid": f"id-{i}", "url": "url", "summary": "text"}
+            for i in range(3)]
+    info = asyncio.run(repository.upsert_wiki_summaries(rows))
+
+    assert info == "Data inserted successfully"
+    assert len(session.statements) == 1
+    statement = sql(session.statements[0])
+    assert statement.startswith("INSERT INTO wiki_summaries")
+    assert "ON CONFLICT (uuid) DO UPDATE" in statement
+    assert statement.count("creation_date_m") == 3
+
+
+def test_get_latest_wiki_summary(monkeypatch):
+    """
+    Test the lookup of the latest summary of an URL.
+
+    Asserts:
+        - The newest row of the URL is selected, through its indexes.
+        - The stored summary is decoded, and None is returned without row.
+    """
+    created = dt(2024, 1, 1)
+    row = SimpleNamespace(uuid="id", creation_date=created,
+                          **repository.stored_summary("text", "zstd"))
+    session = FakeSession(row)
+    monkeypatch.setattr(repository, "async_session", lambda: session)
+
+    latest = asyncio.run(repository.get_latest_wiki_summary("url"))
+
+    assert latest == {"uuid": "id", "summary": "text",
+                      "creation_date": created}
+    statement = sql(session.statements[0])
+    assert "WHERE wiki_summaries.url = " in statement
+    assert "ORDER BY wiki_summaries.creation_date DESC" in statement
+    assert "LIMIT" in statement
+
+    session.row = None
+    assert asyncio.run(repository.get_latest_wiki_summary("url")) is None
@@ -0,0 +1,110 @@
+"""Unitary tests of the hybrid search over the stored summaries"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, literal, select, union_all
+from sqlalchemy.dialects import postgresql
+
+from backend.app.utils import search
+from backend.app.utils.search import fuse_rankings, search_statement
+
+
+def ranking(name, uuids):
+    """Build a CTE of the uuids of a ranking with their rank, from 1."""
+    return union_all(*(select(literal(uuid).label("uuid"),
+                              literal(rank).label("rank"))
+                       for rank, uuid in enumerate(uuids, 1))).cte(name)
+
+
+def test_hybrid_search_statement():
+    """
+    Test the statement fusing the full-text and vector rankings.
+
+    Asserts:
+        - The full-text candidates match the web search query, ranked by
+          ts_rank_cd in the configured language.
+        - The vector candidates are ordered by cosine distance, so the
+          HNSW index serves them.
+        - Both lists are fused by reciprocal rank with a full outer join,
+          so a summary found by only one ranking is kept.
+    """
+    statement = search_statement("tesla coil", [0.1, 0.2, 0.3], 5)
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    params = statement.compile(dialect=postgresql.dialect()).params
+
+    assert "search_vector @@ websearch_to_tsquery(" in sql
+    assert "ORDER BY ts_rank_cd(" in sql
+    assert "ORDER BY summary_search.embedding <=> " in sql
+    assert "FROM text_hits FULL OUTER JOIN vector_hits" in sql
+    assert "tesla coil" in params.values()
+    assert "simple" in params.values()
+
+
+def test_reciprocal_rank_fusion():
+    """
+    Test the scores of the fusion of two rankings, run by SQLite.
+
+    Asserts:
+        - Each ranking adds 1 / (SEARCH_RRF_K + rank) to the score.
+        - A summary found by both rankings comes before the summaries
+          ranked first by only one of them.
+        - A summary found by a single ranking is kept.
+    """
+    fused = fuse_rankings(ranking("text_hits", ["a", "b"]),
+                          ranking("vector_hits", ["c", "b"]))
+    with create_engine("sqlite://").connect() as conn:
+        scores = dict(conn.execute(fused).all())
+
+    assert scores.keys() == {"a", "b", "c"}
+    assert scores["b"] == pytest.approx(2 / (search.SEARCH_RRF_K + 2))
+    assert scores["a"] == pytest.approx(1 / (search.SEARCH_RRF_K + 1))
+    assert scores["c"] == pytest.approx(scores["a"])
+    assert scores["b"] > scores["a"]
+
+
+def test_index_batch_skips_empty_and_failing_texts(monkeypatch):
+    """
+    Test that a claimed batch is embedded outside of the claim, and that the
+    summaries the model cannot embed do not block the others.
+
+    Asserts:
+        - An empty summary is never sent to the model and is not retried.
+        - When the batch call fails, the texts are embedded one by one and
+          only the rejected one is recorded as failed, to be retried.
+        - The other summaries are stored with their embedding.
+        - The number of claimed summaries is returned.
+    """
+    stored = []
+    failures = []
+
+    async def claim_summaries(batch_size):
+        return [("a", "Tesla was an inventor."), ("b", ""),
+                ("c", "rejected"), ("d", "Curie was a physicist.")]
+
+    async def store_index(rows):
+        stored.extend(rows)
+
+    async def fail_summaries(errors, retry=True):
+        failures.append((errors, retry))
+
+    class FlakyEmbedding:
+        calls = []
+
+        async def aembed_documents(self, texts):
+            self.calls.append(texts)
+            if "rejected" in texts:
+                raise ValueError("Invalid text")
+            return [[float(len(text))] for text in texts]
+
+    for func in (claim_summaries, store_index, fail_summaries):
+        monkeypatch.setattr(search, func.__name__, func)
+    embedding = FlakyEmbedding()
+    claimed = asyncio.run(search.index_summaries(embedding, 4))
+
+    assert claimed == 4
+    assert all("" not in texts for texts in embedding.calls)
+    assert len(embedding.calls) == 4
+    assert [row[0] for row in stored] == ["a", "d"]
+    assert stored[0][2] == [22.0]
+    assert failures == [({"b": "Empty summary"}, False),
+                        ({"c": "Invalid text"}, True)]
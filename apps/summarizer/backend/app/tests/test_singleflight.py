@@ -0,0 +1,73 @@
+"""Unitary tests of the coalescing of concurrent identical requests"""
+import asyncio
+
+from backend.app.api.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    """
+    Test that the concurrent calls of a key await the same run.
+
+    Asserts:
+        - Five concurrent calls of the same key run the function once and
+          all get its result, while another key runs on its own.
+        - A caller cancelled meanwhile does not cancel the run for the
+          others.
+        - The key is released once the run is over.
+    """
+    flights = SingleFlight()
+    runs = []
+
+    async def summarize(key):
+        runs.append(key)
+        await asyncio.sleep(0.01)
+        return f"summary of {key}"
+
+    async def main():
+        calls = [asyncio.create_task(
+            flights.do("tesla", lambda: summarize("tesla"))
+        ) for _ in range(5)]
+        other = flights.do("edison", lambda: summarize("edison"))
+        await asyncio.sleep(0)
+        calls[0].cancel()
+        results = await asyncio.gather(*calls[1:], other)
+        return results, flights.in_flight
+
+    results, in_flight = asyncio.run(main())
+
+    assert sorted(runs) == ["edison", "tesla"]
+    assert results == ["summary of tesla"] * 4 + ["summary of edison"]
+    assert flights.stats == {"leaders": 2, "followers": 4}
+    assert in_flight == 0
+
+
+def test_failure_reaches_every_caller():
+    """
+    Test that the exception of a shared run is raised to all its callers,
+    and that the next call of the key runs again.
+
+    Asserts:
+        - Both concurrent callers get the error.
+        - A later call starts a new run.
+    """
+    flights = SingleFlight()
+    attempts = []
+
+    async def summarize():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("LLM unavailable")
+        return "summary"
+
+    async def main():
+        first = await asyncio.gather(flights.do("tesla", summarize),
+                                     flights.do("tesla", summarize),
+                                     return_exceptions=True)
+        return first, await flights.do("tesla", summarize)
+
+    first, retry = asyncio.run(main())
+
+    assert all(isinstance(result, RuntimeError) for result in first)
+    assert retry == "summary"
+    assert len(attempts) == 2
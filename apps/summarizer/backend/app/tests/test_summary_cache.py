@@ -0,0 +1,138 @@
+"""Unitary tests of the cache of final summaries"""
+import asyncio
+from collections import Counter
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+
+from backend.app.build import pipeline
+from backend.app.utils import cache_eviction, summary_cache
+
+
+class FakeSession:
+    """Session answering every query with the same result."""
+
+    def __init__(self, result=None, rowcount=0):
+        self.result = result
+        self.rowcount = rowcount
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    async def scalar(self, statement):
+        self.statements.append(statement)
+        return self.result
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(rowcount=self.rowcount)
+
+
+class FakeGraph:
+    """Summarizer graph counting its runs."""
+
+    checkpointer = None
+
+    def __init__(self):
+        self.runs = 0
+
+    async def ainvoke(self, defs, config):
+        self.runs += 1
+        return {"final_summary": f"summary {self.runs}"}
+
+
+def article(revision_id):
+    """Build a loaded article of the given revision."""
+    return Document("text", metadata={"language": "en", "page_id": 7,
+                                      "revision_id": revision_id})
+
+
+def test_cached_summary_skips_graph(monkeypatch):
+    """
+    Test that a summary of the same revision and size is served from the
+    cache.
+
+    Asserts:
+        - A miss runs the graph and stores the summary under the revision
+          and size of the article.
+        - A hit returns the stored summary without running the graph.
+        - Another revision or size is a miss.
+    """
+    cache = {}
+    graph = FakeGraph()
+
+    async def get_cached_summary(key):
+        return cache.get(key)
+
+    async def put_cached_summary(key, language, page_id, revision_id,
+                                 token_max, summary):
+        cache[key] = summary
+
+    for func in (get_cached_summary, put_cached_summary):
+        monkeypatch.setattr(pipeline, func.__name__, func)
+    monkeypatch.setattr(pipeline, "get_summarizer_graph", lambda: graph)
+    monkeypatch.setattr(pipeline, "SUMMARY_CACHE_ENABLED", True)
+    monkeypatch.setattr(pipeline, "MAP_SUMMARIES_ENABLED", False)
+
+    first = asyncio.run(pipeline.summarize_document(article(1), 1000))
+    assert first == "summary 1"
+    assert cache == {"en:7:1:1000": "summary 1"}
+
+    assert asyncio.run(pipeline.summarize_document(article(1), 1000)) \
+        == "summary 1"
+    assert graph.runs == 1
+
+    asyncio.run(pipeline.summarize_document(article(2), 1000))
+    asyncio.run(pipeline.summarize_document(article(1), 2000))
+    assert graph.runs == 3
+
+
+def test_lookups_and_eviction(monkeypatch):
+    """
+    Test the counters of the cache and its periodic eviction.
+
+    Asserts:
+        - A lookup finding a summary counts a hit, otherwise a miss.
+        - Storing a summary drops the older revisions of the article.
+        - The least recently used entries beyond SUMMARY_CACHE_MAX_ENTRIES
+          are evicted once every EVICT_EVERY stored summaries.
+    """
+    evictions = []
+
+    async def evict_rows(table, **limits):
+        evictions.append((table, limits))
+        return 3
+
+    monkeypatch.setattr(summary_cache, "evict_rows", evict_rows)
+    monkeypatch.setattr(summary_cache, "CACHE_STATS",
+                        {"hits": 0, "misses": 0, "evictions": 0})
+    monkeypatch.setattr(cache_eviction, "EVICT_EVERY", 2)
+    monkeypatch.setattr(cache_eviction, "_puts_since_eviction", Counter())
+
+    for result in ("summary", None, None):
+        monkeypatch.setattr(summary_cache, "async_session",
+                            lambda: FakeSession(result))
+        asyncio.run(summary_cache.get_cached_summary("en:7:1:1000"))
+    assert summary_cache.CACHE_STATS["hits"] == 1
+    assert summary_cache.CACHE_STATS["misses"] == 2
+
+    session = FakeSession(rowcount=1)
+    monkeypatch.setattr(summary_cache, "async_session", lambda: session)
+    for _ in range(3):
+        asyncio.run(summary_cache.put_cached_summary(
+            "en:7:2:1000", "en", 7, 2, 1000, "summary"
+        ))
+
+    assert "revision_id != " in str(session.statements[1])
+    assert evictions == [(summary_cache.SummaryCache, {
+        "recency": summary_cache.SummaryCache.last_hit_at,
+        "max_rows": summary_cache.SUMMARY_CACHE_MAX_ENTRIES
+    })]
+    assert summary_cache.CACHE_STATS["evictions"] == 3 + 3
@@ -0,0 +1,129 @@
+"""Cache of the raw text of Wikipedia articles keyed by revision"""
+from datetime import datetime as dt
+
+from sqlalchemy import (BigInteger, Column, DateTime, Index, String, Text,
+                        delete, select)
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.app.utils.repository import Base, async_session
+
+
+class WikiArticle(Base):
+    """
+    Represents the wiki_articles table in the database.
+
+    Only the latest known revision of each article is kept.
+
+    Attributes:
+        language (str): The language code of the Wikipedia article.
+        page_id (int): The Wikipedia page id of the article.
+        revision_id (int): The revision of the stored text.
+        title (str): The canonical title of the article.
+        etag (str): The ETag of the latest revision, used to revalidate the
+                    entry with a conditional request.
+        content (str): The plain text content of the article.
+        fetched_at (datetime): When the text was fetched.
+    """
+    __tablename__ = 'wiki_articles'
+    __table_args__ = (
+        Index("wiki_articles_title_idx", "language", "title"),
+    )
+    language = Column(String(16), primary_key=True)
+    page_id = Column(BigInteger, primary_key=True)
+    revision_id = Column(BigInteger, primary_key=True)
+    title = Column(String, nullable=False)
+    etag = Column(String)
+    content = Column(Text, nullable=False)
+    fetched_at = Column(DateTime, default=dt.now)
+
+
+async def get_article_by_title(language: str, title: str) -> dict | None:
+    """
+    Retrieve the latest stored revision of an article by its title.
+
+    Args:
+        language (str): The language code of the Wikipedia article.
+        title (str): The title of the article.
+
+    Returns:
+        dict or None: The stored columns of the article if found,
+                      otherwise None.
+    """
+    async with async_session() as session:
+        article = await session.scalar(
+            select(WikiArticle)
+            .where(WikiArticle.language == language,
+                   WikiArticle.title == title)
+            .order_by(WikiArticle.fetched_at.desc())
+            .limit(1)
+        )
+    return _as_dict(article)
+
+
+async def get_article_revision(language: str, page_id: int,
+                               revision_id: int) -> dict | None:
+    """
+    Retrieve a stored revision of an article.
+
+    Args:
+        language (str): The language code of the Wikipedia article.
+        page_id (int): The Wikipedia page id of the article.
+        revision_id (int): The revision id of the article.
+
+    Returns:
+        dict or None: The stored columns of the article if found,
+                      otherwise None.
+    """
+    async with async_session() as session:
+        article = await session.get(WikiArticle,
+                                    (language, page_id, revision_id))
+    return _as_dict(article)
+
+
+async def put_article(language: str, page_id: int, revision_id: int,
+                      title: str, etag: str | None, content: str) -> None:
+    """
+    Store the text of an article revision, replacing its older revisions.
+
+    Args:
+        language (str): The language code of the Wikipedia article.
+        page_id (int): The Wikipedia page id of the article.
+        revision_id (int): The revision id of the text.
+        title (str): The canonical title of the article.
+        etag (str or None): The ETag of the revision.
+        content (str): The plain text content of the article.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(
+                insert(WikiArticle)
+                .values(language=language,
+                        page_id=page_id,
+                        revision_id=revision_id,
+                        title=title,
+                        etag=etag,
+                        content=content,
+                        fetched_at=dt.now())
+                .on_conflict_do_update(
+                    index_elements=["language", "page_id", "revision_id"],
+                    set_={"title": title, "etag": etag,
+                          "fetched_at": dt.now()}
+                )
+            )
+            await session.execute(
+                delete(WikiArticle)
+                .where(WikiArticle.language == language,
+                       WikiArticle.page_id == page_id,
+                       WikiArticle.revision_id != revision_id)
+            )
+
+
+def _as_dict(article: WikiArticle | None) -> dict | None:
+    if article is None:
+        return None
+    return {"language": article.language,
+            "page_id": article.page_id,
+            "revision_id": article.revision_id,
+            "title": article.title,
+            "etag": article.etag,
+            "content": article.content}
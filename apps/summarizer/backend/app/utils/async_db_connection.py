@@ -1,36 +1,58 @@
 """Create Asynchronous Connection with Postgres"""
-from datetime import datetime as dt
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, String, Text, DateTime
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import datetime as dt, timedelta
+from typing import AsyncIterator
 
-from backend.app.utils.config import ASYNC_DATABASE_URL
+from sqlalchemy import (Column, Integer, String, Text, DateTime, func,
+                        insert, or_, select, text, update)
 
+from backend.app.utils.config import SEARCH_ENABLED
+from backend.app.utils.repository import (Base, WikiSummary, async_session,
+                                          direct_engine, engine)
+from backend.app.utils.search import SummarySearch
 
-# Create the SQLAlchemy engine
-engine = create_async_engine(ASYNC_DATABASE_URL, echo=True)
 
-# Create a base class for declarative class definitions
-Base = declarative_base()
+# Key of the Postgres advisory lock taken by the workers of the app, so one
+# of them at a time creates the schema, and the namespace of the locks of
+# the summaries being generated
+SCHEMA_LOCK_ID = 72_601
+SUMMARY_LOCK_NAMESPACE = 72_603
 
 
-class WikiSummary(Base):
+class SummaryJob(Base):
     """
-    Represents the wiki_summaries table in the database.
+    Represents the summary_jobs table in the database.
 
     Attributes:
-        uuid (str): The unique identifier for each summary.
+        uuid (str): The unique identifier of the job, shared with the
+                    summary row written when the job is done.
         url (str): The URL of the Wikipedia page.
-        summary (str): The summary text of the Wikipedia page.
-        creation_date (datetime): The date and time when the summary
-                                  was created.
+        number_of_words (int): The requested size of the summary.
+        batch_id (str): The batch the job belongs to, if any.
+        status (str): One of 'queued', 'running', 'done' or 'failed'.
+        error (str): The error message when the job failed.
+        owner (str): The worker process queuing or running the job, None
+                     while any process may claim it.
+        heartbeat (datetime): When the owner last showed it was alive, by
+                              the database clock.
+        created_at (datetime): When the job was queued.
+        started_at (datetime): When a worker picked the job up.
+        finished_at (datetime): When the job was done or failed.
     """
-    __tablename__ = 'wiki_summaries'
+    __tablename__ = 'summary_jobs'
     uuid = Column(String, primary_key=True)
     url = Column(String, nullable=False)
-    summary = Column(Text, nullable=False)
-    creation_date = Column(DateTime,
-                           default=dt.now(tz=None))
+    number_of_words = Column(Integer, nullable=False)
+    batch_id = Column(String, index=True)
+    status = Column(String(16), nullable=False, default="queued")
+    error = Column(Text)
+    owner = Column(String)
+    heartbeat = Column(DateTime)
+    created_at = Column(DateTime, default=dt.now)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
 
 
 async def init_db():
@@ -38,78 +60,328 @@ async def init_db():
     Initializes the database by creating the wiki_summaries table.
 
     This function should be called at the start of the application to ensure
-    the database schema is created.
+    the database schema is created. The summary_data column and the
+    indexes of wiki_summaries, and the owner columns of summary_jobs, are
+    also added to databases initialized before they existed. The workers of
+    the app run it one at a time, behind an advisory lock.
+
+    The summary_search table needs the pgvector extension, so it is only
+    created, with the extension, when `SEARCH_ENABLED` is set, which it is
+    not by default.
     """
+    tables = [table for table in Base.metadata.sorted_tables
+              if SEARCH_ENABLED or table is not SummarySearch.__table__]
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"),
+                           {"key": SCHEMA_LOCK_ID})
+        if SEARCH_ENABLED:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.run_sync(Base.metadata.create_all, tables=tables)
+        # create_all does not alter the tables created before the compressed
+        # storage existed
+        await conn.execute(text("ALTER TABLE wiki_summaries "
+                                "ADD COLUMN IF NOT EXISTS summary_data BYTEA"))
+        await conn.execute(text("ALTER TABLE wiki_summaries "
+                                "ALTER COLUMN summary DROP NOT NULL"))
+        await conn.execute(text("ALTER TABLE summary_jobs "
+                                "ADD COLUMN IF NOT EXISTS owner VARCHAR, "
+                                "ADD COLUMN IF NOT EXISTS heartbeat "
+                                "TIMESTAMP"))
+        if SEARCH_ENABLED:
+            # The rows of summary_search are inserted when claimed, before
+            # the summary is embedded
+            await conn.execute(text(
+                "ALTER TABLE summary_search "
+                "ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP, "
+                "ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL "
+                "DEFAULT 0, "
+                "ADD COLUMN IF NOT EXISTS error TEXT, "
+                "ALTER COLUMN search_vector DROP NOT NULL, "
+                "ALTER COLUMN embedding DROP NOT NULL, "
+                "ALTER COLUMN indexed_at DROP NOT NULL"
+            ))
+        for index in WikiSummary.__table__.indexes:
+            await conn.run_sync(index.create, checkfirst=True)
 
 
-# Create a session factory
-async_session = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+async def insert_summary_job(uuid, url, number_of_words,
+                             owner=None) -> str:
+    """
+    Inserts a new queued job into the summary_jobs table.
 
+    Args:
+        uuid (str): The unique identifier for the job.
+        url (str): The URL of the Wikipedia page.
+        number_of_words (int): The requested size of the summary.
+        owner (str, optional): The worker process queuing the job, None to
+                               let any process claim it.
 
-async def insert_wiki_summary(uuid, url, summary) -> str:
+    Returns:
+        str: A message indicating whether the job was inserted successfully
+             or an error occurred.
     """
-    Inserts a new record into the wiki_summaries table.
+    async with async_session() as session:
+        async with session.begin():
+            try:
+                session.add(SummaryJob(uuid=uuid,
+                                       url=url,
+                                       number_of_words=number_of_words,
+                                       status="queued",
+                                       owner=owner,
+                                       heartbeat=func.now()))
+                await session.commit()
+                return "Job queued successfully"
+            except Exception as e:
+                await session.rollback()
+                return f"An error occurred: {e}"
+
+
+async def insert_summary_jobs(rows: list, owner=None) -> str:
+    """
+    Inserts several queued jobs into the summary_jobs table in a single
+    statement.
 
     Args:
-        uuid (str): The unique identifier for the summary.
-        url (str): The URL of the Wikipedia page.
-        summary (str): The summary text of the Wikipedia page.
+        rows (list): Dictionaries with the uuid, url, number_of_words and
+                     batch_id of each job.
+        owner (str, optional): The worker process queuing the jobs, None to
+                               let any process claim them.
 
     Returns:
-        str: A message indicating whether the data was inserted successfully
+        str: A message indicating whether the jobs were inserted successfully
              or an error occurred.
     """
     async with async_session() as session:
         async with session.begin():
             try:
-                # Create a new WikiSummary object
-                new_summary = WikiSummary(
-                    uuid=uuid,
-                    url=url,
-                    summary=summary
+                await session.execute(
+                    insert(SummaryJob).values(heartbeat=func.now()),
+                    [{**row, "status": "queued", "owner": owner}
+                     for row in rows]
                 )
+                await session.commit()
+                return "Jobs queued successfully"
+            except Exception as e:
+                await session.rollback()
+                return f"An error occurred: {e}"
 
-                # Add the new object to the session
-                session.add(new_summary)
 
-                # Commit the transaction
-                await session.commit()
+async def update_summary_jobs(u_ids: list, **fields) -> None:
+    """
+    Updates the given columns of several jobs in a single statement.
 
-                info = "Data inserted successfully"
+    Args:
+        u_ids (list): The unique identifiers of the jobs.
+        **fields: The columns to update and their new values.
+    """
+    if not u_ids:
+        return
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(update(SummaryJob)
+                                  .where(SummaryJob.uuid.in_(u_ids))
+                                  .values(**fields))
 
-                return info
 
-            except Exception as e:
-                await session.rollback()
-                info = f"An error occurred: {e}"
-                return info
+async def update_summary_job(u_id, **fields) -> None:
+    """
+    Updates the given columns of a job in the summary_jobs table.
 
+    Args:
+        u_id (str): The unique identifier for the job.
+        **fields: The columns to update and their new values.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            job = await session.get(SummaryJob, u_id)
+            if job is None:
+                return
+            for key, value in fields.items():
+                setattr(job, key, value)
 
-async def get_wiki_summary(u_id) -> str | None:
+
+async def get_summary_job(u_id) -> dict | None:
     """
-    Retrieves the summary text for a given UUID from the wiki_summaries table.
+    Retrieves the status and timings of a job from the summary_jobs table.
 
     Args:
-        u_id (str): The unique identifier for the summary.
+        u_id (str): The unique identifier for the job.
 
     Returns:
-        str or None: The summary text if found, otherwise None.
+        dict or None: The status, timestamps, durations in seconds and error
+                      of the job if found, otherwise None.
     """
     async with async_session() as session:
         async with session.begin():
             try:
-                # Query the WikiSummary object by u_id
-                result = await session.get(WikiSummary, u_id)
-                if result:
-                    return result.summary
-                else:
-                    return None
+                job = await session.get(SummaryJob, u_id)
             except Exception as e:
                 print(f"An error occurred: {e}")
                 return None
+    if job is None:
+        return None
+    end = job.finished_at or dt.now()
+    info = {
+        "status": job.status,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "queued_seconds": ((job.started_at or end)
+                           - job.created_at).total_seconds(),
+        "running_seconds": ((end - job.started_at).total_seconds()
+                            if job.started_at else None),
+    }
+    if job.error:
+        info["error"] = job.error
+    return info
+
+
+async def get_batch_jobs(batch_id) -> dict | None:
+    """
+    Retrieves the status of every job of a batch.
+
+    Args:
+        batch_id (str): The unique identifier of the batch.
+
+    Returns:
+        dict or None: The status of each job by uuid if the batch exists,
+                      otherwise None.
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            select(SummaryJob.uuid, SummaryJob.status)
+            .where(SummaryJob.batch_id == batch_id)
+        )
+        jobs = dict(result.all())
+    return jobs or None
+
+
+async def start_summary_job(u_id, owner) -> bool:
+    """
+    Marks a queued job as running, if the worker process still owns it.
+
+    Args:
+        u_id (str): The unique identifier for the job.
+        owner (str): The worker process about to run the job.
+
+    Returns:
+        bool: True if the job was started, False if it was queued again
+              for another process meanwhile.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            result = await session.execute(
+                update(SummaryJob)
+                .where(SummaryJob.uuid == u_id,
+                       SummaryJob.owner == owner,
+                       SummaryJob.status == "queued")
+                .values(status="running",
+                        started_at=dt.now(),
+                        heartbeat=func.now())
+            )
+    return result.rowcount > 0
+
+
+async def refresh_summary_jobs(owner, stale_after: float) -> None:
+    """
+    Renews the heartbeat of the jobs of a worker process, and queues again
+    for any process the jobs whose owner stopped beating.
+
+    The jobs left queued or running by a version without owners have no
+    heartbeat and are queued again as well. The statements run on a
+    dedicated connection, outside of the pool.
+
+    Args:
+        owner (str): The worker process that is alive.
+        stale_after (float): The seconds without heartbeat after which a job
+                             is abandoned.
+    """
+    unfinished = SummaryJob.status.in_(("queued", "running"))
+    async with direct_engine.begin() as conn:
+        await conn.execute(update(SummaryJob)
+                           .where(SummaryJob.owner == owner, unfinished)
+                           .values(heartbeat=func.now()))
+        await conn.execute(
+            update(SummaryJob)
+            .where(unfinished,
+                   or_(SummaryJob.owner.is_not(None),
+                       SummaryJob.status == "running"),
+                   or_(SummaryJob.heartbeat.is_(None),
+                       SummaryJob.heartbeat
+                       < func.now() - timedelta(seconds=stale_after)))
+            .values(status="queued", owner=None, started_at=None)
+        )
+
+
+async def claim_summary_jobs(owner, limit: int) -> list:
+    """
+    Takes the ownership of the oldest jobs that no process owns.
+
+    The rows are locked with SKIP LOCKED, so the worker processes claiming
+    at the same time get disjoint jobs. The statement runs on a dedicated
+    connection, outside of the pool.
+
+    Args:
+        owner (str): The worker process claiming the jobs.
+        limit (int): The maximum number of jobs claimed.
+
+    Returns:
+        list: A list of (uuid, url, number_of_words) tuples.
+    """
+    claimable = (select(SummaryJob.uuid)
+                 .where(SummaryJob.status == "queued",
+                        SummaryJob.owner.is_(None))
+                 .order_by(SummaryJob.created_at)
+                 .limit(limit)
+                 .with_for_update(skip_locked=True)
+                 .scalar_subquery())
+    async with direct_engine.begin() as conn:
+        result = await conn.execute(
+            update(SummaryJob)
+            .where(SummaryJob.uuid.in_(claimable))
+            .values(owner=owner, heartbeat=func.now())
+            .returning(SummaryJob.uuid,
+                       SummaryJob.url,
+                       SummaryJob.number_of_words)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+@asynccontextmanager
+async def summary_lock(key: str,
+                       poll_interval: float = 1.0) -> AsyncIterator[None]:
+    """
+    Hold the advisory lock of a summary across the worker processes of the
+    app, waiting for the worker generating the same summary, if any.
+
+    The lock is held by a dedicated connection, outside of the pool, so it
+    is released by Postgres as well when the process dies. While another
+    worker holds it, the lock is tried again every `poll_interval` seconds
+    without keeping any connection open.
+
+    Args:
+        key (str): The key of the summary.
+        poll_interval (float): The seconds between two tries of the lock.
+    """
+    lock_id = int.from_bytes(hashlib.sha256(key.encode()).digest()[:4],
+                             "big", signed=True)
+    params = {"namespace": SUMMARY_LOCK_NAMESPACE, "key": lock_id}
+    while True:
+        conn = await direct_engine.connect()
+        try:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_lock(:namespace, :key)"), params
+            )
+            if locked:
+                try:
+                    yield
+                finally:
+                    await conn.execute(
+                        text("SELECT pg_advisory_unlock(:namespace, :key)"),
+                        params
+                    )
+                return
+        finally:
+            await conn.close()
+        await asyncio.sleep(poll_interval)
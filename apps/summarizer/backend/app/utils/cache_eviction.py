@@ -0,0 +1,97 @@
+"""Evict the expired and least recently used rows of the cache tables"""
+from collections import Counter
+from datetime import datetime as dt, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import Column, delete, func, select
+
+from backend.app.utils.repository import async_session
+
+
+# The eviction scans the whole table, so it only runs once every
+# EVICT_EVERY puts into the table
+EVICT_EVERY = 50
+
+# Puts into each table since its last eviction, in this process
+_puts_since_eviction = Counter()
+
+
+def expiry(ttl_days: int) -> dt:
+    """
+    Get the creation time before which a row is expired.
+
+    Args:
+        ttl_days (int): The number of days a row is kept.
+
+    Returns:
+        datetime: The oldest creation time of a live row.
+    """
+    return dt.now() - timedelta(days=ttl_days)
+
+
+async def evict_rows(table: type, ttl_days: int = 0,
+                     recency: Optional[Column] = None, max_rows: int = 0,
+                     max_bytes: int = 0) -> int:
+    """
+    Delete the rows of a cache table created more than `ttl_days` days ago,
+    then the least recently used ones beyond `max_rows` rows or
+    `max_bytes` bytes, in one transaction.
+
+    Args:
+        table (type): The mapped class of the table, with a `created_at`
+                      column, and a `size_bytes` one when `max_bytes` is set.
+        ttl_days (int): The number of days a row is kept, 0 for no TTL.
+        recency (Column): The column ordering the rows from the most
+                          recently used, required by the size limits.
+        max_rows (int): The number of rows kept, 0 for no limit.
+        max_bytes (int): The total size of the rows kept, 0 for no limit.
+
+    Returns:
+        int: The number of deleted rows.
+    """
+    key = table.__table__.primary_key.columns[0]
+    statements = []
+    if ttl_days:
+        statements.append(
+            delete(table).where(table.created_at <= expiry(ttl_days))
+        )
+    if max_rows:
+        keep = select(key).order_by(recency.desc()).limit(max_rows)
+        statements.append(delete(table).where(key.not_in(keep)))
+    if max_bytes:
+        running_size = (
+            select(key.label("key"),
+                   func.sum(table.size_bytes)
+                   .over(order_by=recency.desc())
+                   .label("running_size"))
+            .subquery()
+        )
+        statements.append(
+            delete(table).where(key.in_(
+                select(running_size.c.key)
+                .where(running_size.c.running_size > max_bytes)
+            ))
+        )
+    evicted = 0
+    async with async_session() as session:
+        async with session.begin():
+            for statement in statements:
+                evicted += (await session.execute(statement)).rowcount
+    return evicted
+
+
+async def count_put(table: type, evict: Callable[[], Awaitable[int]]):
+    """
+    Count a put into a cache table, and run its eviction once every
+    `EVICT_EVERY` puts.
+
+    Args:
+        table (type): The mapped class of the table.
+        evict (Callable[[], Awaitable[int]]): Runs the eviction of the
+                                              table.
+    """
+    name = table.__tablename__
+    _puts_since_eviction[name] += 1
+    if _puts_since_eviction[name] >= EVICT_EVERY:
+        _puts_since_eviction[name] = 0
+        await evict()
@@ -0,0 +1,42 @@
+"""Storage codec of the summary texts"""
+import zstandard
+
+
+# First byte of the stored summaries, bumped whenever the format changes
+FORMAT_ZSTD = 1
+
+_DECOMPRESSOR = zstandard.ZstdDecompressor()
+
+
+def encode_summary(text: str, level: int = 3) -> bytes:
+    """
+    Compress a summary with zstd behind its format version byte.
+
+    Args:
+        text (str): The summary text.
+        level (int): The zstd compression level.
+
+    Returns:
+        bytes: The version byte followed by the compressed UTF-8 text.
+    """
+    compressor = zstandard.ZstdCompressor(level=level)
+    return bytes([FORMAT_ZSTD]) + compressor.compress(text.encode())
+
+
+def decode_summary(data: bytes) -> str:
+    """
+    Decompress a summary stored by `encode_summary`.
+
+    Args:
+        data (bytes): The stored summary.
+
+    Returns:
+        str: The summary text.
+
+    Raises:
+        ValueError: If the format version byte is unknown.
+    """
+    data = bytes(data)
+    if not data or data[0] != FORMAT_ZSTD:
+        raise ValueError(f"Unknown summary format: {data[:1]!r}")
+    return _DECOMPRESSOR.decompress(data[1:]).decode()
@@ -1,5 +1,6 @@
 """Load variables and classes used in this app"""
 import os
+from typing import List
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
@@ -27,9 +28,192 @@ class ArticleRequest(BaseModel):
     )
 
 
+class BatchRequest(BaseModel):
+    """
+    Schema for the input of the batch endpoint.
+
+    Attributes:
+        articles (List[ArticleRequest]): The articles to summarize.
+    """
+    articles: List[ArticleRequest] = Field(
+        min_length=1,
+        title="Articles to summarize."
+    )
+
+
+# Server of the API, several worker processes sharing the port when
+# API_WORKERS is above 1, and the models built before the app reports ready
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+WARM_UP_ENABLED = os.getenv("WARM_UP_ENABLED", "true").lower() == "true"
+
 # Database connection URLs
 SYNC_DATABASE_URL = "postgresql" + os.getenv("POSTGRES_DB_URL")
 ASYNC_DATABASE_URL = "postgresql+asyncpg" + os.getenv("POSTGRES_DB_URL")
 
+# Checkpoints of the graph runs, kept in Postgres so a failed run resumes
+# from its last completed node
+CHECKPOINT_DATABASE_URL = SYNC_DATABASE_URL
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED",
+                               "true").lower() == "true"
+CHECKPOINT_POOL_SIZE = int(os.getenv("CHECKPOINT_POOL_SIZE", "5"))
+# Days after which the checkpoints of a failed or abandoned run are deleted,
+# swept every CHECKPOINT_SWEEP_INTERVAL seconds
+CHECKPOINT_TTL_DAYS = float(os.getenv("CHECKPOINT_TTL_DAYS", "7"))
+CHECKPOINT_SWEEP_INTERVAL = float(os.getenv("CHECKPOINT_SWEEP_INTERVAL",
+                                            "3600"))
+
+# Pool of database connections of each process, and the number of prepared
+# statements cached by each connection
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
 # Google API key
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Chat model used by the chains, and the tiktoken encoding used to count
+# its tokens when tiktoken does not know the model
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash-latest")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0"))
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+
+# Provider of the models, 'fake' answers offline after FAKE_LLM_LATENCY
+# seconds with FAKE_LLM_OUTPUT_WORDS words, for the benchmarks
+LLM_BACKEND = os.getenv("LLM_BACKEND", "google")
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+FAKE_LLM_OUTPUT_WORDS = int(os.getenv("FAKE_LLM_OUTPUT_WORDS", "200"))
+
+# Process-wide limits of the calls to the chat model, and the retries of
+# the calls rejected with a 429 or 5xx error
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "1000"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60.0"))
+
+# Wikipedia server, with the language of the article as a placeholder, so
+# tests can point the loader at a local fixture server
+WIKIPEDIA_BASE_URL = os.getenv("WIKIPEDIA_BASE_URL",
+                               "https://{language}.wikipedia.org")
+WIKIPEDIA_TIMEOUT = float(os.getenv("WIKIPEDIA_TIMEOUT", "30"))
+# Maximum number of open connections of the HTTP client of each language
+WIKIPEDIA_MAX_CONNECTIONS = int(os.getenv("WIKIPEDIA_MAX_CONNECTIONS", "10"))
+# Keep the raw text of the articles in the wiki_articles table
+ARTICLE_CACHE_ENABLED = os.getenv("ARTICLE_CACHE_ENABLED",
+                                  "true").lower() == "true"
+
+# Cache of the LLM responses of the chains, keyed by prompt, evicting the
+# least recently used responses beyond LLM_CACHE_MAX_BYTES and the ones
+# older than LLM_CACHE_TTL_DAYS
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 2**20)))
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+
+# Summaries of the chunks of the articles, kept SECTION_SUMMARIES_TTL_DAYS
+# days, so a new revision only summarizes again the sections it changed.
+# Off by default, as cutting the chunks at every section makes more of them
+SECTION_SUMMARIES_ENABLED = os.getenv("SECTION_SUMMARIES_ENABLED",
+                                      "false").lower() == "true"
+SECTION_SUMMARIES_TTL_DAYS = float(os.getenv("SECTION_SUMMARIES_TTL_DAYS",
+                                             "30"))
+
+# Smallest size of the chunk summaries, doubled until it reaches the number
+# of words requested, so the map stage of an article revision serves every
+# size of a tier, 0 following the size requested. The map outputs are kept
+# MAP_SUMMARIES_TTL_DAYS days
+MAP_TOKEN_MAX = int(os.getenv("MAP_TOKEN_MAX", "1000"))
+MAP_SUMMARIES_ENABLED = os.getenv("MAP_SUMMARIES_ENABLED",
+                                  "true").lower() == "true"
+MAP_SUMMARIES_TTL_DAYS = float(os.getenv("MAP_SUMMARIES_TTL_DAYS", "30"))
+
+# Background jobs: number of workers running the graph and the maximum
+# number of jobs waiting in the queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+
+# Seconds between the heartbeats of the jobs owned by a worker process, and
+# seconds without heartbeat after which its jobs are queued again for the
+# other processes
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "120"))
+
+# Concurrent requests for the same article and size share one graph run in
+# each process, and with SINGLE_FLIGHT_ADVISORY_LOCK across the worker
+# processes too, through a Postgres advisory lock tried every
+# SINGLE_FLIGHT_LOCK_POLL seconds
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED",
+                                  "true").lower() == "true"
+SINGLE_FLIGHT_ADVISORY_LOCK = os.getenv("SINGLE_FLIGHT_ADVISORY_LOCK",
+                                        "false").lower() == "true"
+SINGLE_FLIGHT_LOCK_POLL = float(os.getenv("SINGLE_FLIGHT_LOCK_POLL", "1"))
+
+# Seconds between the comments keeping an event stream alive while the
+# graph runs without sending any event
+SSE_KEEPALIVE_INTERVAL = float(os.getenv("SSE_KEEPALIVE_INTERVAL", "15"))
+
+# Maximum number of graphs run at the same time by the process, shared by
+# the requests, the job workers and the batches, and number of batch
+# summaries written together as they complete
+GRAPH_MAX_CONCURRENCY = int(os.getenv("GRAPH_MAX_CONCURRENCY", "8"))
+BATCH_WRITE_SIZE = max(int(os.getenv("BATCH_WRITE_SIZE", "10")), 1)
+
+# Maximum number of chunks summarized at the same time by a graph node
+NODE_MAX_CONCURRENCY = int(os.getenv("NODE_MAX_CONCURRENCY", "8"))
+
+# Maximum number of LLM calls made to fit a chunk summary in the token
+# limit before truncating it
+GENERATION_MAX_ATTEMPTS = max(int(os.getenv("GENERATION_MAX_ATTEMPTS", "3")),
+                              1)
+
+# Tokens the chat model accepts per call, and documents combined by one
+# reduce call, used to plan the tree of reduce calls
+LLM_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "1048576"))
+REDUCE_MAX_FAN_IN = max(int(os.getenv("REDUCE_MAX_FAN_IN", "10")), 2)
+
+# Maximum number of planned LLM calls of one summary, 0 for no limit
+LLM_MAX_CALLS_PER_REQUEST = int(os.getenv("LLM_MAX_CALLS_PER_REQUEST", "0"))
+
+# Cache of final summaries keyed by article revision and size, evicting
+# the least recently used entries beyond SUMMARY_CACHE_MAX_ENTRIES
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED",
+                                  "true").lower() == "true"
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES",
+                                          "10000"))
+
+# In-process cache of the get_summary responses, bounded in bytes, and the
+# size from which response bodies are gzip-compressed
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES",
+                                         str(64 * 1024 * 1024)))
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+# Storage of the new summaries in wiki_summaries, either as plain 'text' or
+# as 'zstd'-compressed bytes
+SUMMARY_CODEC = os.getenv("SUMMARY_CODEC", "text").lower()
+SUMMARY_ZSTD_LEVEL = int(os.getenv("SUMMARY_ZSTD_LEVEL", "3"))
+
+# Embed the chunks of the articles before the map stage and summarize only
+# one chunk per cluster of chunks at least this cosine similar
+CHUNK_DEDUP_ENABLED = os.getenv("CHUNK_DEDUP_ENABLED",
+                                "false").lower() == "true"
+CHUNK_DEDUP_THRESHOLD = float(os.getenv("CHUNK_DEDUP_THRESHOLD", "0.95"))
+
+# Search over the stored summaries, off by default as it needs the pgvector
+# extension: the full-text configuration of their tsvector, the size of
+# their embedding, the summaries indexed per batch every
+# SEARCH_INDEX_INTERVAL seconds, the claims of a summary failing to embed,
+# SEARCH_RETRY_AFTER seconds apart, and the candidates of each ranking
+# fused with the reciprocal rank constant
+SEARCH_ENABLED = os.getenv("SEARCH_ENABLED", "false").lower() == "true"
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "simple")
+SEARCH_EMBEDDING_DIM = int(os.getenv("SEARCH_EMBEDDING_DIM", "768"))
+SEARCH_INDEX_INTERVAL = float(os.getenv("SEARCH_INDEX_INTERVAL", "60"))
+SEARCH_INDEX_BATCH_SIZE = int(os.getenv("SEARCH_INDEX_BATCH_SIZE", "100"))
+SEARCH_MAX_ATTEMPTS = int(os.getenv("SEARCH_MAX_ATTEMPTS", "3"))
+SEARCH_RETRY_AFTER = float(os.getenv("SEARCH_RETRY_AFTER", "3600"))
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "50"))
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
@@ -0,0 +1,207 @@
+"""Export the stored summaries to a Parquet or JSONL file.
+
+Usage:
+    python -m backend.app.utils.export_summaries --format parquet \
+        --output summaries.parquet --watermark-file summaries.watermark
+"""
+import argparse
+import asyncio
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime as dt, timedelta
+from typing import AsyncIterator, Callable, Iterator
+
+from sqlalchemy import select
+
+from backend.app.utils.repository import WikiSummary, engine, summary_text
+
+
+async def iter_summary_batches(since: dt | None = None,
+                               until: dt | None = None,
+                               batch_size: int = 5000
+                               ) -> AsyncIterator[list]:
+    """
+    Read the summaries created after a watermark, in creation order, in
+    batches fetched from a server-side cursor, so the table is never loaded
+    at once.
+
+    Args:
+        since (datetime, optional): Only read the summaries created after
+                                    it, all of them when None.
+        until (datetime, optional): Only read the summaries created before
+                                    it, the newest ones too when None.
+        batch_size (int): The number of rows fetched per round trip.
+
+    Yields:
+        list: The uuid, url, decoded summary and creation date of each row
+              of the batch.
+    """
+    query = (select(WikiSummary.uuid,
+                    WikiSummary.url,
+                    WikiSummary.summary,
+                    WikiSummary.summary_data,
+                    WikiSummary.creation_date)
+             .order_by(WikiSummary.creation_date, WikiSummary.uuid))
+    if since is not None:
+        query = query.where(WikiSummary.creation_date > since)
+    if until is not None:
+        query = query.where(WikiSummary.creation_date < until)
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            query.execution_options(yield_per=batch_size)
+        )
+        async for rows in result.partitions():
+            yield [{"uuid": row.uuid,
+                    "url": row.url,
+                    "summary": summary_text(row.summary, row.summary_data),
+                    "creation_date": row.creation_date} for row in rows]
+
+
+@contextmanager
+def open_jsonl(path: str) -> Iterator[Callable[[list], None]]:
+    """
+    Open a JSON Lines file, one summary per line.
+
+    Args:
+        path (str): The path of the file.
+
+    Yields:
+        Callable: The function appending a batch of rows to the file.
+    """
+    with open(path, "w", encoding="utf-8") as file:
+        def write(rows: list):
+            file.writelines(
+                json.dumps({**row,
+                            "creation_date": row["creation_date"].isoformat()},
+                           ensure_ascii=False) + "\n"
+                for row in rows
+            )
+
+        yield write
+
+
+@contextmanager
+def open_parquet(path: str) -> Iterator[Callable[[list], None]]:
+    """
+    Open a zstd-compressed Parquet file, each batch written as a row group.
+
+    Args:
+        path (str): The path of the file.
+
+    Yields:
+        Callable: The function appending a batch of rows to the file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("uuid", pa.string()),
+                        ("url", pa.string()),
+                        ("summary", pa.string()),
+                        ("creation_date", pa.timestamp("us"))])
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        def write(rows: list):
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+        yield write
+
+
+WRITERS = {"jsonl": open_jsonl, "parquet": open_parquet}
+
+
+async def export_summaries(path: str, file_format: str,
+                           since: dt | None = None,
+                           until: dt | None = None,
+                           batch_size: int = 5000) -> tuple[int, dt | None]:
+    """
+    Stream the summaries created after a watermark to a file.
+
+    The rows are written to a temporary file, renamed once the export is
+    complete, so a failed export never leaves a truncated file at `path`,
+    and the temporary file is deleted when the export fails.
+
+    Args:
+        path (str): The path of the exported file.
+        file_format (str): Either 'parquet' or 'jsonl'.
+        since (datetime, optional): Only export the summaries created after
+                                    it, all of them when None.
+        until (datetime, optional): Only export the summaries created before
+                                    it, the newest ones too when None.
+        batch_size (int): The number of rows fetched and written at once.
+
+    Returns:
+        tuple[int, datetime or None]: The number of exported rows and the
+                                      creation date of the last one, the
+                                      watermark of the next export.
+    """
+    partial = f"{path}.part"
+    total = 0
+    watermark = since
+    try:
+        with WRITERS[file_format](partial) as write:
+            async for rows in iter_summary_batches(since, until, batch_size):
+                write(rows)
+                total += len(rows)
+                watermark = rows[-1]["creation_date"]
+                print(f"Exported {total} summaries")
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, path)
+    return total, watermark
+
+
+def read_watermark(path: str | None) -> dt | None:
+    """Read the watermark saved by the previous export, if any."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as file:
+        return dt.fromisoformat(file.read().strip())
+
+
+async def main(path: str, file_format: str, since: dt | None,
+               watermark_file: str | None, margin: float, batch_size: int):
+    """
+    Export the summaries, save the new watermark and close the pool.
+
+    The creation date of a summary is set before its row is committed, so
+    the summaries created in the last `margin` seconds are left to the next
+    export, by which time the rows created before them are visible too.
+    """
+    try:
+        if since is None:
+            since = read_watermark(watermark_file)
+        until = dt.now() - timedelta(seconds=margin)
+        total, watermark = await export_summaries(path, file_format, since,
+                                                  until, batch_size)
+        if watermark_file and watermark is not None:
+            with open(watermark_file, "w", encoding="utf-8") as file:
+                file.write(watermark.isoformat())
+        print(f"Done, {total} summaries exported to {path}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True,
+                        help="The path of the exported file.")
+    parser.add_argument("--format", choices=list(WRITERS), default="parquet",
+                        help="The format of the exported file.")
+    parser.add_argument("--since", type=dt.fromisoformat,
+                        help=("Only export the summaries created after this "
+                              "ISO date, overriding the watermark file."))
+    parser.add_argument("--watermark-file",
+                        help=("The file keeping the creation date of the "
+                              "last exported summary, read as --since and "
+                              "updated after each export."))
+    parser.add_argument("--margin", type=float, default=300,
+                        help=("Leave the summaries created in the last "
+                              "seconds to the next export, as older rows "
+                              "may not be committed yet."))
+    parser.add_argument("--batch-size", type=int, default=5000,
+                        help="The number of rows fetched and written at once.")
+    args = parser.parse_args()
+    asyncio.run(main(args.output, args.format, args.since,
+                     args.watermark_file, args.margin, args.batch_size))
@@ -1,10 +1,81 @@
 """All custom functions used in this app"""
+import asyncio
+import json
 import re
-from typing import List
+from typing import AsyncIterator, Awaitable, List
 
 from langchain_core.documents import Document
 
-from backend.app.build.models import ENCODING
+from backend.app.build.models import get_encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the encoding of the language model.
+
+    Args:
+        text (str): The text to count.
+
+    Returns:
+        int: The number of tokens of the text.
+    """
+    return len(get_encoding().encode(text))
+
+
+def to_document(text: str, n_tokens: int | None = None) -> Document:
+    """
+    Create a Document annotated with its number of tokens.
+
+    The count is stored in the `n_tokens` metadata so it is computed only
+    once, when the text is created.
+
+    Args:
+        text (str): The content of the document.
+        n_tokens (int, optional): The number of tokens of the text, when
+                                  already known.
+
+    Returns:
+        Document: The annotated document.
+    """
+    if n_tokens is None:
+        n_tokens = count_tokens(text)
+    return Document(text, metadata={"n_tokens": n_tokens})
+
+
+def document_tokens(document: Document) -> int:
+    """
+    Get the number of tokens of a document, counting and annotating it
+    only if the document was not created by `to_document`.
+
+    Args:
+        document (Document): The document.
+
+    Returns:
+        int: The number of tokens of the document.
+    """
+    n_tokens = document.metadata.get("n_tokens")
+    if n_tokens is None:
+        n_tokens = count_tokens(document.page_content)
+        document.metadata["n_tokens"] = n_tokens
+    return n_tokens
+
+
+def join_documents(documents: Document | List[Document]) -> str:
+    """
+    Render documents as the text of a prompt, their contents separated by
+    blank lines, so their metadata reaches neither the LLM nor the cache
+    keys.
+
+    Args:
+        documents (Document | List[Document]): A document or a list of
+                                                documents.
+
+    Returns:
+        str: The contents of the documents.
+    """
+    if isinstance(documents, Document):
+        return documents.page_content
+    return "\n\n".join(doc.page_content for doc in documents)
 
 
 def length_function(documents: List[Document]) -> int:
@@ -18,7 +89,95 @@ def length_function(documents: List[Document]) -> int:
     Returns:
         int: The total number of tokens for the content of the documents.
     """
-    return sum(len(ENCODING.encode(doc.page_content)) for doc in documents)
+    return sum(document_tokens(doc) for doc in documents)
+
+
+def truncate_tokens(text: str, token_max: int) -> Document:
+    """
+    Truncate a text to its first `token_max` tokens.
+
+    Args:
+        text (str): The text to truncate.
+        token_max (int): The maximum number of tokens kept.
+
+    Returns:
+        Document: The truncated text, annotated with its number of tokens.
+    """
+    encoding = get_encoding()
+    tokens = encoding.encode(text)[:token_max]
+    return to_document(encoding.decode(tokens), len(tokens))
+
+
+async def gather_with_concurrency(limit: int,
+                                  coros: List[Awaitable]) -> list:
+    """
+    Await the given coroutines with at most `limit` of them running at the
+    same time.
+
+    Args:
+        limit (int): The maximum number of coroutines running concurrently.
+        coros (List[Awaitable]): The coroutines to await.
+
+    Returns:
+        list: The results, in the same order as the coroutines.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(bounded(coro) for coro in coros))
+
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Format a server-sent event.
+
+    Args:
+        event (str): The name of the event.
+        data (dict): The data of the event, sent as JSON.
+
+    Returns:
+        str: The event in the text/event-stream format.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def with_keepalive(events: AsyncIterator,
+                         interval: float) -> AsyncIterator:
+    """
+    Iterate over an async iterator, yielding None whenever it produced
+    nothing for `interval` seconds, so the caller can keep its connection
+    alive.
+
+    Args:
+        events (AsyncIterator): The iterator to forward.
+        interval (float): The seconds of silence before a None.
+
+    Yields:
+        The items of the iterator, and None after each silent interval.
+    """
+    iterator = aiter(events)
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(iterator))
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield None
+                continue
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            finally:
+                pending = None
+            yield item
+    finally:
+        if pending is not None:
+            pending.cancel()
 
 
 def validate_wikipedia_url(wikipedia_url: str) -> str:
@@ -0,0 +1,157 @@
+"""In-process cache and conditional responses of immutable JSON bodies"""
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+
+# Stored summaries never change, so clients and proxies may keep them
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def etag_matches(if_none_match: str | None, etags: tuple) -> bool:
+    """
+    Tell whether an If-None-Match header matches one of the ETags of a
+    response, using the weak comparison required for that header.
+
+    Args:
+        if_none_match (str or None): The value of the If-None-Match header.
+        etags (tuple): The ETags of the representations of the response.
+
+    Returns:
+        bool: True if the client already holds the response.
+    """
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/")
+                  for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag in etags for tag in candidates)
+
+
+class ResponseCache:
+    """
+    Least recently used cache of encoded JSON responses, bounded by the
+    size of their bodies.
+
+    Each entry keeps the JSON body, its strong ETag and, when the body is at
+    least `gzip_min_size` bytes, its gzip-compressed variant with its own
+    ETag.
+
+    Attributes:
+        max_bytes (int): The size above which the oldest entries are evicted.
+        gzip_min_size (int): The size from which bodies are compressed.
+        size (int): The size of the cached bodies.
+        stats (dict): The hits, misses and evictions of this process.
+    """
+
+    def __init__(self, max_bytes: int, gzip_min_size: int = 1024):
+        self.max_bytes = max_bytes
+        self.gzip_min_size = gzip_min_size
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> dict | None:
+        """
+        Retrieve an entry and mark it as the most recently used.
+
+        Args:
+            key (str): The key of the response.
+
+        Returns:
+            dict or None: The entry if cached, otherwise None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry
+
+    def encode(self, content: dict) -> dict:
+        """
+        Encode a response and its variants without caching it.
+
+        Args:
+            content (dict): The content of the response.
+
+        Returns:
+            dict: The body, its ETag, and the gzip body and ETag, if any.
+        """
+        body = json.dumps(jsonable_encoder(content),
+                          ensure_ascii=False,
+                          separators=(",", ":")).encode()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        entry = {"body": body, "etag": f'"{digest}"',
+                 "gzip": None, "gzip_etag": None}
+        if len(body) >= self.gzip_min_size:
+            entry["gzip"] = gzip.compress(body, mtime=0)
+            entry["gzip_etag"] = f'"{digest}-gzip"'
+        return entry
+
+    def put(self, key: str, content: dict) -> dict:
+        """
+        Encode and cache a response, evicting the least recently used ones
+        beyond `max_bytes`.
+
+        Args:
+            key (str): The key of the response.
+            content (dict): The content of the response.
+
+        Returns:
+            dict: The cached entry.
+        """
+        entry = self.encode(content)
+        entry_size = len(entry["body"]) + len(entry["gzip"] or b"")
+        if key in self._entries:
+            self.size -= self._entries.pop(key)["size"]
+        entry["size"] = entry_size
+        if entry_size > self.max_bytes:
+            return entry
+        self._entries[key] = entry
+        self.size += entry_size
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted["size"]
+            self.stats["evictions"] += 1
+        return entry
+
+    def get_stats(self) -> dict:
+        """Report the counters, the number of entries and their size."""
+        return {**self.stats, "entries": len(self._entries),
+                "size_bytes": self.size}
+
+
+def cached_response(entry: dict, headers) -> Response:
+    """
+    Build the response of a cached entry for a request.
+
+    The gzip variant is sent to the clients accepting it, and a 304 without
+    body to the clients already holding the response.
+
+    Args:
+        entry (dict): The entry built by `ResponseCache.encode`.
+        headers (Headers): The headers of the request.
+
+    Returns:
+        Response: The full, compressed or not modified response.
+    """
+    use_gzip = (entry["gzip"] is not None
+                and "gzip" in headers.get("accept-encoding", ""))
+    etag = entry["gzip_etag"] if use_gzip else entry["etag"]
+    response_headers = {"ETag": etag,
+                        "Cache-Control": IMMUTABLE,
+                        "Vary": "Accept-Encoding"}
+    if etag_matches(headers.get("if-none-match"),
+                    (entry["etag"], entry["gzip_etag"])):
+        return Response(status_code=304, headers=response_headers)
+    if use_gzip:
+        response_headers["Content-Encoding"] = "gzip"
+        return Response(entry["gzip"], media_type="application/json",
+                        headers=response_headers)
+    return Response(entry["body"], media_type="application/json",
+                    headers=response_headers)
@@ -0,0 +1,52 @@
+"""Index the stored summaries for the search, in batches.
+
+Usage:
+    python -m backend.app.utils.index_summaries --batch-size 100
+"""
+import argparse
+import asyncio
+
+from backend.app.build.models import get_embedding
+from backend.app.utils.async_db_connection import init_db
+from backend.app.utils.repository import engine
+from backend.app.utils.search import index_summaries
+
+
+async def backfill(batch_size: int = 100) -> int:
+    """
+    Index the summaries not indexed yet, one claimed batch at a time, so
+    the backfill can be stopped and resumed, and run next to the app. The
+    summaries failing to embed are left to the later runs.
+
+    Args:
+        batch_size (int): The number of summaries embedded per call.
+
+    Returns:
+        int: The number of processed summaries.
+    """
+    embedding = get_embedding()
+    total = 0
+    while True:
+        processed = await index_summaries(embedding, batch_size)
+        if not processed:
+            return total
+        total += processed
+        print(f"Processed {total} summaries")
+
+
+async def main(batch_size: int):
+    """Create the search table, backfill it and close the pool."""
+    try:
+        await init_db()
+        total = await backfill(batch_size)
+        print(f"Done, {total} summaries processed")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="The number of summaries embedded per call.")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
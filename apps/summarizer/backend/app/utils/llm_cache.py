@@ -0,0 +1,128 @@
+"""Persistent cache of the LLM responses of the chains"""
+from datetime import datetime as dt
+
+from sqlalchemy import (Column, DateTime, Index, Integer, String, Text, func,
+                        select, update)
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.app.utils.cache_eviction import count_put, evict_rows, expiry
+from backend.app.utils.repository import Base, async_session
+from backend.app.utils.config import LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_DAYS
+from backend.app.utils.metrics import count_lookup
+
+
+# Hit, miss and eviction counters of this process
+LLM_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+class LLMCache(Base):
+    """
+    Represents the llm_cache table in the database.
+
+    Attributes:
+        cache_key (str): The hash of the model, temperature, rendered prompt
+                         and token_max of the call.
+        response (str): The parsed response of the chain.
+        size_bytes (int): The size of the response, used by the eviction.
+        created_at (datetime): When the response was stored, used by the TTL.
+        last_used_at (datetime): When the response was last served, used for
+                                 the least recently used eviction.
+    """
+    __tablename__ = 'llm_cache'
+    __table_args__ = (
+        Index("llm_cache_last_used_idx", "last_used_at"),
+    )
+    cache_key = Column(String(64), primary_key=True)
+    response = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=dt.now)
+    last_used_at = Column(DateTime, default=dt.now)
+
+
+async def get_llm_response(key: str) -> str | None:
+    """
+    Retrieve a cached response that is not expired and refresh its recency.
+
+    Args:
+        key (str): The cache key of the call.
+
+    Returns:
+        str or None: The cached response if found, otherwise None.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            response = await session.scalar(
+                update(LLMCache)
+                .where(LLMCache.cache_key == key,
+                       LLMCache.created_at > expiry(LLM_CACHE_TTL_DAYS))
+                .values(last_used_at=dt.now())
+                .returning(LLMCache.response)
+            )
+    if response is None:
+        LLM_CACHE_STATS["misses"] += 1
+    else:
+        LLM_CACHE_STATS["hits"] += 1
+    count_lookup("llm", response is not None)
+    return response
+
+
+async def put_llm_response(key: str, response: str) -> None:
+    """
+    Store the response of a call, replacing an expired one, and run the
+    eviction every `EVICT_EVERY` calls.
+
+    Args:
+        key (str): The cache key of the call.
+        response (str): The parsed response of the chain.
+    """
+    now = dt.now()
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(
+                insert(LLMCache)
+                .values(cache_key=key,
+                        response=response,
+                        size_bytes=len(response.encode()),
+                        created_at=now,
+                        last_used_at=now)
+                .on_conflict_do_update(
+                    index_elements=["cache_key"],
+                    set_={"response": response,
+                          "size_bytes": len(response.encode()),
+                          "created_at": now,
+                          "last_used_at": now}
+                )
+            )
+    await count_put(LLMCache, evict_llm_cache)
+
+
+async def evict_llm_cache() -> int:
+    """
+    Delete the expired responses, then the least recently used ones until
+    the cache fits in `LLM_CACHE_MAX_BYTES`.
+
+    Returns:
+        int: The number of deleted responses.
+    """
+    evicted = await evict_rows(LLMCache,
+                               ttl_days=LLM_CACHE_TTL_DAYS,
+                               recency=LLMCache.last_used_at,
+                               max_bytes=LLM_CACHE_MAX_BYTES)
+    LLM_CACHE_STATS["evictions"] += evicted
+    return evicted
+
+
+async def get_llm_cache_stats() -> dict:
+    """
+    Report the counters of the cache and the size of the stored responses.
+
+    Returns:
+        dict: The hits, misses and evictions of this process, the number of
+              entries and their total size in bytes.
+    """
+    async with async_session() as session:
+        entries, size = (await session.execute(
+            select(func.count(), func.coalesce(func.sum(LLMCache.size_bytes),
+                                               0))
+        )).one()
+    return {**LLM_CACHE_STATS, "entries": entries, "size_bytes": size}
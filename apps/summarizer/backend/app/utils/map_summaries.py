@@ -0,0 +1,142 @@
+"""Outputs of the map stage, reused by every size of summary"""
+import hashlib
+import json
+from datetime import datetime as dt
+from typing import List
+
+from langchain_core.documents import Document
+from sqlalchemy import (JSON, BigInteger, Column, DateTime, Index, String,
+                        select)
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.app.utils.cache_eviction import count_put, evict_rows, expiry
+from backend.app.utils.repository import Base, async_session
+from backend.app.utils.config import (CHUNK_DEDUP_ENABLED,
+                                      CHUNK_DEDUP_THRESHOLD,
+                                      LLM_MODEL,
+                                      LLM_TEMPERATURE,
+                                      MAP_SUMMARIES_TTL_DAYS,
+                                      SECTION_SUMMARIES_ENABLED)
+from backend.app.utils.functions import document_tokens, to_document
+from backend.app.utils.metrics import count_lookup
+
+
+# Revisions whose map stage was reused and revisions mapped again, in this
+# process
+MAP_SUMMARY_STATS = {"hits": 0, "misses": 0}
+
+
+class MapSummaries(Base):
+    """
+    Represents the map_summaries table in the database.
+
+    Attributes:
+        map_key (str): The key built by `map_key`.
+        language (str): The language code of the Wikipedia article.
+        page_id (int): The Wikipedia page id of the article.
+        revision_id (int): The revision of the article that was mapped.
+        summaries (list): The text and number of tokens of each chunk
+                          summary, in order.
+        created_at (datetime): When the summaries were stored, used by the
+                               TTL.
+    """
+    __tablename__ = 'map_summaries'
+    __table_args__ = (
+        Index("map_summaries_created_idx", "created_at"),
+    )
+    map_key = Column(String(64), primary_key=True)
+    language = Column(String(16), nullable=False)
+    page_id = Column(BigInteger, nullable=False)
+    revision_id = Column(BigInteger, nullable=False)
+    summaries = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=dt.now)
+
+
+def map_key(article: dict, token_max: int, prompt: str) -> str:
+    """
+    Build the key of the map stage of an article revision, which changes
+    with the settings the chunks are cut and summarized with, but not with
+    the size of the final summary.
+
+    Args:
+        article (dict): The metadata of the article, with its language,
+                        page id and revision id.
+        token_max (int): The size of the chunk summaries.
+        prompt (str): The template of the prompt summarizing the chunks.
+
+    Returns:
+        str: The SHA-256 hex digest of the map stage.
+    """
+    payload = json.dumps([article["language"], article["page_id"],
+                          article["revision_id"], LLM_MODEL, LLM_TEMPERATURE,
+                          prompt, token_max, CHUNK_DEDUP_ENABLED,
+                          CHUNK_DEDUP_THRESHOLD, SECTION_SUMMARIES_ENABLED])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def get_map_summaries(key: str) -> List[Document] | None:
+    """
+    Retrieve the chunk summaries of an article revision.
+
+    Args:
+        key (str): The key of the map stage.
+
+    Returns:
+        List[Document] or None: The chunk summaries annotated with their
+                                number of tokens, or None when the revision
+                                was not mapped or expired.
+    """
+    async with async_session() as session:
+        summaries = await session.scalar(
+            select(MapSummaries.summaries)
+            .where(MapSummaries.map_key == key,
+                   MapSummaries.created_at
+                   > expiry(MAP_SUMMARIES_TTL_DAYS))
+        )
+    count_lookup("map", summaries is not None)
+    if summaries is None:
+        MAP_SUMMARY_STATS["misses"] += 1
+        return None
+    MAP_SUMMARY_STATS["hits"] += 1
+    return [to_document(text, n_tokens) for text, n_tokens in summaries]
+
+
+async def put_map_summaries(key: str, article: dict,
+                            summaries: List[Document]) -> None:
+    """
+    Store the chunk summaries of an article revision, and delete the
+    expired ones every `EVICT_EVERY` calls.
+
+    Args:
+        key (str): The key of the map stage.
+        article (dict): The metadata of the article.
+        summaries (List[Document]): The chunk summaries, in order.
+    """
+    now = dt.now()
+    statement = insert(MapSummaries).values(
+        map_key=key,
+        language=article["language"],
+        page_id=article["page_id"],
+        revision_id=article["revision_id"],
+        summaries=[[doc.page_content, document_tokens(doc)]
+                   for doc in summaries],
+        created_at=now
+    )
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(statement.on_conflict_do_update(
+                index_elements=["map_key"],
+                set_={"summaries": statement.excluded.summaries,
+                      "created_at": now}
+            ))
+    await count_put(MapSummaries, evict_map_summaries)
+
+
+async def evict_map_summaries() -> int:
+    """
+    Delete the map outputs older than `MAP_SUMMARIES_TTL_DAYS`.
+
+    Returns:
+        int: The number of deleted outputs.
+    """
+    return await evict_rows(MapSummaries, ttl_days=MAP_SUMMARIES_TTL_DAYS)
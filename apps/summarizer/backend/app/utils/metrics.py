@@ -0,0 +1,176 @@
+"""Prometheus metrics of the summarizer, exported by the /metrics endpoint"""
+import asyncio
+import functools
+import os
+import time
+from typing import Callable
+
+from prometheus_client import (CONTENT_TYPE_LATEST,
+                               CollectorRegistry,
+                               Counter,
+                               Histogram,
+                               generate_latest,
+                               multiprocess)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+# Graph runs last from seconds to many minutes on long articles
+NODE_DURATION = Histogram(
+    "summarizer_node_duration_seconds",
+    "Duration of the graph nodes.",
+    ["node"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+LLM_CALL_DURATION = Histogram(
+    "summarizer_llm_call_duration_seconds",
+    "Duration of the calls to the chat model, until the first chunk for "
+    "streams, each retry counted apart and the rate limiter waits "
+    "excluded.",
+    ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+LLM_TOKENS = Histogram(
+    "summarizer_llm_tokens",
+    "Tokens sent to and received from the chat model per call.",
+    ["direction"],
+    buckets=tuple(2 ** n for n in range(4, 21, 2))
+)
+MAP_CHUNKS = Histogram(
+    "summarizer_map_chunks",
+    "Chunks summarized by the map stage per article.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+)
+COLLAPSE_LEVELS = Histogram(
+    "summarizer_collapse_levels",
+    "Levels of reduce calls planned before the final one per summary.",
+    buckets=(0, 1, 2, 3, 4, 5, 6)
+)
+SUMMARY_BUDGET_USAGE = Histogram(
+    "summarizer_summary_budget_usage_ratio",
+    "Tokens of the generated summaries over the requested size.",
+    ["stage"],
+    buckets=(0.25, 0.5, 0.75, 0.9, 1, 1.1, 1.25, 1.5, 2)
+)
+WIKIPEDIA_REQUEST_DURATION = Histogram(
+    "summarizer_wikipedia_request_duration_seconds",
+    "Duration of the requests to Wikipedia by the data they fetch.",
+    ["request"]
+)
+DEDUP_CHUNKS = Counter(
+    "summarizer_dedup_chunks_total",
+    "Chunks kept and dropped as near-duplicates before the map stage.",
+    ["result"]
+)
+DEDUP_SAVED_TOKENS = Counter(
+    "summarizer_dedup_saved_tokens_total",
+    "Tokens of the near-duplicate chunks not sent to the map stage."
+)
+CACHE_LOOKUPS = Counter(
+    "summarizer_cache_lookups_total",
+    "Lookups of the caches by result.",
+    ["cache", "result"]
+)
+DB_QUERY_DURATION = Histogram(
+    "summarizer_db_query_duration_seconds",
+    "Duration of the database statements by their SQL verb.",
+    ["operation"]
+)
+
+
+def timed(histogram: Histogram, *labels: str) -> Callable:
+    """
+    Decorate a function, synchronous or not, so its duration is observed
+    by a histogram, whether it returns or raises.
+
+    Args:
+        histogram (Histogram): The histogram observing the durations.
+        *labels (str): The label values of the histogram, if any.
+
+    Returns:
+        Callable: The decorator.
+    """
+    metric = histogram.labels(*labels) if labels else histogram
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    metric.observe(time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start)
+        return wrapper
+
+    return decorator
+
+
+def instrument_node(func: Callable) -> Callable:
+    """Observe the duration of a graph node under the name of its function."""
+    return timed(NODE_DURATION, func.__name__)(func)
+
+
+def count_lookup(cache: str, hit: bool):
+    """
+    Count a lookup of a cache.
+
+    Args:
+        cache (str): The name of the cache.
+        hit (bool): Whether the lookup found an entry.
+    """
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def instrument_engine(engine: AsyncEngine):
+    """
+    Observe the duration of every statement run by the engine.
+
+    Args:
+        engine (AsyncEngine): The engine of the database.
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context,
+                    executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context,
+                  executemany):
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        operation = (statement.split(None, 1) or ["unknown"])[0].upper()
+        DB_QUERY_DURATION.labels(operation).observe(duration)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def fail_query(context):
+        # The failed statement never reaches after_cursor_execute
+        if context.connection is not None:
+            starts = context.connection.info.get("query_start")
+            if starts:
+                starts.pop()
+
+
+def latest_metrics() -> tuple[bytes, str]:
+    """
+    Render the metrics in the Prometheus text format.
+
+    When the app runs several workers, each one writes its metrics in
+    `PROMETHEUS_MULTIPROC_DIR` and the metrics of all of them are merged.
+
+    Returns:
+        tuple[bytes, str]: The body and its content type.
+    """
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(), CONTENT_TYPE_LATEST
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,79 @@
+"""Rewrite the stored summaries with another storage codec.
+
+Usage:
+    python -m backend.app.utils.migrate_summaries --codec zstd
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import select, update
+
+from backend.app.utils.async_db_connection import init_db
+from backend.app.utils.repository import (WikiSummary,
+                                          async_session,
+                                          engine,
+                                          stored_summary,
+                                          summary_text)
+
+
+async def migrate_summaries(codec: str, batch_size: int = 500) -> int:
+    """
+    Rewrite the summaries not yet stored with a codec, in batches read in
+    primary key order so the table is never loaded at once. Each batch is
+    committed on its own, so the migration can be stopped and resumed.
+
+    Args:
+        codec (str): Either 'text' or 'zstd'.
+        batch_size (int): The number of rows rewritten per transaction.
+
+    Returns:
+        int: The number of rewritten rows.
+    """
+    pending = (WikiSummary.summary_data.is_(None) if codec == "zstd"
+               else WikiSummary.summary.is_(None))
+    last_uuid = ""
+    total = 0
+    while True:
+        async with async_session() as session:
+            async with session.begin():
+                rows = (await session.execute(
+                    select(WikiSummary.uuid,
+                           WikiSummary.summary,
+                           WikiSummary.summary_data)
+                    .where(pending, WikiSummary.uuid > last_uuid)
+                    .order_by(WikiSummary.uuid)
+                    .limit(batch_size)
+                )).all()
+                if not rows:
+                    return total
+                await session.execute(
+                    update(WikiSummary),
+                    [{"uuid": row.uuid,
+                      **stored_summary(summary_text(row.summary,
+                                                    row.summary_data),
+                                       codec)}
+                     for row in rows]
+                )
+        last_uuid = rows[-1].uuid
+        total += len(rows)
+        print(f"Rewrote {total} summaries")
+
+
+async def main(codec: str, batch_size: int):
+    """Prepare the schema, migrate the summaries and close the pool."""
+    try:
+        await init_db()
+        total = await migrate_summaries(codec, batch_size)
+        print(f"Done, {total} summaries stored as {codec}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--codec", choices=["text", "zstd"], default="zstd",
+                        help="The storage codec of the rewritten summaries.")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="The number of rows rewritten per transaction.")
+    args = parser.parse_args()
+    asyncio.run(main(args.codec, args.batch_size))
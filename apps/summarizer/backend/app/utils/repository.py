@@ -0,0 +1,236 @@
+"""Shared repository of the wiki_summaries table"""
+from datetime import datetime as dt
+
+from sqlalchemy import Column, DateTime, LargeBinary, String, Text, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import NullPool
+
+from backend.app.utils.codec import decode_summary, encode_summary
+from backend.app.utils.config import (ASYNC_DATABASE_URL,
+                                      DB_ECHO,
+                                      DB_MAX_OVERFLOW,
+                                      DB_POOL_RECYCLE,
+                                      DB_POOL_SIZE,
+                                      DB_POOL_TIMEOUT,
+                                      DB_STATEMENT_CACHE_SIZE,
+                                      SUMMARY_CODEC,
+                                      SUMMARY_ZSTD_LEVEL)
+from backend.app.utils.metrics import instrument_engine
+
+
+# Create the SQLAlchemy engine, with a pool of asyncpg connections that
+# keep their prepared statements
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=DB_ECHO,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+    connect_args={"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+)
+instrument_engine(engine)
+
+# Engine opening a dedicated connection on each use, for the background
+# loops and the long-held locks, so they never take a connection of the
+# pool away from the requests
+direct_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                    echo=DB_ECHO,
+                                    poolclass=NullPool)
+
+# Create a session factory
+async_session = sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+# Create a base class for declarative class definitions
+Base = declarative_base()
+
+
+class WikiSummary(Base):
+    """
+    Represents the wiki_summaries table in the database.
+
+    Attributes:
+        uuid (str): The unique identifier for each summary.
+        url (str): The URL of the Wikipedia page.
+        summary (str): The summary text of the Wikipedia page, when it is
+                       stored as plain text.
+        summary_data (bytes): The zstd-compressed summary, behind its format
+                              version byte, when it is stored compressed.
+        creation_date (datetime): The date and time when the summary
+                                  was created.
+    """
+    __tablename__ = 'wiki_summaries'
+    uuid = Column(String, primary_key=True)
+    url = Column(String, nullable=False, index=True)
+    summary = Column(Text)
+    summary_data = Column(LargeBinary)
+    creation_date = Column(DateTime, default=dt.now, index=True)
+
+
+def stored_summary(summary: str, codec: str = SUMMARY_CODEC) -> dict:
+    """
+    Build the summary columns of a row for a storage codec.
+
+    Args:
+        summary (str): The summary text.
+        codec (str): Either 'text' or 'zstd'.
+
+    Returns:
+        dict: The values of the summary and summary_data columns.
+    """
+    if codec == "zstd":
+        return {"summary": None,
+                "summary_data": encode_summary(summary, SUMMARY_ZSTD_LEVEL)}
+    return {"summary": summary, "summary_data": None}
+
+
+def summary_text(summary: str | None, summary_data: bytes | None) -> str:
+    """
+    Read the summary text of a row, decompressing it if needed.
+
+    Args:
+        summary (str or None): The summary column.
+        summary_data (bytes or None): The summary_data column.
+
+    Returns:
+        str or None: The summary text if the row has one, otherwise None.
+    """
+    if summary_data is not None:
+        return decode_summary(summary_data)
+    return summary
+
+
+async def insert_wiki_summary(uuid, url, summary) -> str:
+    """
+    Inserts a new record into the wiki_summaries table.
+
+    Args:
+        uuid (str): The unique identifier for the summary.
+        url (str): The URL of the Wikipedia page.
+        summary (str): The summary text of the Wikipedia page.
+
+    Returns:
+        str: A message indicating whether the data was inserted successfully
+             or an error occurred.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            try:
+                # Create a new WikiSummary object
+                new_summary = WikiSummary(
+                    uuid=uuid,
+                    url=url,
+                    **stored_summary(summary)
+                )
+
+                # Add the new object to the session
+                session.add(new_summary)
+
+                # Commit the transaction
+                await session.commit()
+
+                info = "Data inserted successfully"
+
+                return info
+
+            except Exception as e:
+                await session.rollback()
+                info = f"An error occurred: {e}"
+                return info
+
+
+async def upsert_wiki_summaries(rows: list) -> str:
+    """
+    Inserts or updates several records of the wiki_summaries table with a
+    single INSERT ... ON CONFLICT statement.
+
+    Args:
+        rows (list): Dictionaries with the uuid, url and summary of each
+                     record.
+
+    Returns:
+        str: A message indicating whether the data was inserted successfully
+             or an error occurred.
+    """
+    if not rows:
+        return "No data to insert"
+    stmt = insert(WikiSummary).values(
+        [{"uuid": row["uuid"],
+          "url": row["url"],
+          **stored_summary(row["summary"]),
+          "creation_date": dt.now()} for row in rows]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WikiSummary.uuid],
+        set_={"url": stmt.excluded.url,
+              "summary": stmt.excluded.summary,
+              "summary_data": stmt.excluded.summary_data,
+              "creation_date": stmt.excluded.creation_date}
+    )
+    async with async_session() as session:
+        async with session.begin():
+            try:
+                await session.execute(stmt)
+                await session.commit()
+                return "Data inserted successfully"
+            except Exception as e:
+                await session.rollback()
+                return f"An error occurred: {e}"
+
+
+async def get_wiki_summary(u_id) -> str | None:
+    """
+    Retrieves the summary text for a given UUID from the wiki_summaries table.
+
+    Args:
+        u_id (str): The unique identifier for the summary.
+
+    Returns:
+        str or None: The summary text if found, otherwise None.
+    """
+    async with async_session() as session:
+        try:
+            row = (await session.execute(
+                select(WikiSummary.summary, WikiSummary.summary_data)
+                .where(WikiSummary.uuid == u_id)
+            )).one_or_none()
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return None
+    return summary_text(*row) if row else None
+
+
+async def get_latest_wiki_summary(url) -> dict | None:
+    """
+    Retrieves the most recent summary of a Wikipedia URL, using the indexes
+    on url and creation_date.
+
+    Args:
+        url (str): The URL of the Wikipedia page.
+
+    Returns:
+        dict or None: The uuid, summary and creation_date of the latest
+                      summary if found, otherwise None.
+    """
+    async with async_session() as session:
+        row = (await session.execute(
+            select(WikiSummary.uuid,
+                   WikiSummary.summary,
+                   WikiSummary.summary_data,
+                   WikiSummary.creation_date)
+            .where(WikiSummary.url == url)
+            .order_by(WikiSummary.creation_date.desc())
+            .limit(1)
+        )).one_or_none()
+    if row is None:
+        return None
+    return {"uuid": row.uuid,
+            "summary": summary_text(row.summary, row.summary_data),
+            "creation_date": row.creation_date}
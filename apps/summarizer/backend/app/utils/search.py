@@ -0,0 +1,348 @@
+"""Full-text and vector search over the stored summaries"""
+from datetime import datetime as dt, timedelta
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import (Column, DateTime, ForeignKey, Index, Integer, String,
+                        Select, Text, cast, func, literal, select, text,
+                        update)
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR, insert
+
+from backend.app.utils.repository import (Base, WikiSummary, async_session,
+                                          summary_text)
+from backend.app.utils.config import (SEARCH_CANDIDATES,
+                                      SEARCH_EMBEDDING_DIM,
+                                      SEARCH_MAX_ATTEMPTS,
+                                      SEARCH_RETRY_AFTER,
+                                      SEARCH_RRF_K,
+                                      SEARCH_TEXT_CONFIG)
+
+
+class SummarySearch(Base):
+    """
+    Represents the summary_search table in the database.
+
+    A row is inserted when an indexer claims the summary, and its vectors
+    are written once the summary is embedded.
+
+    Attributes:
+        uuid (str): The unique identifier of the indexed summary.
+        search_vector (str): The tsvector of the summary text.
+        embedding (list): The embedding of the summary text.
+        indexed_at (datetime): When the summary was indexed.
+        claimed_at (datetime): When an indexer last claimed the summary.
+        attempts (int): The number of claims of the summary.
+        error (str): Why the last attempt failed, if it did.
+    """
+    __tablename__ = 'summary_search'
+    __table_args__ = (
+        Index("summary_search_vector_idx", "search_vector",
+              postgresql_using="gin"),
+        Index("summary_search_embedding_idx", "embedding",
+              postgresql_using="hnsw",
+              postgresql_with={"m": 16, "ef_construction": 64},
+              postgresql_ops={"embedding": "vector_cosine_ops"}),
+    )
+    uuid = Column(String,
+                  ForeignKey("wiki_summaries.uuid", ondelete="CASCADE"),
+                  primary_key=True)
+    search_vector = Column(TSVECTOR)
+    embedding = Column(Vector(SEARCH_EMBEDDING_DIM))
+    indexed_at = Column(DateTime)
+    claimed_at = Column(DateTime)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+
+
+def text_config():
+    """The full-text search configuration, as a regconfig."""
+    return cast(literal(SEARCH_TEXT_CONFIG), REGCONFIG)
+
+
+async def claim_summaries(batch_size: int) -> list:
+    """
+    Claim a batch of summaries to index, the oldest summaries never
+    claimed first, then the failed or abandoned claims older than
+    `SEARCH_RETRY_AFTER` seconds, up to `SEARCH_MAX_ATTEMPTS` claims.
+
+    The candidates are locked with SKIP LOCKED only while the claim is
+    inserted, so several indexers claim disjoint batches and no lock is
+    held while the summaries are embedded.
+
+    Args:
+        batch_size (int): The maximum number of summaries claimed.
+
+    Returns:
+        list: The (uuid, text) of the claimed summaries, the text being
+              empty when the summary has none.
+    """
+    unclaimed = (select(WikiSummary.uuid, func.now(), literal(1))
+                 .outerjoin(SummarySearch,
+                            SummarySearch.uuid == WikiSummary.uuid)
+                 .where(SummarySearch.uuid.is_(None))
+                 .order_by(WikiSummary.creation_date)
+                 .limit(batch_size)
+                 .with_for_update(of=WikiSummary, skip_locked=True))
+    async with async_session() as session:
+        async with session.begin():
+            claimed = list((await session.execute(
+                insert(SummarySearch)
+                .from_select(["uuid", "claimed_at", "attempts"], unclaimed)
+                .on_conflict_do_nothing(index_elements=["uuid"])
+                .returning(SummarySearch.uuid)
+            )).scalars())
+            if len(claimed) < batch_size:
+                retry = (select(SummarySearch.uuid)
+                         .where(SummarySearch.embedding.is_(None),
+                                SummarySearch.attempts < SEARCH_MAX_ATTEMPTS,
+                                SummarySearch.claimed_at < func.now()
+                                - timedelta(seconds=SEARCH_RETRY_AFTER))
+                         .order_by(SummarySearch.claimed_at)
+                         .limit(batch_size - len(claimed))
+                         .with_for_update(skip_locked=True)
+                         .scalar_subquery())
+                claimed += (await session.execute(
+                    update(SummarySearch)
+                    .where(SummarySearch.uuid.in_(retry))
+                    .values(claimed_at=func.now(),
+                            attempts=SummarySearch.attempts + 1)
+                    .returning(SummarySearch.uuid)
+                    .execution_options(synchronize_session=False)
+                )).scalars()
+            if not claimed:
+                return []
+            rows = (await session.execute(
+                select(WikiSummary.uuid,
+                       WikiSummary.summary,
+                       WikiSummary.summary_data)
+                .where(WikiSummary.uuid.in_(claimed))
+            )).all()
+    return [(row.uuid, summary_text(row.summary, row.summary_data) or "")
+            for row in rows]
+
+
+async def embed_texts(embedding: Embeddings, texts: List[str]) -> list:
+    """
+    Embed texts in a single call, or one by one when the call fails, so a
+    text the model rejects does not fail the others.
+
+    Args:
+        embedding (Embeddings): The embedding model.
+        texts (List[str]): The texts to embed.
+
+    Returns:
+        list: The embedding of each text, or the exception raised for it.
+    """
+    try:
+        return await embedding.aembed_documents(texts)
+    except Exception as e:
+        if len(texts) == 1:
+            return [e]
+    vectors = []
+    for text_ in texts:
+        try:
+            vectors.extend(await embedding.aembed_documents([text_]))
+        except Exception as e:
+            vectors.append(e)
+    return vectors
+
+
+async def store_index(rows: list) -> None:
+    """
+    Write the vectors of claimed summaries.
+
+    Args:
+        rows (list): The (uuid, text, embedding) of each summary.
+    """
+    if not rows:
+        return
+    stmt = insert(SummarySearch).values([
+        {"uuid": uuid,
+         "search_vector": func.to_tsvector(text_config(), text_),
+         "embedding": vector,
+         "indexed_at": dt.now()}
+        for uuid, text_, vector in rows
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SummarySearch.uuid],
+        set_={"search_vector": stmt.excluded.search_vector,
+              "embedding": stmt.excluded.embedding,
+              "indexed_at": stmt.excluded.indexed_at,
+              "error": None}
+    )
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(stmt)
+
+
+async def fail_summaries(errors: dict, retry: bool = True) -> None:
+    """
+    Record why claimed summaries were not indexed.
+
+    Args:
+        errors (dict): The error of each summary, by uuid.
+        retry (bool): Whether the summaries are claimed again after
+                      `SEARCH_RETRY_AFTER` seconds.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            for uuid, error in errors.items():
+                values = {"error": error}
+                if not retry:
+                    values["attempts"] = SEARCH_MAX_ATTEMPTS
+                await session.execute(update(SummarySearch)
+                                      .where(SummarySearch.uuid == uuid)
+                                      .values(**values))
+
+
+async def index_summaries(embedding: Embeddings,
+                          batch_size: int = 100) -> int:
+    """
+    Index one batch of the summaries not indexed yet, oldest first.
+
+    The batch is claimed in a short transaction, embedded outside of it in
+    a single call, then written. The summaries without text are never sent
+    to the model, and the ones it fails to embed are claimed again later,
+    at most `SEARCH_MAX_ATTEMPTS` times.
+
+    Args:
+        embedding (Embeddings): The model embedding the summaries.
+        batch_size (int): The maximum number of summaries indexed.
+
+    Returns:
+        int: The number of claimed summaries, 0 when none is left.
+    """
+    claimed = await claim_summaries(batch_size)
+    if not claimed:
+        return 0
+    rows = [(uuid, text_) for uuid, text_ in claimed if text_.strip()]
+    empty = {uuid: "Empty summary" for uuid, text_ in claimed
+             if not text_.strip()}
+    if empty:
+        await fail_summaries(empty, retry=False)
+    vectors = []
+    if rows:
+        vectors = await embed_texts(embedding, [text_ for _, text_ in rows])
+    await store_index([(uuid, text_, vector)
+                       for (uuid, text_), vector in zip(rows, vectors)
+                       if not isinstance(vector, Exception)])
+    failed = {uuid: str(vector) for (uuid, _), vector in zip(rows, vectors)
+              if isinstance(vector, Exception)}
+    if failed:
+        await fail_summaries(failed)
+    return len(claimed)
+
+
+def reciprocal_rank(rank):
+    """
+    The score a ranking gives to a summary, 1 / (`SEARCH_RRF_K` + rank), or
+    0 when the summary is not in the ranking.
+    """
+    return func.coalesce(1.0 / (SEARCH_RRF_K + rank), 0)
+
+
+def fuse_rankings(text_hits, vector_hits) -> Select:
+    """
+    Fuse two rankings by reciprocal rank, each one adding
+    `reciprocal_rank` to the score of its summaries, so a summary found by
+    both rankings comes first.
+
+    Args:
+        text_hits: The uuid and rank, from 1, of the full-text candidates.
+        vector_hits: The uuid and rank, from 1, of the vector candidates.
+
+    Returns:
+        Select: The uuid and score of every candidate.
+    """
+    score = (reciprocal_rank(text_hits.c.rank)
+             + reciprocal_rank(vector_hits.c.rank))
+    return (select(func.coalesce(text_hits.c.uuid,
+                                 vector_hits.c.uuid).label("uuid"),
+                   score.label("score"))
+            .select_from(text_hits.join(vector_hits,
+                                        text_hits.c.uuid == vector_hits.c.uuid,
+                                        full=True)))
+
+
+def search_statement(query: str, query_embedding: List[float],
+                     limit: int) -> Select:
+    """
+    Build the hybrid search of the summaries.
+
+    The `SEARCH_CANDIDATES` best summaries of the full-text ranking and of
+    the cosine distance to the query embedding are fused by
+    `fuse_rankings`.
+
+    Args:
+        query (str): The search text, in the syntax of web search engines.
+        query_embedding (List[float]): The embedding of the search text.
+        limit (int): The maximum number of results.
+
+    Returns:
+        Select: The uuid, url, creation date and score of the results, best
+                first.
+    """
+    tsquery = func.websearch_to_tsquery(text_config(), query)
+    text_rank = func.ts_rank_cd(SummarySearch.search_vector, tsquery)
+    text_best = (select(SummarySearch.uuid, text_rank.label("relevance"))
+                 .where(SummarySearch.search_vector.bool_op("@@")(tsquery))
+                 .order_by(text_rank.desc())
+                 .limit(SEARCH_CANDIDATES)
+                 .subquery())
+    text_hits = select(
+        text_best.c.uuid,
+        func.row_number().over(
+            order_by=text_best.c.relevance.desc()
+        ).label("rank")
+    ).cte("text_hits")
+
+    distance = SummarySearch.embedding.cosine_distance(query_embedding)
+    nearest = (select(SummarySearch.uuid, distance.label("distance"))
+               .where(SummarySearch.embedding.is_not(None))
+               .order_by(distance)
+               .limit(SEARCH_CANDIDATES)
+               .subquery())
+    vector_hits = select(
+        nearest.c.uuid,
+        func.row_number().over(order_by=nearest.c.distance).label("rank")
+    ).cte("vector_hits")
+
+    fused = fuse_rankings(text_hits, vector_hits).subquery("fused")
+    return (select(WikiSummary.uuid,
+                   WikiSummary.url,
+                   WikiSummary.creation_date,
+                   fused.c.score)
+            .join(fused, fused.c.uuid == WikiSummary.uuid)
+            .order_by(fused.c.score.desc(), WikiSummary.creation_date.desc())
+            .limit(limit))
+
+
+async def search_summaries(query: str, query_embedding: List[float],
+                           limit: int = 10) -> List[dict]:
+    """
+    Search the stored summaries by text and by meaning.
+
+    Args:
+        query (str): The search text.
+        query_embedding (List[float]): The embedding of the search text.
+        limit (int): The maximum number of results.
+
+    Returns:
+        List[dict]: The uuid, url, creation date and score of the results,
+                    best first.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            # The HNSW scan returns at most ef_search rows, 40 by default
+            await session.execute(
+                text(f"SET LOCAL hnsw.ef_search = "
+                     f"{max(SEARCH_CANDIDATES, 40)}")
+            )
+            rows = (await session.execute(
+                search_statement(query, query_embedding, limit)
+            )).all()
+    return [{"uuid": row.uuid,
+             "url": row.url,
+             "creation_date": row.creation_date,
+             "score": float(row.score)} for row in rows]
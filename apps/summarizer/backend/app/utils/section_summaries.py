@@ -0,0 +1,131 @@
+"""Summaries of the article chunks, reused by the next revisions"""
+import hashlib
+import json
+from datetime import datetime as dt
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.app.utils.cache_eviction import count_put, evict_rows, expiry
+from backend.app.utils.repository import Base, async_session
+from backend.app.utils.config import (LLM_MODEL,
+                                      LLM_TEMPERATURE,
+                                      SECTION_SUMMARIES_TTL_DAYS)
+from backend.app.utils.metrics import count_lookup
+
+
+# Chunks summarized again and chunks whose stored summary was reused, in
+# this process
+SECTION_SUMMARY_STATS = {"reused": 0, "summarized": 0}
+
+
+class SectionSummary(Base):
+    """
+    Represents the section_summaries table in the database.
+
+    Attributes:
+        section_key (str): The hash of the model, temperature, prompt, size
+                           and text of the chunk.
+        summary (str): The summary of the chunk.
+        n_tokens (int): The number of tokens of the summary.
+        created_at (datetime): When the summary was stored, used by the TTL.
+        last_used_at (datetime): When the summary was last reused.
+    """
+    __tablename__ = 'section_summaries'
+    __table_args__ = (
+        Index("section_summaries_created_idx", "created_at"),
+    )
+    section_key = Column(String(64), primary_key=True)
+    summary = Column(Text, nullable=False)
+    n_tokens = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=dt.now)
+    last_used_at = Column(DateTime, default=dt.now)
+
+
+def section_key(text: str, token_max: int, prompt: str) -> str:
+    """
+    Build the key of the summary of a chunk, which only changes when the
+    text of the chunk or the way it is summarized does.
+
+    Args:
+        text (str): The text of the chunk.
+        token_max (int): The size of the summary.
+        prompt (str): The template of the prompt summarizing the chunk.
+
+    Returns:
+        str: The SHA-256 hex digest of the chunk summary.
+    """
+    payload = json.dumps([LLM_MODEL, LLM_TEMPERATURE, prompt, token_max,
+                          text])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def get_section_summaries(keys: list) -> dict:
+    """
+    Retrieve the stored summaries of chunks in a single query, refreshing
+    their recency.
+
+    Args:
+        keys (list): The keys of the chunks.
+
+    Returns:
+        dict: The summary and number of tokens of each key found.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            rows = (await session.execute(
+                update(SectionSummary)
+                .where(SectionSummary.section_key.in_(keys),
+                       SectionSummary.created_at
+                       > expiry(SECTION_SUMMARIES_TTL_DAYS))
+                .values(last_used_at=dt.now())
+                .returning(SectionSummary.section_key,
+                           SectionSummary.summary,
+                           SectionSummary.n_tokens)
+            )).all()
+    found = {row.section_key: (row.summary, row.n_tokens) for row in rows}
+    hits = sum(key in found for key in keys)
+    SECTION_SUMMARY_STATS["reused"] += hits
+    SECTION_SUMMARY_STATS["summarized"] += len(keys) - hits
+    for key in keys:
+        count_lookup("section", key in found)
+    return found
+
+
+async def put_section_summaries(summaries: dict) -> None:
+    """
+    Store the summaries of chunks in a single statement, and delete the
+    expired ones every `EVICT_EVERY` calls.
+
+    Args:
+        summaries (dict): The summary and number of tokens of each key.
+    """
+    if not summaries:
+        return
+    now = dt.now()
+    statement = insert(SectionSummary).values([
+        {"section_key": key, "summary": summary, "n_tokens": n_tokens,
+         "created_at": now, "last_used_at": now}
+        for key, (summary, n_tokens) in summaries.items()
+    ])
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(statement.on_conflict_do_update(
+                index_elements=["section_key"],
+                set_={"summary": statement.excluded.summary,
+                      "n_tokens": statement.excluded.n_tokens,
+                      "created_at": now,
+                      "last_used_at": now}
+            ))
+    await count_put(SectionSummary, evict_section_summaries)
+
+
+async def evict_section_summaries() -> int:
+    """
+    Delete the summaries older than `SECTION_SUMMARIES_TTL_DAYS`.
+
+    Returns:
+        int: The number of deleted summaries.
+    """
+    return await evict_rows(SectionSummary,
+                            ttl_days=SECTION_SUMMARIES_TTL_DAYS)
@@ -0,0 +1,167 @@
+"""Cache of final summaries keyed by article revision and size"""
+from datetime import datetime as dt
+
+from sqlalchemy import (BigInteger, Column, DateTime, Index, Integer, String,
+                        Text, delete, func, select, update)
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.app.utils.cache_eviction import count_put, evict_rows
+from backend.app.utils.repository import Base, async_session
+from backend.app.utils.config import SUMMARY_CACHE_MAX_ENTRIES
+from backend.app.utils.metrics import count_lookup
+
+
+# Hit, miss and eviction counters of this process
+CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+class SummaryCache(Base):
+    """
+    Represents the summary_cache table in the database.
+
+    Attributes:
+        cache_key (str): The key built by `cache_key`.
+        language (str): The language code of the Wikipedia article.
+        page_id (int): The Wikipedia page id of the article.
+        revision_id (int): The revision of the article that was summarized.
+        token_max (int): The size requested for the summary.
+        summary (str): The final summary of the article.
+        hits (int): How many times the entry was served.
+        created_at (datetime): When the entry was stored.
+        last_hit_at (datetime): When the entry was last served, used for
+                                the least recently used eviction.
+    """
+    __tablename__ = 'summary_cache'
+    __table_args__ = (
+        Index("summary_cache_page_idx", "language", "page_id"),
+        Index("summary_cache_last_hit_idx", "last_hit_at"),
+    )
+    cache_key = Column(String, primary_key=True)
+    language = Column(String(16), nullable=False)
+    page_id = Column(BigInteger, nullable=False)
+    revision_id = Column(BigInteger, nullable=False)
+    token_max = Column(Integer, nullable=False)
+    summary = Column(Text, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=dt.now)
+    last_hit_at = Column(DateTime, default=dt.now)
+
+
+def cache_key(language: str, page_id: int, revision_id: int,
+              token_max: int) -> str:
+    """
+    Build the cache key of a summary.
+
+    A Wikipedia revision never changes, so the key addresses the exact
+    content that was summarized.
+
+    Args:
+        language (str): The language code of the Wikipedia article.
+        page_id (int): The Wikipedia page id of the article.
+        revision_id (int): The revision id of the article.
+        token_max (int): The size requested for the summary.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"{language}:{page_id}:{revision_id}:{token_max}"
+
+
+async def get_cached_summary(key: str) -> str | None:
+    """
+    Retrieve a cached summary and refresh its recency.
+
+    Args:
+        key (str): The cache key of the summary.
+
+    Returns:
+        str or None: The cached summary if found, otherwise None.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            summary = await session.scalar(
+                update(SummaryCache)
+                .where(SummaryCache.cache_key == key)
+                .values(hits=SummaryCache.hits + 1, last_hit_at=dt.now())
+                .returning(SummaryCache.summary)
+            )
+    if summary is None:
+        CACHE_STATS["misses"] += 1
+    else:
+        CACHE_STATS["hits"] += 1
+    count_lookup("summary", summary is not None)
+    return summary
+
+
+async def put_cached_summary(key: str, language: str, page_id: int,
+                             revision_id: int, token_max: int,
+                             summary: str) -> None:
+    """
+    Store a summary in the cache and apply the eviction policy.
+
+    Entries of older revisions of the same article are dropped, since they
+    will not be requested anymore, and the least recently used entries
+    beyond `SUMMARY_CACHE_MAX_ENTRIES` are evicted every `EVICT_EVERY`
+    calls.
+
+    Args:
+        key (str): The cache key of the summary.
+        language (str): The language code of the Wikipedia article.
+        page_id (int): The Wikipedia page id of the article.
+        revision_id (int): The revision id of the article.
+        token_max (int): The size requested for the summary.
+        summary (str): The final summary of the article.
+    """
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(
+                insert(SummaryCache)
+                .values(cache_key=key,
+                        language=language,
+                        page_id=page_id,
+                        revision_id=revision_id,
+                        token_max=token_max,
+                        summary=summary)
+                .on_conflict_do_nothing(index_elements=["cache_key"])
+            )
+            superseded = await session.execute(
+                delete(SummaryCache)
+                .where(SummaryCache.language == language,
+                       SummaryCache.page_id == page_id,
+                       SummaryCache.revision_id != revision_id)
+            )
+    CACHE_STATS["evictions"] += superseded.rowcount
+    await count_put(SummaryCache, evict_cached_summaries)
+
+
+async def evict_cached_summaries() -> int:
+    """
+    Delete the least recently used summaries beyond
+    `SUMMARY_CACHE_MAX_ENTRIES`.
+
+    Returns:
+        int: The number of deleted summaries.
+    """
+    evicted = await evict_rows(SummaryCache,
+                               recency=SummaryCache.last_hit_at,
+                               max_rows=SUMMARY_CACHE_MAX_ENTRIES)
+    CACHE_STATS["evictions"] += evicted
+    return evicted
+
+
+async def get_cache_stats() -> dict:
+    """
+    Report the counters of the cache and the number of stored entries.
+
+    Returns:
+        dict: The hits, misses and evictions of this process, its hit
+              ratio and the number of entries in the table.
+    """
+    async with async_session() as session:
+        entries = await session.scalar(
+            select(func.count()).select_from(SummaryCache)
+        )
+    lookups = CACHE_STATS["hits"] + CACHE_STATS["misses"]
+    return {**CACHE_STATS,
+            "hit_ratio": CACHE_STATS["hits"] / lookups if lookups else None,
+            "entries": entries}
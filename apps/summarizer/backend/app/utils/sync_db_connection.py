@@ -1,41 +1,23 @@
 """All custom functions used in this app"""
-import datetime
-
-from datetime import datetime as dt
-from sqlalchemy import create_engine, Column, String, Text, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 
 from backend.app.utils.config import SYNC_DATABASE_URL
+from backend.app.utils.repository import (WikiSummary,
+                                          stored_summary,
+                                          summary_text)
 
 
-# Create the SQLAlchemy engine
+# Create the SQLAlchemy engine, which connects on its first use
 engine = create_engine(SYNC_DATABASE_URL)
 
-# Create a base class for declarative class definitions
-Base = declarative_base()
-
 
-class WikiSummary(Base):
+def init_db():
     """
-    Represents the wiki_summaries table in the database.
-
-    Attributes:
-        uuid (str): The unique identifier for each summary.
-        url (str): The URL of the Wikipedia page.
-        summary (str): The summary text of the Wikipedia page.
-        creation_date (datetime): The date and time when the
-                                  summary was created.
+    Create the wiki_summaries table, for the scripts using this module
+    without the app, which creates it on startup.
     """
-    __tablename__ = 'wiki_summaries'
-    uuid = Column(String, primary_key=True)
-    url = Column(String, nullable=False)
-    summary = Column(Text, nullable=False)
-    creation_date = Column(DateTime,
-                           default=dt.now(datetime.timezone.utc))
-
-
-# Create the table in the database
-Base.metadata.create_all(engine)
+    WikiSummary.__table__.create(engine, checkfirst=True)
 
 
 # Create a session factory
@@ -61,7 +43,7 @@ def insert_wiki_summary(uuid, url, summary) -> str:
         new_summary = WikiSummary(
             uuid=uuid,
             url=url,
-            summary=summary
+            **stored_summary(summary)
         )
 
         # Add the new object to the session
@@ -97,7 +79,7 @@ def get_wiki_summary_sync(u_id) -> str | None:
         # Query the WikiSummary object by uuid
         result = session.query(WikiSummary).filter_by(uuid=u_id).first()
         if result:
-            return result.summary
+            return summary_text(result.summary, result.summary_data)
         else:
             return None
     except Exception as e:
@@ -1,6 +1,114 @@
 CREATE TABLE wiki_summaries (
     uuid VARCHAR(255) PRIMARY KEY,
     url VARCHAR(255) NOT NULL,
-    summary TEXT NOT NULL,
+    summary TEXT,
+    summary_data BYTEA,
     creation_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+CREATE INDEX ix_wiki_summaries_url ON wiki_summaries (url);
+CREATE INDEX ix_wiki_summaries_creation_date ON wiki_summaries (creation_date);
+
+-- The summary search needs pgvector, only set up when the image provides it
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'vector')
+    THEN
+        CREATE EXTENSION IF NOT EXISTS vector;
+
+        CREATE TABLE summary_search (
+            uuid VARCHAR(255) PRIMARY KEY
+                REFERENCES wiki_summaries (uuid) ON DELETE CASCADE,
+            search_vector TSVECTOR,
+            embedding VECTOR(768),
+            indexed_at TIMESTAMP,
+            claimed_at TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        );
+
+        CREATE INDEX summary_search_vector_idx ON summary_search
+            USING gin (search_vector);
+        CREATE INDEX summary_search_embedding_idx ON summary_search
+            USING hnsw (embedding vector_cosine_ops)
+            WITH (m = 16, ef_construction = 64);
+    ELSE
+        RAISE NOTICE 'pgvector is not available, summary_search is not created';
+    END IF;
+END
+$$;
+
+CREATE TABLE summary_jobs (
+    uuid VARCHAR(255) PRIMARY KEY,
+    url VARCHAR(255) NOT NULL,
+    number_of_words INTEGER NOT NULL,
+    batch_id VARCHAR(255),
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    error TEXT,
+    owner VARCHAR,
+    heartbeat TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX ix_summary_jobs_batch_id ON summary_jobs (batch_id);
+
+CREATE TABLE summary_cache (
+    cache_key VARCHAR(255) PRIMARY KEY,
+    language VARCHAR(16) NOT NULL,
+    page_id BIGINT NOT NULL,
+    revision_id BIGINT NOT NULL,
+    token_max INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_hit_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX summary_cache_page_idx ON summary_cache (language, page_id);
+CREATE INDEX summary_cache_last_hit_idx ON summary_cache (last_hit_at);
+
+CREATE TABLE wiki_articles (
+    language VARCHAR(16) NOT NULL,
+    page_id BIGINT NOT NULL,
+    revision_id BIGINT NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    etag VARCHAR(255),
+    content TEXT NOT NULL,
+    fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (language, page_id, revision_id)
+);
+
+CREATE INDEX wiki_articles_title_idx ON wiki_articles (language, title);
+
+CREATE TABLE llm_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    response TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX llm_cache_last_used_idx ON llm_cache (last_used_at);
+
+CREATE TABLE section_summaries (
+    section_key VARCHAR(64) PRIMARY KEY,
+    summary TEXT NOT NULL,
+    n_tokens INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX section_summaries_created_idx ON section_summaries (created_at);
+
+CREATE TABLE map_summaries (
+    map_key VARCHAR(64) PRIMARY KEY,
+    language VARCHAR(16) NOT NULL,
+    page_id BIGINT NOT NULL,
+    revision_id BIGINT NOT NULL,
+    summaries JSON NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX map_summaries_created_idx ON map_summaries (created_at);
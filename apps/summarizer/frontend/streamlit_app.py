@@ -1,5 +1,7 @@
 """Streamlit App Frontend"""
+import json
 import os
+import time
 import streamlit as st
 import requests
 
@@ -11,11 +13,16 @@ load_dotenv()
 FASTAPI_URL = os.getenv("FASTAPI_URL")
 FASTAPI_POST_URL = FASTAPI_URL + "/insert_article"
 FASTAPI_GET_URL = FASTAPI_URL + "/get_summary"
+FASTAPI_STREAM_URL = FASTAPI_URL + "/insert_article/stream"
+# Seconds between two polls of a summary job, and seconds before the app
+# stops waiting for it
+POLL_INTERVAL = 2
+MAX_WAIT = int(os.getenv("SUMMARY_MAX_WAIT", "600"))
 
 
 def get_summary(wikipedia_url, number_of_words):
     """
-    Fetch the summary of a Wikipedia article from the FastAPI backend.
+    Queue the summary of a Wikipedia article in the FastAPI backend.
 
     Args:
         wikipedia_url (str): The URL of the Wikipedia article.
@@ -27,11 +34,12 @@ def get_summary(wikipedia_url, number_of_words):
     """
     response = requests.post(
                             FASTAPI_POST_URL,
+                            params={"mode": "job"},
                             json={"wikipedia_url": wikipedia_url,
                                   "number_of_words": number_of_words},
                             timeout=60
                             )
-    if response.status_code == 200:
+    if response.status_code in (200, 202):
         data = response.json()
         summary_id = data.get("id")
         summary_info = data.get("info")
@@ -41,6 +49,90 @@ def get_summary(wikipedia_url, number_of_words):
         return None, None
 
 
+def wait_summary(summary_id):
+    """
+    Poll the FastAPI backend until the summary job is done or failed, for
+    at most `MAX_WAIT` seconds.
+
+    Args:
+        summary_id (str): The unique identifier for the summary.
+
+    Returns:
+        str: The summary text if the job is done, otherwise None.
+    """
+    deadline = time.monotonic() + MAX_WAIT
+    with st.spinner("Summarizing the article..."):
+        while time.monotonic() < deadline:
+            response = requests.get((f"{FASTAPI_GET_URL}/"
+                                     "{uuid}"
+                                     f"?u_id={summary_id}"),
+                                    timeout=60)
+            if response.status_code != 200:
+                st.error("Error: Unable to retrieve summary.")
+                return None
+            data = response.json()
+            status = data.get("status", "done")
+            if status == "done":
+                return data.get("summary")
+            if status == "failed":
+                st.error(f"Error: {data.get('error')}")
+                return None
+            time.sleep(POLL_INTERVAL)
+    st.info("The summary is still running, check it later with "
+            f"'Retrieve Summary by ID' and the ID {summary_id}.")
+    return None
+
+
+def stream_summary(wikipedia_url, number_of_words, status):
+    """
+    Stream the summary of a Wikipedia article from the FastAPI backend.
+
+    Progress events update the given status container and the tokens of the
+    final summary are yielded as they arrive.
+
+    Args:
+        wikipedia_url (str): The URL of the Wikipedia article.
+        number_of_words (int): The desired number of words for the summary.
+        status: The Streamlit status container showing the progress.
+
+    Yields:
+        str: The pieces of the final summary.
+    """
+    with requests.post(FASTAPI_STREAM_URL,
+                       json={"wikipedia_url": wikipedia_url,
+                             "number_of_words": number_of_words},
+                       stream=True,
+                       timeout=60) as response:
+        if response.status_code != 200:
+            st.error("Error: Unable to fetch summary.")
+            return
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                continue
+            if not line.startswith("data: "):
+                continue
+            data = json.loads(line[len("data: "):])
+            if event == "token":
+                yield data["text"]
+            elif event == "loaded":
+                status.update(label=f"Summarizing {data['title']}...")
+            elif event == "plan":
+                status.write(f"Planned {data['llm_calls']} LLM calls for "
+                             f"{data['chunks']} chunks")
+            elif event == "map":
+                status.write(f"Summarized {data['summaries']} chunks")
+            elif event == "collapse":
+                status.write(f"Collapse level {data['level']}")
+            elif event == "done":
+                status.update(label=f"Summary ID: {data['id']}",
+                              state="complete")
+            elif event == "error":
+                status.update(label="Error", state="error")
+                st.error(f"Error: {data['detail']}")
+
+
 def fetch_summary(summary_id):
     """
     Retrieve the summary using the summary ID from the FastAPI backend.
@@ -77,6 +169,7 @@ def main():
              "for the summary, or provide an existing summary ID.")
 
     option = st.selectbox("Choose an option", ["Generate Summary",
+                                               "Stream Summary",
                                                "Retrieve Summary by ID"])
 
     if option == "Generate Summary":
@@ -91,7 +184,7 @@ def main():
                 resp = get_summary(wikipedia_url, number_of_words)
                 summary_id = resp[0]
                 if summary_id:
-                    summary_text = fetch_summary(summary_id)
+                    summary_text = wait_summary(summary_id)
                     if summary_text:
                         st.success(f"Summary ID: {summary_id}")
                         st.markdown(
@@ -101,6 +194,22 @@ def main():
                         )
             else:
                 st.error("Please enter a valid Wikipedia URL.")
+    elif option == "Stream Summary":
+        wikipedia_url = st.text_input("Wikipedia URL", "")
+        number_of_words = st.number_input("Number of Words",
+                                          min_value=1000,
+                                          value=1000,
+                                          step=100)
+
+        if st.button("Get Summary"):
+            if wikipedia_url:
+                status = st.status("Loading the article...")
+                st.markdown("# ------------- Summary Info -------------")
+                st.write_stream(stream_summary(wikipedia_url,
+                                               number_of_words,
+                                               status))
+            else:
+                st.error("Please enter a valid Wikipedia URL.")
     elif option == "Retrieve Summary by ID":
         summary_id = st.text_input("Summary ID", "")
 